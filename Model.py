@@ -3,13 +3,13 @@ import sys
 import os
 import sqlite3
 import logging
-import pandas as pd
+from datetime import date as py_date
 from typing import List, Type
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from pydantic import BaseModel, Field, create_model
 from enum import Enum
-from custom_utils.PydanticFormWidget import py_date
+from custom_utils import metrics
 
 
 # 配置日志
@@ -36,6 +36,9 @@ def init_enum_from_db(
         {"JigUseStatus": ["未使用", "使用中", "异常", "待报废"]},
     ],
 ) -> bool:
+    # 只有首次创建 enum.db 时需要 pandas，命令行工具的常规路径不导入
+    import pandas as pd
+
     conn = sqlite3.connect(db_path)
     try:
         for init_data in init_datas:
@@ -64,6 +67,7 @@ def load_enum_from_file(filepath: str, enum_name: str = "DynamicEnum") -> Type[E
     return Enum(enum_name, data, type=str)
 
 
+@metrics.timed("sql.enum.load_model")
 def load_enum_from_db(
     db_path: str, table_name: str, enum_name: str = "DynamicEnum"
 ) -> Type[Enum]:
@@ -8,6 +8,20 @@ from PySide6.QtCore import (
     QDate,
 )
 
+from custom_utils import metrics
+
+# 着色等级
+SEVERITY_NONE = 0
+SEVERITY_WARNING = 1
+SEVERITY_SERIOUS = 2
+
+# 每个着色列受哪些配置项影响
+_SEVERITY_SETTINGS = {
+    "已使用次数": ("usage.warning", "usage.serious"),
+    "单次校验已使用次数": ("check_usage.warning", "check_usage.serious"),
+    "校验日期": ("check.warn_days", "check.expired_serious"),
+}
+
 
 def find_column_by_header(model: QAbstractItemModel, header_text: str) -> int:
     """
@@ -48,78 +62,234 @@ class ColoredSqlProxyModel(QIdentityProxyModel):
         self.count_Checkserious = 10
         self.count_Checkwarning = 50
         self.date_Checkwarning = 14
+        self.expired_serious = True
 
-    def get_column_indices(self):
-        self._column_indices = {
-            header_text: find_column_by_header(self.sourceModel(), header_text)
-            for header_text in self._column_indices.keys()
-        }
+        self._severity_columns = {}
+
+        # 着色等级缓存：(行, 列) -> 等级，源数据变化时失效
+        self._severity_cache = {}
+        self._update_brushes()
+
+    def setSourceModel(self, sourceModel):
+        old = self.sourceModel()
+        if old is not None:
+            for signal in (
+                old.modelReset,
+                old.layoutChanged,
+                old.rowsInserted,
+                old.rowsRemoved,
+            ):
+                signal.disconnect(self.clear_severity_cache)
+            old.dataChanged.disconnect(self._on_source_data_changed)
+        super().setSourceModel(sourceModel)
+        for signal in (
+            sourceModel.modelReset,
+            sourceModel.layoutChanged,
+            sourceModel.rowsInserted,
+            sourceModel.rowsRemoved,
+        ):
+            signal.connect(self.clear_severity_cache)
+        sourceModel.dataChanged.connect(self._on_source_data_changed)
+        self.clear_severity_cache()
+
+    def get_column_indices(self, columns=None):
+        """
+        解析着色所需的列索引
+
+        :param columns: custom_utils.columns.ColumnRegistry，未提供时按表头文本查找
+        """
+        if columns is not None:
+            self._column_indices = {
+                header_text: columns.index_by_title(header_text)
+                for header_text in self._column_indices.keys()
+            }
+        else:
+            self._column_indices = {
+                header_text: find_column_by_header(self.sourceModel(), header_text)
+                for header_text in self._column_indices.keys()
+            }
+        self._update_severity_columns()
+        self.clear_severity_cache()
 
     def set_column_indices(self, indices: dict):
         """手动设置列名到索引的映射"""
         self._column_indices.update(indices)
+        self._update_severity_columns()
+        self.clear_severity_cache()
+
+    def _update_severity_columns(self):
+        # 列索引 -> 着色列名，data() 中按列索引直接查找
+        self._severity_columns = {
+            self.source_column(col_name): col_name
+            for col_name in _SEVERITY_SETTINGS
+            if self.source_column(col_name) >= 0
+        }
+
+    # ---------- 配置 ----------
+    def apply_settings(self, settings, changed=None):
+        """
+        应用类型化配置，只重算受影响的列
+
+        :param settings: custom_utils.settings.AppSettings
+        :param changed: 变化的键集合（diff_settings 的结果），None 表示全部
+        """
+        self.color_serious = settings.colors.serious
+        self.color_warning = settings.colors.warning
+        self.count_Usedserious = settings.usage.serious
+        self.count_Usedwarning = settings.usage.warning
+        self.count_Checkserious = settings.check_usage.serious
+        self.count_Checkwarning = settings.check_usage.warning
+        self.date_Checkwarning = settings.check.warn_days
+        self.expired_serious = settings.check.expired_serious
 
+        if changed is None:
+            affected = list(_SEVERITY_SETTINGS)
+        else:
+            affected = [
+                col_name
+                for col_name, keys in _SEVERITY_SETTINGS.items()
+                if changed.intersection(keys)
+            ]
+        # 阈值变化的列重新计算等级（颜色可能同时变化，两者互不替代）
+        self._drop_cached_columns(affected)
+        colors_changed = changed is None or any(
+            key.startswith("colors.") for key in changed
+        )
+        if colors_changed:
+            # 颜色变化不影响等级，只需更新画刷，但所有着色列都要重绘
+            self._update_brushes()
+            affected = list(_SEVERITY_SETTINGS)
+        self._emit_background_changed(affected)
+
+    def _update_brushes(self):
+        self._brushes = {
+            SEVERITY_WARNING: QBrush(QColor(self.color_warning)),
+            SEVERITY_SERIOUS: QBrush(QColor(self.color_serious)),
+        }
+
+    # ---------- 缓存 ----------
+    def clear_severity_cache(self, *args):
+        self._severity_cache.clear()
+
+    def _on_source_data_changed(self, top_left, bottom_right, roles=()):
+        if (
+            roles
+            and Qt.ItemDataRole.DisplayRole not in roles
+            and (Qt.ItemDataRole.EditRole not in roles)
+        ):
+            return
+        rows = range(top_left.row(), bottom_right.row() + 1)
+        self._severity_cache = {
+            key: level
+            for key, level in self._severity_cache.items()
+            if key[0] not in rows
+        }
+
+    def _drop_cached_columns(self, col_names):
+        cols = {
+            self.source_column(col_name)
+            for col_name in col_names
+            if self.source_column(col_name) >= 0
+        }
+        self._severity_cache = {
+            key: level
+            for key, level in self._severity_cache.items()
+            if key[1] not in cols
+        }
+
+    def _emit_background_changed(self, col_names):
+        rows = self.rowCount()
+        if rows == 0:
+            return
+        for col_name in col_names:
+            col = self.source_column(col_name)
+            if col < 0:
+                continue
+            self.dataChanged.emit(
+                self.index(0, col),
+                self.index(rows - 1, col),
+                [Qt.ItemDataRole.BackgroundRole],
+            )
+
+    def source_column(self, col_name: str) -> int:
+        col = self._column_indices.get(col_name)
+        return -1 if col is None else col
+
+    # ---------- 着色 ----------
     def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
         if not index.isValid():
             return None
 
-        # 获取原始数据
-        original_data = super().data(index, role)
-
-        if role == Qt.ItemDataRole.BackgroundRole:
-            col_name = self.headerData(index.column(), Qt.Horizontal)
-            # 获取对应列的数据
-            row = index.row()
-            if col_name in ["已使用次数", "单次校验已使用次数"]:
-                # 只对这两个列进行逻辑判断
-                value = super().data(index, Qt.ItemDataRole.DisplayRole)
-                try:
-                    val = int(value)
-                except (ValueError, TypeError):
-                    return original_data
-
-                if col_name == "已使用次数":
-                    maxcount = self.get_value(row, "最大使用次数")
-                    if maxcount is not None:
-                        if maxcount - val <= self.count_Usedserious:
-                            return QBrush(QColor(self.color_serious))
-                        if maxcount - val <= self.count_Usedwarning:
-                            return QBrush(QColor(self.color_warning))
-                elif col_name == "单次校验已使用次数":
-                    maxcount = self.get_value(row, "单次校验可使用次数")
-                    if maxcount is not None:
-                        if maxcount - val <= self.count_Checkserious:
-                            return QBrush(QColor(self.color_serious))
-                        if maxcount - val <= self.count_Checkwarning:
-                            return QBrush(QColor(self.color_warning))
-
-            elif col_name == "校验日期":
-                date_str = super().data(index, Qt.ItemDataRole.DisplayRole)
-                if isinstance(date_str, str):
-                    check_date = QDateTime.fromString(date_str, "yyyy-MM-dd")
-                elif isinstance(date_str, QDateTime):
-                    check_date = date_str
-                elif isinstance(date_str, QDate):
-                    check_date = date_str.startOfDay()
-                else:
-                    return original_data
-                period_days = self.get_value(row, "校验周期（天）")
-                next_check = check_date.addDays(int(period_days))
-                today = QDateTime.currentDateTime()
-
-                two_weeks_before = next_check.addDays(-abs(self.date_Checkwarning))
-                if two_weeks_before <= today <= next_check:
-                    return QBrush(QColor(self.color_warning))
-                if today > next_check:  # 是否已过校验日？
-                    return QBrush(QColor(self.color_serious))
-
-        return original_data
+        if (
+            role == Qt.ItemDataRole.BackgroundRole
+            and index.column() in self._severity_columns
+        ):
+            with metrics.timer("proxy.data.background"):
+                key = (index.row(), index.column())
+                level = self._severity_cache.get(key)
+                if level is None:
+                    level = self._severity(index)
+                    self._severity_cache[key] = level
+            if level != SEVERITY_NONE:
+                return self._brushes[level]
+
+        return super().data(index, role)
+
+    def _severity(self, index: QModelIndex) -> int:
+        """计算单元格的着色等级"""
+        col_name = self._severity_columns.get(index.column())
+        if col_name is None:
+            return SEVERITY_NONE
+        # 获取对应列的数据
+        row = index.row()
+        if col_name in ["已使用次数", "单次校验已使用次数"]:
+            # 只对这两个列进行逻辑判断
+            value = super().data(index, Qt.ItemDataRole.DisplayRole)
+            try:
+                val = int(value)
+            except (ValueError, TypeError):
+                return SEVERITY_NONE
+
+            if col_name == "已使用次数":
+                maxcount = self.get_value(row, "最大使用次数")
+                serious, warning = self.count_Usedserious, self.count_Usedwarning
+            else:
+                maxcount = self.get_value(row, "单次校验可使用次数")
+                serious, warning = self.count_Checkserious, self.count_Checkwarning
+            if maxcount is not None:
+                if maxcount - val <= serious:
+                    return SEVERITY_SERIOUS
+                if maxcount - val <= warning:
+                    return SEVERITY_WARNING
+
+        elif col_name == "校验日期":
+            date_str = super().data(index, Qt.ItemDataRole.DisplayRole)
+            if isinstance(date_str, str):
+                check_date = QDateTime.fromString(date_str, "yyyy-MM-dd")
+            elif isinstance(date_str, QDateTime):
+                check_date = date_str
+            elif isinstance(date_str, QDate):
+                check_date = date_str.startOfDay()
+            else:
+                return SEVERITY_NONE
+            period_days = self.get_value(row, "校验周期（天）")
+            next_check = check_date.addDays(int(period_days))
+            today = QDateTime.currentDateTime()
+
+            two_weeks_before = next_check.addDays(-abs(self.date_Checkwarning))
+            if two_weeks_before <= today <= next_check:
+                return SEVERITY_WARNING
+            if today > next_check:  # 是否已过校验日？
+                return SEVERITY_SERIOUS if self.expired_serious else SEVERITY_WARNING
+
+        return SEVERITY_NONE
 
     def invalidate(self):
         """
         添加 invalidate 方法以兼容现有代码
         """
         self.beginResetModel()
+        self.clear_severity_cache()
         self.endResetModel()
 
     def get_value(self, row: int, column_name: str):
@@ -0,0 +1,239 @@
+import os
+import json
+import logging
+from typing import Dict, Optional
+
+from PySide6.QtCore import QObject, QTimer, Qt, QDate, QDateTime
+from PySide6.QtWidgets import QHeaderView, QTableView
+
+from custom_utils import metrics
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def _display_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, QDate):
+        return value.toString("yyyy-MM-dd")
+    if isinstance(value, QDateTime):
+        return value.toString("yyyy-MM-dd HH:mm:ss")
+    return str(value)
+
+
+class ColumnSizer(QObject):
+    """
+    抽样计算 QTableView 的列宽，代替 ResizeToContents
+
+    ResizeToContents 每次布局和 select() 都会测量所有单元格；这里只测量
+    前 sample_rows 行、当前可见行，以及每列记录过的最长文本，行高固定。
+    用户手动拖动过的列宽会保存到 state_path，之后不再自动调整。
+
+    :param view: 表格视图
+    :param state_path: 保存用户列宽的 JSON 文件，None 表示不保存
+    :param sample_rows: 从首行开始测量的行数
+    :param max_width: 自动列宽的上限（像素）
+    :param debounce_ms: 模型变化后延迟多久重新计算
+    """
+
+    PADDING = 16
+
+    def __init__(
+        self,
+        view: QTableView,
+        state_path: Optional[str] = None,
+        sample_rows: int = 50,
+        max_width: int = 400,
+        debounce_ms: int = 100,
+    ):
+        super().__init__(view)
+        self.view = view
+        self.state_path = state_path
+        self.sample_rows = sample_rows
+        self.max_width = max_width
+
+        # 列标题 -> 用户设置的宽度
+        self._user_widths: Dict[str, int] = self._load_state()
+        # 列号 -> 已知最长文本的宽度
+        self._longest: Dict[int, int] = {}
+        self._resizing = False
+        self._model = None
+
+        header = view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.sectionResized.connect(self._on_section_resized)
+
+        vheader = view.verticalHeader()
+        vheader.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        vheader.setDefaultSectionSize(view.fontMetrics().height() + 8)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self.resize_columns)
+
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(500)
+        self._save_timer.timeout.connect(self.save_state)
+
+        # 滚动时只测量新出现的行，列宽只增不减
+        view.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.set_model(view.model())
+
+    def set_model(self, model):
+        """视图更换模型后调用"""
+        if self._model is not None:
+            for signal in (
+                self._model.modelReset,
+                self._model.layoutChanged,
+                self._model.rowsInserted,
+            ):
+                signal.disconnect(self.schedule)
+            self._model.dataChanged.disconnect(self._on_data_changed)
+        self._model = model
+        self._longest.clear()
+        if model is None:
+            return
+        for signal in (model.modelReset, model.layoutChanged, model.rowsInserted):
+            signal.connect(self.schedule)
+        model.dataChanged.connect(self._on_data_changed)
+        self.schedule()
+
+    def schedule(self, *args):
+        self._timer.start()
+
+    # ---------- 测量 ----------
+    def _header_title(self, col: int) -> str:
+        return _display_text(self._model.headerData(col, Qt.Orientation.Horizontal))
+
+    def _visible_rows(self) -> range:
+        view = self.view
+        first = view.rowAt(0)
+        if first < 0:
+            return range(0)
+        last = view.rowAt(view.viewport().height() - 1)
+        if last < 0:
+            last = self._model.rowCount() - 1
+        return range(first, last + 1)
+
+    def _measure(self, rows, columns) -> Dict[int, int]:
+        fm = self.view.fontMetrics()
+        widths = {}
+        for col in columns:
+            width = 0
+            for row in rows:
+                text = _display_text(
+                    self._model.data(
+                        self._model.index(row, col), Qt.ItemDataRole.DisplayRole
+                    )
+                )
+                width = max(width, fm.horizontalAdvance(text))
+            widths[col] = width
+        return widths
+
+    def _auto_columns(self):
+        header = self.view.horizontalHeader()
+        return [
+            col
+            for col in range(self._model.columnCount())
+            if not header.isSectionHidden(col)
+        ]
+
+    def resize_columns(self):
+        """测量样本行并设置所有列宽"""
+        model = self._model
+        if model is None:
+            return
+        with metrics.timer("view.resize_columns"):
+            rows = set(range(min(self.sample_rows, model.rowCount())))
+            rows.update(self._visible_rows())
+            columns = self._auto_columns()
+            measured = self._measure(sorted(rows), columns)
+
+            header = self.view.horizontalHeader()
+            header_fm = header.fontMetrics()
+            self._resizing = True
+            try:
+                for col in columns:
+                    title = self._header_title(col)
+                    if title in self._user_widths:
+                        header.resizeSection(col, self._user_widths[title])
+                        continue
+                    longest = max(measured.get(col, 0), self._longest.get(col, 0))
+                    self._longest[col] = longest
+                    # 表头额外留出排序箭头的位置
+                    width = max(longest, header_fm.horizontalAdvance(title) + 16)
+                    header.resizeSection(
+                        col, min(width + self.PADDING, self.max_width)
+                    )
+            finally:
+                self._resizing = False
+
+    def _grow_columns(self, rows):
+        """测量指定行，只加宽不收窄"""
+        header = self.view.horizontalHeader()
+        columns = [
+            col
+            for col in self._auto_columns()
+            if self._header_title(col) not in self._user_widths
+        ]
+        measured = self._measure(rows, columns)
+        self._resizing = True
+        try:
+            for col, width in measured.items():
+                if width <= self._longest.get(col, 0):
+                    continue
+                self._longest[col] = width
+                width = min(width + self.PADDING, self.max_width)
+                if width > header.sectionSize(col):
+                    header.resizeSection(col, width)
+        finally:
+            self._resizing = False
+
+    def _on_scrolled(self, _value):
+        if self._model is not None and not self._timer.isActive():
+            self._grow_columns(self._visible_rows())
+
+    def _on_data_changed(self, top_left, bottom_right, roles=()):
+        if roles and Qt.ItemDataRole.DisplayRole not in roles:
+            return
+        if not self._timer.isActive():
+            self._grow_columns(range(top_left.row(), bottom_right.row() + 1))
+
+    # ---------- 用户列宽 ----------
+    def _on_section_resized(self, col, _old_size, new_size):
+        if self._resizing or self._model is None:
+            return
+        self._user_widths[self._header_title(col)] = new_size
+        self._save_timer.start()
+
+    def reset_user_widths(self):
+        """清除用户设置的列宽，恢复自动列宽"""
+        self._user_widths.clear()
+        self.save_state()
+        self.resize_columns()
+
+    def _load_state(self) -> Dict[str, int]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {str(k): int(v) for k, v in data.items()}
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"读取列宽失败，使用自动列宽: {e}")
+            return {}
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._user_widths, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"保存列宽失败: {e}")
@@ -166,14 +166,11 @@ def create_table_from_pydantic_model(
         if recreate:
             cursor.execute(drop_sql)
             logger.debug(f"已删除现有表 {table_name}")
-        print(create_sql)
         cursor.execute(create_sql)
         conn.commit()
-        logger.debug(f"✅ 表 '{table_name}' 已在数据库 '{db_path}' 中创建。")
-        print(f"✅ 表 '{table_name}' 已在数据库 '{db_path}' 中创建。")
+        logger.info(f"✅ 表 '{table_name}' 已在数据库 '{db_path}' 中创建。")
     except Exception as e:
         logger.error(f"❌ 创建表失败: {e}", exc_info=True)
-        print(f"❌ 创建表失败: {e}")
         raise
     finally:
         conn.close()
@@ -185,8 +182,8 @@ if __name__ == "__main__":
 
     sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
     from Model import JigDynamic
+    from custom_utils.db import jig_db_path
 
-    # print(pydantic_model_to_sql_create_table(Jig))
-    os.chdir(os.path.dirname(__file__))
-    db_path = "../datas/jig.db"
-    create_table_from_pydantic_model(JigDynamic, db_path=db_path, recreate=True)
+    logging.basicConfig(level=logging.INFO)
+    # 常规的建表和升级使用 jigctl migrate，这里会删除并重建治具表
+    create_table_from_pydantic_model(JigDynamic, db_path=jig_db_path, recreate=True)
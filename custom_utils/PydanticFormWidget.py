@@ -40,6 +40,9 @@ from PySide6.QtSql import QSqlRecord, QSqlTableModel
 from pydantic import BaseModel
 from pydantic_core import PydanticUndefined
 
+from custom_utils.columns import ColumnRegistry
+from custom_utils.hydrate import hydrator_for, to_date
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -494,6 +497,11 @@ class PydanticFormWidget(QWidget):
         proxy_model: Optional[QSortFilterProxyModel] = None,  # QSortFilterProxyModel
         proxy_row_index: Optional[int] = None,  # 代理模型中的行号
         save_callback: Optional[Callable[[Dict[str, Any]], bool]] = None,  # 保存回调
+        columns: Optional[ColumnRegistry] = None,  # 列注册表，列索引 -> 字段名
+        # 提交处理函数 (数据, 加载时的整行或 None) -> 是否成功，设置后不再经过源模型写入
+        commit_handler: Optional[
+            Callable[[Dict[str, Any], Optional[Dict[str, Any]]], bool]
+        ] = None,
     ):
         super().__init__(parent)
         self.model_class = model_class
@@ -506,6 +514,12 @@ class PydanticFormWidget(QWidget):
         self.proxy_model = proxy_model
         self.proxy_row_index = proxy_row_index
         self.save_callback = save_callback
+        self.columns = columns
+        self.commit_handler = commit_handler
+        # 加载时的整行（包括表单外的列，如 id、row_version），修改时作为冲突检测的基准
+        self.loaded_record: Optional[Dict[str, Any]] = None
+        # 加载时各控件的值，用于找出修改过的字段
+        self._loaded_data: Optional[Dict[str, Any]] = None
 
         if buttons is None:
             buttons = [
@@ -591,6 +605,17 @@ class PydanticFormWidget(QWidget):
     def get_data(self) -> Dict[str, Any]:
         return self.form_instance.get_data(self.field_widgets)
 
+    def mark_clean(self):
+        """以控件的当前值作为未修改状态"""
+        self._loaded_data = self.get_data()
+
+    def dirty_fields(self) -> List[str]:
+        """加载后修改过的字段；没有加载过数据（新增）时为所有字段"""
+        data = self.get_data()
+        if self._loaded_data is None:
+            return list(data)
+        return [k for k, v in data.items() if self._loaded_data.get(k) != v]
+
     def validate_and_get_model(self) -> BaseModel | None:
         for label in self._error_labels.values():
             label.setVisible(False)
@@ -626,10 +651,13 @@ class PydanticFormWidget(QWidget):
                 if isinstance(widget, QLineEdit):
                     widget.setText(str(value) if value is not None else "")
                 elif isinstance(widget, QDateEdit):
-                    if value:
-                        dt = QDate.fromString(str(value), "yyyy-MM-dd")
-                        if dt.isValid():
-                            widget.setDate(dt)
+                    # QDate 直接设置，文本和 date 与数据库读取共用转换函数
+                    if not isinstance(value, QDate):
+                        value = to_date(value)
+                        if isinstance(value, py_date):
+                            value = QDate(value.year, value.month, value.day)
+                    if isinstance(value, QDate) and value.isValid():
+                        widget.setDate(value)
                 elif isinstance(widget, FilePickerWidget):
                     widget.setText(str(value) if value is not None else "")
                 elif isinstance(widget, QSpinBox):
@@ -639,6 +667,8 @@ class PydanticFormWidget(QWidget):
                 elif isinstance(widget, QCheckBox):
                     widget.setChecked(bool(value))
                 elif isinstance(widget, QComboBox):
+                    if isinstance(value, Enum):
+                        value = value.value
                     text_val = str(value) if value is not None else ""
                     idx = widget.findText(text_val)
                     if idx >= 0:
@@ -646,18 +676,31 @@ class PydanticFormWidget(QWidget):
             except Exception as e:
                 print(f"⚠️ 无法加载字段 {name}: {e}")
 
+    def load_from_model(
+        self, model: BaseModel, record: Optional[Dict[str, Any]] = None
+    ):
+        """
+        从模型实例加载数据
+
+        :param model: 模型实例（可以是 model_construct 构造的，未经校验）
+        :param record: 加载时的整行（包括表单外的列），修改时作为冲突检测的基准
+        """
+        self.loaded_record = record
+        self.load_from_dict(
+            {name: getattr(model, name) for name in model.model_fields_set}
+        )
+        self.mark_clean()
+
     def load_from_record(self, record: QSqlRecord):
-        """从 QSqlRecord 加载数据"""
-        data = {}
+        """从 QSqlRecord 加载数据，按列顺序转换为模型实例（不校验）"""
+        names = []
+        values = []
         for i in range(record.count()):
-            field_name = record.fieldName(i)
             value = record.value(i)
-            if isinstance(value, QDate):
-                value = value.toString("yyyy-MM-dd")
-            elif value is None:
-                value = ""
-            data[field_name] = value
-        self.load_from_dict(data)
+            names.append(record.fieldName(i))
+            values.append(value.toPython() if isinstance(value, QDate) else value)
+        hydrator = hydrator_for(self.model_class, tuple(names))
+        self.load_from_model(hydrator.model(values), dict(zip(names, values)))
 
     def load_from_proxy_row(self, proxy_row_index: int):
         """从 QSortFilterProxyModel 的指定行加载数据（支持多层代理）"""
@@ -681,11 +724,22 @@ class PydanticFormWidget(QWidget):
         Returns:
             对应的字段名（如"name"），如果找不到则返回None
         """
+        if self.columns is not None:
+            return self.columns.field_by_title(title)
         for field_name, field_info in self.model_class.model_fields.items():
             if field_info.title == title:
                 return field_name
         return None
 
+    def _get_field_name_by_column(self, source_model, column: int) -> Optional[str]:
+        """根据源模型的列索引获取字段名，有列注册表时不依赖表头文本"""
+        if self.columns is not None:
+            return self.columns.field(column)
+        # 获取表格列标题（中文）
+        column_title = source_model.headerData(column, Qt.Orientation.Horizontal)
+        # 将标题转换为字段名，找不到时直接使用列标题
+        return self._get_field_name_by_title(column_title) or column_title
+
     def save_to_proxy_model(self) -> bool:
         """将表单数据保存到代理模型对应的源模型（支持新增和修改）"""
         logger.info("开始保存表单数据到代理模型")
@@ -720,7 +774,25 @@ class PydanticFormWidget(QWidget):
 
             filtered_data[field_name] = value
 
+        # 修改时只提交改过的字段，其他人同时修改的其他字段不会被覆盖
+        if self.proxy_row_index is not None and self._loaded_data is not None:
+            dirty = set(self.dirty_fields())
+            filtered_data = {k: v for k, v in filtered_data.items() if k in dirty}
+            if not filtered_data:
+                logger.info("没有修改的字段")
+                return True
         logger.debug(f"过滤后的数据: {filtered_data}")
+
+        # === 自定义提交（如记入撤销栈） ===
+        if self.commit_handler is not None:
+            base = self.loaded_record if self.proxy_row_index is not None else None
+            if not self.commit_handler(filtered_data, base):
+                logger.warning("提交处理函数返回失败")
+                return False
+            self.mark_clean()
+            logger.info("数据已提交")
+            return True
+
         source_model = self.proxy_model.sourceModel()
 
         # === 新增记录 ===
@@ -729,15 +801,7 @@ class PydanticFormWidget(QWidget):
             row = source_model.rowCount()
             source_model.insertRow(row)
             for i in range(source_model.columnCount()):
-                # 获取表格列标题（中文）
-                column_title = source_model.headerData(i, Qt.Orientation.Horizontal)
-                # 将标题转换为字段名
-                field_name = self._get_field_name_by_title(column_title)
-
-                # 如果找不到对应的字段名，则直接使用列标题
-                if field_name is None:
-                    field_name = column_title
-
+                field_name = self._get_field_name_by_column(source_model, i)
                 if field_name in filtered_data:
                     value = filtered_data[field_name]
                     if isinstance(value, py_date):
@@ -753,15 +817,7 @@ class PydanticFormWidget(QWidget):
             )
             source_row = source_index.row()
             for i in range(source_model.columnCount()):
-                # 获取表格列标题（中文）
-                column_title = source_model.headerData(i, Qt.Orientation.Horizontal)
-                # 将标题转换为字段名
-                field_name = self._get_field_name_by_title(column_title)
-
-                # 如果找不到对应的字段名，则直接使用列标题
-                if field_name is None:
-                    field_name = column_title
-
+                field_name = self._get_field_name_by_column(source_model, i)
                 if field_name in filtered_data:
                     value = filtered_data[field_name]
                     if isinstance(value, py_date):
@@ -796,6 +852,7 @@ class PydanticFormWidget(QWidget):
                 logger.error(f"保存回调执行失败: {str(e)}", exc_info=True)
                 return False
 
+        self.mark_clean()
         logger.info("数据保存成功")
         return True
 
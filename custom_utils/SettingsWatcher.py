@@ -0,0 +1,52 @@
+import os
+import logging
+
+from PySide6.QtCore import QObject, QFileSystemWatcher, QTimer, Signal
+
+from custom_utils.settings import AppSettings, diff_settings, load_settings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class SettingsWatcher(QObject):
+    """
+    监视配置文件，其他工位修改后自动重新加载
+
+    settingsChanged(settings, changed_keys)：changed_keys 为 diff_settings 的结果
+    """
+
+    settingsChanged = Signal(object, object)
+
+    def __init__(self, path: str, parent=None, debounce_ms: int = 300):
+        super().__init__(parent)
+        self.path = os.path.abspath(path)
+        self.settings: AppSettings = load_settings(self.path)
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(debounce_ms)
+        self._debounce.timeout.connect(self.reload)
+
+        # 同时监视目录：编辑器“先写临时文件再替换”会让文件监视失效
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.addPath(os.path.dirname(self.path))
+        if os.path.exists(self.path):
+            self._watcher.addPath(self.path)
+        self._watcher.fileChanged.connect(self._on_changed)
+        self._watcher.directoryChanged.connect(self._on_changed)
+
+    def _on_changed(self, _path):
+        if os.path.exists(self.path) and self.path not in self._watcher.files():
+            self._watcher.addPath(self.path)
+        self._debounce.start()
+
+    def reload(self):
+        """重新读取配置，有变化时发出 settingsChanged"""
+        new = load_settings(self.path)
+        changed = diff_settings(self.settings, new)
+        if not changed:
+            return
+        self.settings = new
+        logger.info(f"配置已更新: {', '.join(sorted(changed))}")
+        self.settingsChanged.emit(new, changed)
@@ -0,0 +1,17 @@
+from PySide6.QtSql import QSqlTableModel
+
+from custom_utils import metrics
+
+
+class TimedSqlTableModel(QSqlTableModel):
+    """
+    记录 select/submitAll 耗时的 QSqlTableModel
+    """
+
+    def select(self) -> bool:
+        with metrics.timer(f"sql.select.{self.tableName()}"):
+            return super().select()
+
+    def submitAll(self) -> bool:
+        with metrics.timer(f"sql.submit.{self.tableName()}"):
+            return super().submitAll()
@@ -0,0 +1,133 @@
+import logging
+import sqlite3
+
+from PySide6.QtCore import QTimer, Signal
+from PySide6.QtGui import QUndoCommand, QUndoStack
+
+from custom_utils import db
+from custom_utils.commands import EditJigCommand, JigCommand, WriteBuffer
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# QUndoCommand.id()：可以合并的命令
+_EDIT_ID = 1
+
+
+class JigUndoCommand(QUndoCommand):
+    """
+    把 JigCommand 包装为 QUndoCommand，redo/undo 只是把写入排队
+
+    :param command: 要执行的命令
+    :param buffer: 写入队列
+    :param applied: 命令已经写入数据库（如取用/归还），第一次 redo 不再执行
+    """
+
+    def __init__(self, command: JigCommand, buffer: WriteBuffer, applied=False):
+        super().__init__(command.text)
+        self.command = command
+        self.buffer = buffer
+        self._applied = applied
+
+    def redo(self):
+        if self._applied:
+            self._applied = False
+            return
+        self.buffer.push(self.command)
+
+    def undo(self):
+        self.buffer.push(self.command, undo=True)
+
+    def id(self):
+        return _EDIT_ID if isinstance(self.command, EditJigCommand) else -1
+
+    def mergeWith(self, other):
+        if not self.command.merge(other.command):
+            return False
+        self.buffer.absorb(self.command, other.command)
+        self.setText(self.command.text)
+        return True
+
+
+class JigUndoStack(QUndoStack):
+    """
+    治具修改的撤销/重做栈，写入在短定时器到期后合并为一个事务
+
+    连续的修改、撤销和重做只提交一次；尚未写入就被撤销的命令直接抵消。
+    某个命令写入失败（其他工位已修改或删除）时，撤销记录不再可信，整个栈被清空。
+
+    flushed(applied)：写入完成，applied 为写入的操作数
+    flushFailed(message)：有命令写入失败，message 可直接显示给用户
+
+    :param db_path: 数据库路径
+    :param parent: 父对象
+    :param interval_ms: 合并写入的等待时间
+    :param limit: 最多保留的撤销步数
+    :param install_schema: 见 WriteBuffer
+    """
+
+    flushed = Signal(int)
+    flushFailed = Signal(str)
+
+    def __init__(
+        self,
+        db_path: str = db.jig_db_path,
+        parent=None,
+        interval_ms: int = 500,
+        limit: int = 100,
+        install_schema: bool = True,
+    ):
+        super().__init__(parent)
+        self.setUndoLimit(limit)
+        self.buffer = WriteBuffer(db_path, install_schema)
+
+        # 不重新计时：持续操作时最迟 interval_ms 后写入
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self.indexChanged.connect(self._schedule)
+
+    def _schedule(self, _index=None):
+        if len(self.buffer) and not self._timer.isActive():
+            self._timer.start()
+
+    def pushCommand(self, command: JigCommand, applied: bool = False):
+        """
+        执行命令并记入撤销栈
+
+        :param applied: 命令已经写入数据库
+        """
+        self.push(JigUndoCommand(command, self.buffer, applied))
+        self._schedule()
+        logger.info(command.text)
+
+    def flush(self) -> bool:
+        """立即写入排队的操作，全部成功时返回 True"""
+        self._timer.stop()
+        try:
+            result = self.buffer.flush()
+        except sqlite3.Error as e:
+            logger.error(f"写入修改失败: {e}")
+            self.clear()
+            self.flushFailed.emit(f"写入修改失败: {e}\n撤销记录已清空")
+            self.flushed.emit(0)
+            return False
+        if result.failed:
+            self.clear()
+            messages = "\n".join(message for _, _, message in result.failed)
+            self.flushFailed.emit(f"{messages}\n撤销记录已清空")
+        if result.applied or result.failed:
+            self.flushed.emit(result.applied)
+        return not result.failed
+
+    def current(self, jig_ids):
+        """治具的当前值（包括尚未写入的修改），已删除的治具不在结果中"""
+        if self.buffer.needs_flush(jig_ids):
+            self.flush()
+        return self.buffer.current(jig_ids)
+
+    def close(self):
+        """写入排队的操作并关闭连接"""
+        self.flush()
+        self.buffer.close()
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import hmac
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from custom_utils.mails import verify_login
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 验证结果
+AUTH_CACHED = "cached"
+AUTH_VERIFIED = "verified"
+AUTH_FAILED = "failed"
+
+# 验证函数签名：(工号, 邮箱, 密码, 超时秒数) -> 是否通过
+Verifier = Callable[[str, str, str, float], bool]
+
+
+def _hash_token(salt: str, username: str, email: str, password: str) -> str:
+    data = "\0".join([username, email.lower(), password]).encode("utf-8")
+    return hashlib.pbkdf2_hmac("sha256", data, bytes.fromhex(salt), 50000).hex()
+
+
+class SessionCache:
+    """
+    本机登录会话缓存，只保存加盐哈希，不保存密码
+
+    :param path: 缓存文件路径（JSON）
+    :param ttl_hours: 会话有效时长（小时），0 表示不缓存
+    """
+
+    def __init__(self, path: str, ttl_hours: float = 12):
+        self.path = path
+        self.ttl_hours = ttl_hours
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"会话缓存读取失败，将忽略: {e}")
+            return {}
+
+    def _save(self, sessions: Dict[str, dict]):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sessions, f)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, username: str, email: str, password: str) -> bool:
+        """凭据与未过期的缓存会话一致时返回 True"""
+        if self.ttl_hours <= 0:
+            return False
+        with self._lock:
+            entry = self._load().get(username)
+        if not entry or entry.get("expires", 0) < time.time():
+            return False
+        token = _hash_token(entry["salt"], username, email, password)
+        return hmac.compare_digest(token, entry["hash"])
+
+    def store(self, username: str, email: str, password: str):
+        if self.ttl_hours <= 0:
+            return
+        salt = os.urandom(16).hex()
+        with self._lock:
+            sessions = self._load()
+            now = time.time()
+            # 顺便清理过期会话
+            sessions = {k: v for k, v in sessions.items() if v.get("expires", 0) > now}
+            sessions[username] = {
+                "salt": salt,
+                "hash": _hash_token(salt, username, email, password),
+                "expires": now + self.ttl_hours * 3600,
+            }
+            self._save(sessions)
+        logger.debug(f"已缓存 {username} 的登录会话")
+
+    def invalidate(self, username: str):
+        with self._lock:
+            sessions = self._load()
+            if sessions.pop(username, None) is not None:
+                self._save(sessions)
+
+
+def smtp_verifier(username: str, email: str, password: str, timeout: float) -> bool:
+    """登录邮件服务器验证身份；登录通知邮件由发件箱另行投递"""
+    return verify_login(username, password, timeout)
+
+
+def local_verifier(accounts: Dict[str, str]) -> Verifier:
+    """
+    不访问网络的验证函数，用于测试或离线环境
+
+    :param accounts: 工号 -> 密码
+    """
+
+    def verify(username: str, email: str, password: str, timeout: float) -> bool:
+        return accounts.get(username) == password
+
+    return verify
+
+
+class Authenticator:
+    """
+    登录验证：优先使用本机缓存会话，未命中时调用验证函数
+
+    :param cache: 会话缓存，None 表示不缓存
+    :param verifier: 验证函数，默认通过 SMTP 验证
+    """
+
+    def __init__(
+        self,
+        cache: Optional[SessionCache] = None,
+        verifier: Verifier = smtp_verifier,
+    ):
+        self.cache = cache
+        self.verifier = verifier
+
+    def authenticate(
+        self, username: str, email: str, password: str, timeout: float = 15
+    ) -> str:
+        """
+        :return: AUTH_CACHED / AUTH_VERIFIED / AUTH_FAILED
+        """
+        if self.cache and self.cache.lookup(username, email, password):
+            logger.info(f"{username} 使用缓存会话登录")
+            return AUTH_CACHED
+        if not self.verifier(username, email, password, timeout):
+            return AUTH_FAILED
+        if self.cache:
+            self.cache.store(username, email, password)
+        return AUTH_VERIFIED
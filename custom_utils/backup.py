@@ -0,0 +1,265 @@
+import os
+import re
+import sys
+import gzip
+import glob
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from custom_utils import db, metrics
+from custom_utils.settings import BackupSettings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".db.gz"
+# 恢复前当前数据库的安全副本放在备份目录的子目录中，不参与轮换和“最新备份”
+SAFETY_SUBDIR = "before-restore"
+
+
+class BackupError(Exception):
+    pass
+
+
+def backup_dir(settings: BackupSettings) -> str:
+    """备份目录，相对路径以程序目录为基准"""
+    return os.path.join(db.root_path, settings.directory)
+
+
+def _integrity_check(conn: sqlite3.Connection):
+    result = conn.execute("PRAGMA integrity_check").fetchall()
+    if result != [("ok",)]:
+        raise BackupError(f"完整性检查失败: {result[:5]}")
+
+
+def _gzip(src: str, dest: str):
+    with open(src, "rb") as f_in, gzip.open(dest, "wb", compresslevel=6) as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+
+def _gunzip(src: str, dest: str):
+    with gzip.open(src, "rb") as f_in, open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+
+def backup_database(
+    src_path: str,
+    dest_dir: str,
+    name: Optional[str] = None,
+    pages: int = 256,
+    sleep: float = 0.01,
+) -> str:
+    """
+    在线备份单个数据库并压缩
+
+    使用 SQLite 备份 API，每步只复制 pages 页并休眠 sleep 秒，
+    期间其他连接可以正常读写；复制完成后对副本做完整性检查。
+
+    :return: 备份文件路径（.db.gz）
+    """
+    name = name or os.path.splitext(os.path.basename(src_path))[0]
+    os.makedirs(dest_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    final_path = os.path.join(dest_dir, f"{name}-{stamp}{SUFFIX}")
+    tmp_path = os.path.join(dest_dir, f".{name}-{stamp}.partial")
+
+    with metrics.timer(f"backup.{name}"):
+        src = db.connect(src_path)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst, pages=pages, sleep=sleep)
+            _integrity_check(dst)
+        except Exception:
+            dst.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            src.close()
+        dst.close()
+
+        try:
+            _gzip(tmp_path, final_path + ".partial")
+            os.replace(final_path + ".partial", final_path)
+        finally:
+            for path in (tmp_path, final_path + ".partial"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    logger.info(f"已备份 {src_path} -> {final_path}")
+    return final_path
+
+
+def list_backups(dest_dir: str, name: str) -> List[str]:
+    """某个数据库的定时/手动备份（{name}-YYYYMMDD-HHMMSS.db.gz），按时间从旧到新"""
+    pattern = re.compile(rf"{re.escape(name)}-\d{{8}}-\d{{6}}{re.escape(SUFFIX)}")
+    return sorted(
+        path
+        for path in glob.glob(os.path.join(dest_dir, f"{glob.escape(name)}-*{SUFFIX}"))
+        if pattern.fullmatch(os.path.basename(path))
+    )
+
+
+def rotate(dest_dir: str, name: str, keep: int) -> List[str]:
+    """只保留最近 keep 份备份，返回删除的文件"""
+    removed = list_backups(dest_dir, name)[:-keep]
+    for path in removed:
+        os.remove(path)
+        logger.debug(f"已删除旧备份: {path}")
+    return removed
+
+
+def backup_all(settings: BackupSettings, databases: Dict[str, str] = None) -> List[str]:
+    """备份所有数据库并轮换旧备份"""
+    dest_dir = backup_dir(settings)
+    paths = []
+    for name, path in (databases or db.DATABASES).items():
+        if not os.path.exists(path):
+            continue
+        paths.append(
+            backup_database(
+                path,
+                dest_dir,
+                name,
+                pages=settings.pages_per_step,
+                sleep=settings.step_sleep_ms / 1000,
+            )
+        )
+        rotate(dest_dir, name, settings.keep)
+    return paths
+
+
+def restore(snapshot_path: str, target_path: str, safety_dir: Optional[str] = None):
+    """
+    从备份恢复数据库
+
+    先解压并检查备份，再把当前数据库备份一份到 safety_dir 的 before-restore 子目录，
+    最后用备份 API 写入目标数据库（其他连接会看到恢复后的数据，不必替换文件）。
+    """
+    tmp_path = snapshot_path + ".restore"
+    if snapshot_path.endswith(".gz"):
+        _gunzip(snapshot_path, tmp_path)
+    else:
+        shutil.copyfile(snapshot_path, tmp_path)
+    try:
+        src = sqlite3.connect(tmp_path)
+        try:
+            _integrity_check(src)
+            if safety_dir and os.path.exists(target_path):
+                name = os.path.splitext(os.path.basename(target_path))[0]
+                backup_database(
+                    target_path, os.path.join(safety_dir, SAFETY_SUBDIR), name
+                )
+            dst = db.connect(target_path)
+            try:
+                src.backup(dst)
+            finally:
+                dst.close()
+        finally:
+            src.close()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info(f"已从 {snapshot_path} 恢复 {target_path}")
+
+
+class BackupScheduler:
+    """
+    定时备份线程
+
+    多个工位共用数据库和备份目录时，按目录中最新备份的时间判断是否到期，
+    因此同一周期内只会备份一次。
+
+    :param settings: 备份配置
+    :param check_interval: 检查是否到期的间隔（秒）
+    """
+
+    def __init__(self, settings: BackupSettings, check_interval: float = 300):
+        self.settings = settings
+        self.check_interval = check_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def update(self, settings: BackupSettings):
+        self.settings = settings
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="BackupScheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_due(self) -> bool:
+        newest = list_backups(backup_dir(self.settings), "jig")
+        if not newest:
+            return True
+        age = time.time() - os.path.getmtime(newest[-1])
+        return age >= self.settings.interval_hours * 3600
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.settings.enabled:
+                try:
+                    if self.is_due():
+                        backup_all(self.settings)
+                except Exception as e:
+                    metrics.inc("backup.error")
+                    logger.error(f"定时备份失败: {e}", exc_info=True)
+            self._stop.wait(self.check_interval)
+
+
+def main(argv=None):
+    from custom_utils.settings import load_settings
+
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_utils.backup", description="治具数据库备份与恢复"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backup", help="立即备份所有数据库")
+    p_list = sub.add_parser("list", help="列出备份")
+    p_list.add_argument("name", nargs="?", default="jig", choices=list(db.DATABASES))
+    p_restore = sub.add_parser("restore", help="从备份恢复")
+    p_restore.add_argument("snapshot", help="备份文件路径，或 latest")
+    p_restore.add_argument("--db", default="jig", choices=list(db.DATABASES))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    settings = load_settings(os.path.join(db.root_path, "config.ini")).backup
+    dest_dir = backup_dir(settings)
+
+    if args.command == "backup":
+        for path in backup_all(settings):
+            print(path)
+    elif args.command == "list":
+        for path in list_backups(dest_dir, args.name):
+            print(path)
+    elif args.command == "restore":
+        snapshot = args.snapshot
+        if snapshot == "latest":
+            backups = list_backups(dest_dir, args.db)
+            if not backups:
+                print("没有可用的备份", file=sys.stderr)
+                return 1
+            snapshot = backups[-1]
+        restore(snapshot, db.DATABASES[args.db], safety_dir=dest_dir)
+        print(f"已恢复 {db.DATABASES[args.db]} <- {snapshot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
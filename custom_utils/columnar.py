@@ -0,0 +1,363 @@
+import os
+import sys
+import glob
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from enum import Enum
+from datetime import date, datetime
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+from custom_utils import db, metrics
+from custom_utils.columns import ColumnRegistry, get_registry
+from custom_utils.settings import AnalyticsSettings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 列式格式：扩展名 -> 格式名
+FORMATS = {".parquet": "parquet", ".arrow": "arrow"}
+
+# 每个行组（Arrow 记录批）的行数
+DEFAULT_BATCH = 65536
+
+# julianday 与 Unix 纪元（date32 的零点）之差
+_EPOCH_JULIAN = 2440587.5
+
+
+class ColumnarError(Exception):
+    """列式导出失败（缺少 pyarrow、格式不支持等）"""
+
+
+def _pyarrow():
+    """pyarrow 是可选依赖，只在列式导出时导入"""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ColumnarError("列式导出需要安装 pyarrow：pip install pyarrow") from e
+    return pyarrow
+
+
+def format_of(path: str) -> str:
+    """按扩展名判断格式"""
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ColumnarError(f"不支持的列式格式: {path}")
+    return fmt
+
+
+class _Column(NamedTuple):
+    field: str
+    # SELECT 中的表达式
+    expr: str
+    # date / enum / int32 / int64 / float64 / string
+    kind: str
+    title: str
+    # enum 列的字典（固定顺序，所有行组共用）
+    dictionary: Optional[List[str]] = None
+
+
+def _declared_kinds(conn: sqlite3.Connection, table: str) -> dict:
+    """不在模型中的动态列按声明类型映射"""
+    kinds = {}
+    for row in conn.execute(f"PRAGMA table_info({table})"):
+        declared = (row[2] or "").upper()
+        if "INT" in declared:
+            kinds[row[1]] = "int64"
+        elif any(t in declared for t in ("REAL", "FLOA", "DOUB")):
+            kinds[row[1]] = "float64"
+        elif declared == "DATE":
+            kinds[row[1]] = "date"
+        else:
+            kinds[row[1]] = "string"
+    return kinds
+
+
+def _plan(
+    conn: sqlite3.Connection, registry: ColumnRegistry, table: str
+) -> List[_Column]:
+    """按 JigDynamic 的字段类型确定每一列的 Arrow 类型和读取表达式"""
+    declared = _declared_kinds(conn, table)
+    model_fields = registry.model_class.model_fields
+    plan = []
+    for column, field in zip(declared, registry.fields):
+        info = model_fields.get(field)
+        annotation = info.annotation if info else None
+        quoted = f'{table}."{column}"'
+        dictionary = None
+        if annotation is date:
+            kind = "date"
+        elif isinstance(annotation, type) and issubclass(annotation, Enum):
+            kind = "enum"
+            # 模型中的枚举值在前，库中出现的其他值按字母顺序在后
+            values = [member.value for member in annotation]
+            extra = sorted(
+                row[0]
+                for row in conn.execute(f"SELECT DISTINCT {quoted} FROM {table}")
+                if row[0] is not None and row[0] not in values
+            )
+            dictionary = values + extra
+        elif annotation is int:
+            # 主键可能超过 int32，计数类字段有 CHECK 约束上限
+            extra = info.json_schema_extra or {}
+            kind = "int64" if extra.get("primary_key") else "int32"
+        elif annotation is float:
+            kind = "float64"
+        elif info is not None:
+            kind = "string"
+        else:
+            kind = declared[column]
+        # 日期在 SQL 中直接换算成自纪元的天数，非法日期为 NULL
+        expr = (
+            f"CAST(julianday({quoted}) - {_EPOCH_JULIAN} AS INTEGER)"
+            if kind == "date"
+            else quoted
+        )
+        plan.append(_Column(field, expr, kind, registry.title(field), dictionary))
+    return plan
+
+
+def _schema(pa, plan: List[_Column]):
+    types = {
+        "date": pa.date32(),
+        "enum": pa.dictionary(pa.int32(), pa.string()),
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+    }
+    fields = [
+        pa.field(c.field, types[c.kind], metadata={"title": c.title}) for c in plan
+    ]
+    # 字段标题和导出时间写入元数据，分析工具中可还原中文表头
+    return pa.schema(
+        fields,
+        metadata={
+            "titles": json.dumps({c.field: c.title for c in plan}, ensure_ascii=False),
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+        },
+    )
+
+
+def _array(pa, column: _Column, values: Sequence):
+    if column.kind == "date":
+        return pa.array(values, pa.int32()).cast(pa.date32())
+    if column.kind == "enum":
+        dictionary = pa.array(column.dictionary, pa.string())
+        indices = pa.compute.index_in(pa.array(values, pa.string()), dictionary)
+        return pa.DictionaryArray.from_arrays(indices, dictionary)
+    if column.kind in ("int32", "int64", "float64"):
+        return pa.array(values, getattr(pa, column.kind)())
+    # 文本列中可能混有其他类型的值
+    return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def _batches(
+    pa,
+    cursor: sqlite3.Cursor,
+    plan: List[_Column],
+    schema,
+    batch_size: int,
+) -> Iterator:
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        arrays = [
+            _array(pa, column, values) for column, values in zip(plan, zip(*rows))
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_table(
+    db_path: str,
+    path: str,
+    ids: Optional[Sequence[int]] = None,
+    table: str = db.JIG_TABLE,
+    batch_size: int = DEFAULT_BATCH,
+) -> int:
+    """
+    把治具表导出为 Parquet 或 Arrow IPC 文件（按扩展名），返回导出行数
+
+    直接从 SQL 游标按批读取，每批写成一个行组，不经过表格模型。
+    日期为 date32，枚举为字典编码，计数为 int32。
+
+    :param db_path: 数据库路径
+    :param path: 目标文件，.parquet 或 .arrow
+    :param ids: 只导出这些治具（按给定顺序），默认全部按 id 排序
+    :param table: 表名
+    :param batch_size: 每个行组的行数
+    """
+    pa = _pyarrow()
+    fmt = format_of(path)
+    registry = get_registry(db_path, table)
+    conn = db.connect(db_path)
+    tmp_path = path + ".partial"
+    rows = 0
+    try:
+        # 在同一个读事务中取字典和数据，导出的是同一时刻的数据
+        conn.execute("BEGIN")
+        plan = _plan(conn, registry, table)
+        schema = _schema(pa, plan)
+        select = ", ".join(c.expr for c in plan)
+        if ids is None:
+            cursor = conn.execute(f"SELECT {select} FROM {table} ORDER BY id")
+        else:
+            cursor = conn.execute(
+                f"SELECT {select} FROM json_each(?) AS s "
+                f"JOIN {table} ON {table}.id = s.value ORDER BY s.key",
+                (json.dumps([int(i) for i in ids]),),
+            )
+        with metrics.timer(f"export.{fmt}"):
+            if fmt == "parquet":
+                writer = pa.parquet.ParquetWriter(tmp_path, schema, compression="zstd")
+            else:
+                writer = pa.ipc.new_file(
+                    tmp_path,
+                    schema,
+                    options=pa.ipc.IpcWriteOptions(compression="zstd"),
+                )
+            try:
+                for batch in _batches(pa, cursor, plan, schema, batch_size):
+                    writer.write_batch(batch)
+                    rows += batch.num_rows
+            finally:
+                writer.close()
+        conn.rollback()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    logger.info(f"已导出 {rows} 行到 {path}")
+    return rows
+
+
+def read_table(path: str):
+    """读取导出的文件，返回 pyarrow.Table"""
+    pa = _pyarrow()
+    if format_of(path) == "parquet":
+        return pa.parquet.read_table(path)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+# ---------- 定时分析快照 ----------
+def analytics_dir(settings: AnalyticsSettings) -> str:
+    """分析快照目录，相对路径以程序目录为基准"""
+    return os.path.join(db.root_path, settings.directory)
+
+
+def list_snapshots(dest_dir: str) -> List[str]:
+    """分析快照文件，按时间从旧到新"""
+    return sorted(
+        path
+        for ext in FORMATS
+        for path in glob.glob(os.path.join(dest_dir, f"jig-*{ext}"))
+    )
+
+
+def write_snapshot(settings: AnalyticsSettings, db_path: str = db.jig_db_path) -> str:
+    """导出一份完整库存快照并轮换旧文件，返回文件路径"""
+    dest_dir = analytics_dir(settings)
+    os.makedirs(dest_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(dest_dir, f"jig-{stamp}.{settings.format}")
+    export_table(db_path, path, batch_size=settings.batch_size)
+    for old in list_snapshots(dest_dir)[: -settings.keep]:
+        os.remove(old)
+        logger.debug(f"已删除旧分析快照: {old}")
+    return path
+
+
+class AnalyticsScheduler:
+    """
+    定时导出分析快照
+
+    与备份相同，按目录中最新快照的时间判断是否到期，多个工位共用目录时同一周期只导出一次。
+
+    :param settings: 分析快照配置
+    :param check_interval: 检查是否到期的间隔（秒）
+    """
+
+    def __init__(self, settings: AnalyticsSettings, check_interval: float = 300):
+        self.settings = settings
+        self.check_interval = check_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def update(self, settings: AnalyticsSettings):
+        self.settings = settings
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="AnalyticsScheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_due(self) -> bool:
+        newest = list_snapshots(analytics_dir(self.settings))
+        if not newest:
+            return True
+        age = time.time() - os.path.getmtime(newest[-1])
+        return age >= self.settings.interval_hours * 3600
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.settings.enabled:
+                try:
+                    if self.is_due():
+                        write_snapshot(self.settings)
+                except Exception as e:
+                    metrics.inc("analytics.error")
+                    logger.error(f"导出分析快照失败: {e}", exc_info=True)
+            self._stop.wait(self.check_interval)
+
+
+def main(argv=None):
+    from custom_utils.settings import load_settings
+
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_utils.columnar",
+        description="治具表的 Parquet / Arrow 导出",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="导出治具表")
+    p_export.add_argument("path", help="目标文件，.parquet 或 .arrow")
+    p_export.add_argument("--db", default=db.jig_db_path, help="数据库路径")
+    sub.add_parser("snapshot", help="立即导出分析快照")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.command == "export":
+            rows = export_table(args.db, args.path)
+            print(f"{args.path}: {rows} 行")
+        elif args.command == "snapshot":
+            settings = load_settings(os.path.join(db.root_path, "config.ini"))
+            print(write_snapshot(settings.analytics))
+    except ColumnarError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from custom_utils.db import JIG_TABLE, connect, jig_db_path
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def read_table_columns(conn: sqlite3.Connection, table: str = JIG_TABLE) -> List[str]:
+    """按数据库中的实际顺序返回表的列名"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+class ColumnRegistry:
+    """
+    列注册表：字段名、列索引、表头标题之间的 O(1) 映射
+
+    列索引以数据库的实际列顺序（PRAGMA table_info）为准，
+    标题取自 Pydantic 模型的 Field(title=...)；不在模型中的列以列名作为标题。
+
+    :param model_class: Pydantic 模型类
+    :param db_columns: 数据库中的列名（按列顺序）
+    """
+
+    def __init__(self, model_class: Type[BaseModel], db_columns: List[str]):
+        self.model_class = model_class
+        self._fields: List[str] = []
+        self._field_to_index: Dict[str, int] = {}
+        self._field_to_title: Dict[str, str] = {}
+        self._title_to_field: Dict[str, str] = {}
+
+        # SQLite 列名不区分大小写，统一按模型中的写法登记
+        model_fields = {name.lower(): name for name in model_class.model_fields}
+        for i, column in enumerate(db_columns):
+            field = model_fields.get(column.lower(), column)
+            field_info = model_class.model_fields.get(field)
+            title = (field_info.title if field_info else None) or field
+            self._fields.append(field)
+            self._field_to_index[field] = i
+            self._field_to_index.setdefault(field.lower(), i)
+            self._field_to_title[field] = title
+            self._title_to_field[title] = field
+
+        missing = [f for f in model_class.model_fields if f not in self._field_to_index]
+        if missing:
+            logger.warning(f"数据库中缺少模型字段: {missing}")
+
+    def __len__(self):
+        return len(self._fields)
+
+    @property
+    def fields(self) -> List[str]:
+        """按列顺序的字段名"""
+        return list(self._fields)
+
+    def index(self, field: str) -> int:
+        """字段名 -> 列索引，不存在时返回 -1"""
+        idx = self._field_to_index.get(field)
+        if idx is None:
+            idx = self._field_to_index.get(field.lower(), -1)
+        return idx
+
+    def field(self, index: int) -> Optional[str]:
+        """列索引 -> 字段名"""
+        if 0 <= index < len(self._fields):
+            return self._fields[index]
+        return None
+
+    def title(self, field: str) -> str:
+        """字段名 -> 表头标题"""
+        return self._field_to_title.get(field, field)
+
+    def field_by_title(self, title: str) -> Optional[str]:
+        """表头标题 -> 字段名"""
+        return self._title_to_field.get(title)
+
+    def index_by_title(self, title: str) -> int:
+        field = self._title_to_field.get(title)
+        return -1 if field is None else self._field_to_index[field]
+
+    def titles(self) -> List[str]:
+        """按列顺序的表头标题"""
+        return [self._field_to_title[f] for f in self._fields]
+
+    def is_model_field(self, field: str) -> bool:
+        return field in self.model_class.model_fields
+
+
+# 缓存：(数据库路径, 表名) -> (schema_version, ColumnRegistry)
+_registries: Dict[Tuple[str, str], Tuple[int, ColumnRegistry]] = {}
+_lock = threading.Lock()
+
+
+def get_registry(
+    db_path: str = jig_db_path,
+    table: str = JIG_TABLE,
+    model_class: Optional[Type[BaseModel]] = None,
+) -> ColumnRegistry:
+    """
+    获取表的列注册表，只有表结构变化（schema_version 改变）时才重建
+
+    :param db_path: 数据库路径
+    :param table: 表名
+    :param model_class: Pydantic 模型类，默认为 Model.JigDynamic
+    """
+    if model_class is None:
+        from Model import JigDynamic
+
+        model_class = JigDynamic
+
+    key = (db_path, table.lower())
+    conn = connect(db_path)
+    try:
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        with _lock:
+            cached = _registries.get(key)
+        if (
+            cached
+            and cached[0] == schema_version
+            and cached[1].model_class is model_class
+        ):
+            return cached[1]
+        registry = ColumnRegistry(model_class, read_table_columns(conn, table))
+    finally:
+        conn.close()
+
+    with _lock:
+        _registries[key] = (schema_version, registry)
+    logger.debug(f"已建立列注册表: {table} ({len(registry)} 列)")
+    return registry
@@ -0,0 +1,451 @@
+"""
+治具修改命令：每次修改都是一个可撤销的命令对象，保存修改前后的值
+
+命令不直接写库，而是交给 WriteBuffer 排队，由 flush() 在一个事务中统一写入。
+尚未写入的命令被撤销时与之前排队的执行相互抵消，不访问数据库。
+
+    buffer = WriteBuffer(db_path)
+    buffer.push(EditJigCommand(jig_id, before, after))
+    buffer.push(command, undo=True)
+    buffer.flush()
+"""
+
+import time
+import sqlite3
+import logging
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from custom_utils import db, metrics
+from custom_utils.repository import ROW_VERSION, ensure_row_version
+from Model import JigUseStatus
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 同一治具的连续修改在此时间内合并为一步撤销
+MERGE_SECONDS = 2.0
+
+
+class CommandError(Exception):
+    """命令无法执行或撤销，str(e) 为可直接显示给用户的提示"""
+
+
+class FieldConflict(NamedTuple):
+    field: str
+    # 本次修改所基于的值
+    base: Any
+    # 数据库中的当前值（他人修改后）
+    theirs: Any
+    # 本次要写入的值
+    mine: Any
+
+
+class ConflictError(CommandError):
+    """其他连接已修改了相同的字段"""
+
+    def __init__(self, message: str, conflicts: List[FieldConflict]):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+
+def sql_value(value):
+    """表单数据 -> 数据库中的值：日期转为 yyyy-MM-dd，枚举取值"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def read_rows(
+    conn: sqlite3.Connection, ids: Sequence[int], table: str = db.JIG_TABLE
+) -> List[Dict[str, Any]]:
+    """按 id 读取整行（列名 -> 值），包括模型之外动态添加的列"""
+    if not ids:
+        return []
+    placeholders = ", ".join("?" * len(ids))
+    cursor = conn.execute(
+        f"SELECT * FROM {table} WHERE id IN ({placeholders}) ORDER BY id", list(ids)
+    )
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def field_conflicts(
+    base: Dict[str, Any], current: Dict[str, Any], mine: Dict[str, Any]
+) -> List[FieldConflict]:
+    """
+    字段级冲突：本次要修改的字段在 base 之后被他人改成了别的值
+
+    他人只修改了其他字段，或改成了相同的值，都不算冲突。
+    行版本相同时表示期间没有任何修改，不再逐个比较。
+
+    :param base: 修改所基于的行（包含 row_version 时先比较版本）
+    :param current: 数据库中的当前行
+    :param mine: 要写入的字段
+    """
+    version = base.get(ROW_VERSION)
+    if version is not None and version == current.get(ROW_VERSION):
+        return []
+    conflicts = []
+    for k, v in mine.items():
+        if k not in current or k not in base:
+            continue
+        theirs, old, new = current[k], sql_value(base[k]), sql_value(v)
+        if theirs != old and theirs != new:
+            conflicts.append(FieldConflict(k, old, theirs, new))
+    return conflicts
+
+
+def _insert(conn: sqlite3.Connection, table: str, row: Dict[str, Any]) -> int:
+    columns = [c for c, v in row.items() if not (c == "id" and v is None)]
+    cursor = conn.execute(
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})",
+        [row[c] for c in columns],
+    )
+    return cursor.lastrowid
+
+
+class JigCommand:
+    """
+    可撤销的修改
+
+    apply/revert 在 WriteBuffer 的事务中执行，失败时抛出 CommandError，
+    该命令的写入被回滚，同一批次中的其他命令不受影响。
+    """
+
+    text = ""
+    table = db.JIG_TABLE
+
+    def __init__(self):
+        self.time = time.monotonic()
+
+    def apply(self, conn: sqlite3.Connection):
+        raise NotImplementedError
+
+    def revert(self, conn: sqlite3.Connection):
+        raise NotImplementedError
+
+    def merge(self, other: "JigCommand") -> bool:
+        """把紧随其后的 other 合并进来，成功时返回 True"""
+        return False
+
+    def jig_ids(self) -> Tuple[int, ...]:
+        """涉及的治具 id（新增尚未写入时为空）"""
+        return ()
+
+
+class EditJigCommand(JigCommand):
+    """
+    修改一个治具的若干字段
+
+    按行版本更新（UPDATE ... WHERE id = ? AND row_version = ?），版本不符时说明期间有其他修改，
+    逐个字段比较：要改的字段仍是预期的值时按新版本写入，否则抛出 ConflictError。
+
+    :param jig_id: 治具 id
+    :param before: 修改前的值（只含变化的字段）
+    :param after: 修改后的值
+    :param version: before 所在的行版本
+    """
+
+    def __init__(
+        self,
+        jig_id: int,
+        before: Dict[str, Any],
+        after: Dict[str, Any],
+        version: Optional[int] = None,
+    ):
+        super().__init__()
+        self.jig_id = jig_id
+        self.before = dict(before)
+        self.after = dict(after)
+        self.version = version
+        self.text = f"修改治具 {after.get('no') or before.get('no') or jig_id}"
+
+    @classmethod
+    def from_row(
+        cls, row: Dict[str, Any], data: Dict[str, Any]
+    ) -> Optional["EditJigCommand"]:
+        """比较当前行和表单数据，没有变化时返回 None"""
+        changed = {
+            k: sql_value(v)
+            for k, v in data.items()
+            if k != "id" and k in row and row[k] != sql_value(v)
+        }
+        if not changed:
+            return None
+        command = cls(
+            row["id"], {k: row[k] for k in changed}, changed, row.get(ROW_VERSION)
+        )
+        command.text = f"修改治具 {row.get('no', row['id'])}"
+        return command
+
+    def _set(self, conn: sqlite3.Connection, values: Dict[str, Any], version) -> bool:
+        assignments = ", ".join(f"{k} = ?" for k in values)
+        cursor = conn.execute(
+            f"UPDATE {self.table} SET {assignments}, {ROW_VERSION} = ? "
+            f"WHERE id = ? AND {ROW_VERSION} = ?",
+            [*values.values(), version + 1, self.jig_id, version],
+        )
+        if cursor.rowcount:
+            self.version = version + 1
+        return bool(cursor.rowcount)
+
+    def _update(
+        self,
+        conn: sqlite3.Connection,
+        values: Dict[str, Any],
+        expected: Dict[str, Any],
+    ):
+        if self.version is not None and self._set(conn, values, self.version):
+            return
+        rows = read_rows(conn, [self.jig_id], self.table)
+        if not rows:
+            raise CommandError(f"{self.text}: 治具已被删除")
+        conflicts = field_conflicts(expected, rows[0], values)
+        if conflicts:
+            fields = ", ".join(c.field for c in conflicts)
+            raise ConflictError(f"{self.text}: {fields} 已被其他人修改", conflicts)
+        self._set(conn, values, rows[0][ROW_VERSION])
+
+    def apply(self, conn):
+        self._update(conn, self.after, self.before)
+
+    def revert(self, conn):
+        self._update(conn, self.before, self.after)
+
+    def merge(self, other):
+        if (
+            not isinstance(other, EditJigCommand)
+            or other.jig_id != self.jig_id
+            or other.time - self.time > MERGE_SECONDS
+        ):
+            return False
+        for k, v in other.before.items():
+            self.before.setdefault(k, v)
+        self.after.update(other.after)
+        self.time = other.time
+        return True
+
+    def jig_ids(self):
+        return (self.jig_id,)
+
+
+class InsertJigCommand(JigCommand):
+    """
+    新增治具；第一次写入时由数据库分配 id，撤销后重做沿用同一个 id
+
+    :param row: 列名 -> 值
+    """
+
+    def __init__(self, row: Dict[str, Any]):
+        super().__init__()
+        self.row = {k: sql_value(v) for k, v in row.items()}
+        self.row.setdefault("id", None)
+        self.text = f"新增治具 {self.row.get('no', '')}".strip()
+
+    def apply(self, conn):
+        self.row["id"] = _insert(conn, self.table, self.row)
+
+    def revert(self, conn):
+        conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (self.row["id"],))
+
+    def jig_ids(self):
+        return (self.row["id"],) if self.row["id"] is not None else ()
+
+
+class DeleteJigsCommand(JigCommand):
+    """
+    删除若干治具，撤销时按原 id 重新插入整行
+
+    :param rows: read_rows 读到的整行
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        super().__init__()
+        self.rows = [dict(row) for row in rows]
+        if len(self.rows) == 1:
+            self.text = f"删除治具 {self.rows[0].get('no', '')}".strip()
+        else:
+            self.text = f"删除 {len(self.rows)} 个治具"
+
+    def apply(self, conn):
+        conn.executemany(
+            f"DELETE FROM {self.table} WHERE id = ?",
+            [(row["id"],) for row in self.rows],
+        )
+
+    def revert(self, conn):
+        try:
+            for row in self.rows:
+                _insert(conn, self.table, row)
+        except sqlite3.IntegrityError as e:
+            raise CommandError(f"无法恢复被删除的治具: {e}") from e
+
+    def jig_ids(self):
+        return tuple(row["id"] for row in self.rows)
+
+
+class StatusCommand(JigCommand):
+    """
+    取用/归还：切换使用状态，归还时使用次数和单次校验使用次数加一
+
+    更新带上原状态作为条件，其他工位已改变状态时撤销失败，不会覆盖对方的操作；
+    次数按增量回退，期间测试工位上报的次数不会丢失。
+
+    :param jig_id: 治具 id
+    :param no: 治具编号，用于显示
+    :param before: 原状态
+    :param after: 新状态
+    :param used_delta: 使用次数增量
+    """
+
+    def __init__(
+        self, jig_id: int, no: str, before: str, after: str, used_delta: int = 0
+    ):
+        super().__init__()
+        self.jig_id = jig_id
+        self.before = before
+        self.after = after
+        self.used_delta = used_delta
+        action = "取用" if after == JigUseStatus.USING.value else "归还"
+        self.text = f"{action}治具 {no}"
+
+    @classmethod
+    def checkout(cls, jig_id: int, no: str) -> "StatusCommand":
+        return cls(jig_id, no, JigUseStatus.UNUSE.value, JigUseStatus.USING.value)
+
+    @classmethod
+    def return_jig(cls, jig_id: int, no: str) -> "StatusCommand":
+        return cls(jig_id, no, JigUseStatus.USING.value, JigUseStatus.UNUSE.value, 1)
+
+    def _switch(self, conn: sqlite3.Connection, old: str, new: str, delta: int):
+        cursor = conn.execute(
+            f"""UPDATE {self.table} SET UseStatus = ?,
+            Usedcount = MAX(Usedcount + ?, 0),
+            CheckUsedcount = MAX(CheckUsedcount + ?, 0)
+            WHERE id = ? AND UseStatus = ?""",
+            (new, delta, delta, self.jig_id, old),
+        )
+        if cursor.rowcount == 0:
+            raise CommandError(f"{self.text}: 治具状态已被其他操作改变")
+
+    def apply(self, conn):
+        self._switch(conn, self.before, self.after, self.used_delta)
+
+    def revert(self, conn):
+        self._switch(conn, self.after, self.before, -self.used_delta)
+
+    def jig_ids(self):
+        return (self.jig_id,)
+
+
+class FlushResult(NamedTuple):
+    # 成功写入的操作数
+    applied: int
+    # 失败的操作：(命令, 是否为撤销, 提示)
+    failed: List[Tuple[JigCommand, bool, str]]
+
+
+class WriteBuffer:
+    """
+    排队的命令写入，flush() 在一个 BEGIN IMMEDIATE 事务中执行
+
+    每个操作使用各自的保存点，个别命令失败（冲突、约束）只回滚该命令。
+
+    :param db_path: 数据库路径
+    :param install_schema: 安装行版本（只读角色不修改在线库的结构，也不会写入）
+    """
+
+    def __init__(self, db_path: str = db.jig_db_path, install_schema: bool = True):
+        self.db_path = db_path
+        self.conn = db.connect(db_path)
+        self.conn.isolation_level = None  # 手动控制事务
+        if install_schema:
+            ensure_row_version(self.conn)
+        self._pending: List[Tuple[JigCommand, bool]] = []
+
+    def __len__(self):
+        return len(self._pending)
+
+    def push(self, command: JigCommand, undo: bool = False):
+        """排队执行（undo=False）或撤销（undo=True）一个命令"""
+        if self._pending:
+            last, last_undo = self._pending[-1]
+            if last is command and last_undo != undo:
+                # 尚未写入就被撤销（或撤销后马上重做），两者抵消
+                self._pending.pop()
+                metrics.inc("commands.cancelled")
+                return
+        self._pending.append((command, undo))
+
+    def absorb(self, command: JigCommand, other: JigCommand):
+        """other 已合并进 command：两者都在排队时只需写入 command 一次"""
+        if self._pending[-2:] == [(command, False), (other, False)]:
+            self._pending.pop()
+
+    def flush(self) -> FlushResult:
+        """
+        写入所有排队的操作
+
+        :raises sqlite3.Error: 无法开始或提交事务，排队的操作全部丢弃
+        """
+        if not self._pending:
+            return FlushResult(0, [])
+        pending, self._pending = self._pending, []
+        applied = 0
+        failed = []
+        with metrics.timer("commands.flush"):
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for command, undo in pending:
+                    self.conn.execute("SAVEPOINT command")
+                    try:
+                        (command.revert if undo else command.apply)(self.conn)
+                    except (CommandError, sqlite3.IntegrityError) as e:
+                        self.conn.execute("ROLLBACK TO command")
+                        failed.append((command, undo, str(e)))
+                        logger.warning(
+                            f"{'撤销' if undo else '执行'}{command.text}失败: {e}"
+                        )
+                    else:
+                        applied += 1
+                    self.conn.execute("RELEASE command")
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        metrics.inc("commands.flush.ops", len(pending))
+        logger.debug(f"写入 {applied} 个操作，失败 {len(failed)} 个")
+        return FlushResult(applied, failed)
+
+    def needs_flush(self, jig_ids: Sequence[int]) -> bool:
+        """
+        读取治具前是否需要先写入
+
+        字段修改可以叠加到数据库的值上；状态切换是增量写入，新增的 id 尚未分配，
+        删除和恢复改变了行是否存在，这些都要先写入再读取。
+        """
+        jig_ids = set(jig_ids)
+        for command, _ in self._pending:
+            if isinstance(command, EditJigCommand):
+                continue
+            ids = command.jig_ids()
+            if not ids or jig_ids.intersection(ids):
+                return True
+        return False
+
+    def current(self, jig_ids: Sequence[int]) -> List[Dict[str, Any]]:
+        """治具的当前值，叠加尚未写入的字段修改（调用前按 needs_flush 写入）"""
+        rows = read_rows(self.conn, jig_ids)
+        by_id = {row["id"]: row for row in rows}
+        for command, undo in self._pending:
+            if isinstance(command, EditJigCommand) and command.jig_id in by_id:
+                by_id[command.jig_id].update(command.before if undo else command.after)
+        return rows
+
+    def close(self):
+        db.close(self.conn)
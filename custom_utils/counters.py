@@ -0,0 +1,505 @@
+"""
+测试工位的使用次数上报：内存中按治具汇总，定时批量写入
+
+测试设备每循环一次上报一次，逐条写 SQLite 会占满数据库的写锁。这里先把增量追加到
+本地日志文件（进程崩溃不丢失），内存中按治具编号累加，每隔几秒用一个事务批量执行
+UPDATE jig SET Usedcount = Usedcount + ?。
+
+上报协议（TCP，默认只监听本机）：每行一条 "治具编号 [次数]"，次数默认为 1；
+一次收到的多行写入日志并落盘后统一回复，每行回复 "OK" 或 "ERR 原因"。
+
+    python -m custom_utils.counters serve
+    python -m custom_utils.counters add J-0001 5
+"""
+
+import os
+import sys
+import glob
+import uuid
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import socketserver
+from typing import Callable, Dict, List, Optional, Tuple
+
+from custom_utils import db, metrics
+from custom_utils.repository import JigIndex
+from custom_utils.settings import CounterSettings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counter_batches (
+    batch TEXT PRIMARY KEY,
+    applied_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    jigs INTEGER NOT NULL,
+    cycles INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# 已写入批次的保留天数，只用于崩溃恢复时判断日志是否已写入
+_KEEP_BATCH_DAYS = 30
+
+# 日志段文件名带计算机名：程序目录在网络共享上时，各工位只重放自己的日志
+_HOST = socket.gethostname()
+_JOURNAL_PATTERN = f"counters-{_HOST}-*.journal"
+
+
+class CounterError(Exception):
+    """上报内容不合法，str(e) 回复给上报方"""
+
+
+def _limits() -> Dict[str, Optional[int]]:
+    """计数字段的上限，与 jig 表的 CHECK 约束（由模型生成）一致"""
+    from Model import JigDynamic
+
+    properties = JigDynamic.model_json_schema()["properties"]
+    return {
+        field: properties.get(field, {}).get("maximum")
+        for field in ("Usedcount", "CheckUsedcount")
+    }
+
+
+def _update_sql() -> str:
+    # 达到上限后不再增加，否则 CHECK 约束会使整批回滚
+    assignments = []
+    for field, maximum in _limits().items():
+        expr = f"{field} + ?"
+        if maximum is not None:
+            expr = f"MIN({expr}, {maximum})"
+        assignments.append(f"{field} = {expr}")
+    return f"UPDATE jig SET {', '.join(assignments)} WHERE no = ?"
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    conn.executescript(_SCHEMA)
+
+
+def parse_line(line: str, max_increment: int) -> Tuple[str, int]:
+    """解析一行上报："治具编号 [次数]" """
+    parts = line.split()
+    if not parts or len(parts) > 2:
+        raise CounterError("格式应为：治具编号 [次数]")
+    no = parts[0]
+    try:
+        count = int(parts[1]) if len(parts) == 2 else 1
+    except ValueError:
+        raise CounterError(f"次数不是整数: {parts[1]}") from None
+    if not 0 < count <= max_increment:
+        raise CounterError(f"次数应在 1 到 {max_increment} 之间: {count}")
+    return no, count
+
+
+def increment(conn: sqlite3.Connection, totals: Dict[str, int]) -> List[str]:
+    """在调用方的事务中累加使用次数，返回不存在的治具编号"""
+    sql = _update_sql()
+    return [
+        no
+        for no, count in totals.items()
+        if conn.execute(sql, (count, count, no)).rowcount == 0
+    ]
+
+
+def apply_increments(
+    conn: sqlite3.Connection, batch: str, totals: Dict[str, int]
+) -> Tuple[bool, List[str]]:
+    """
+    在一个事务中写入一批增量，同一批次只写一次
+
+    :param batch: 批次标识（日志文件名），记录在 counter_batches 中
+    :param totals: 治具编号 -> 次数
+    :return: (是否写入，False 表示该批次之前已写入), 不存在的治具编号
+    """
+    unknown = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute(
+            "SELECT 1 FROM counter_batches WHERE batch = ?", (batch,)
+        ).fetchone():
+            conn.execute("ROLLBACK")
+            return False, unknown
+        unknown = increment(conn, totals)
+        conn.execute(
+            "INSERT INTO counter_batches (batch, jigs, cycles) VALUES (?, ?, ?)",
+            (batch, len(totals) - len(unknown), sum(totals.values())),
+        )
+        conn.execute(
+            "DELETE FROM counter_batches WHERE applied_at < "
+            f"datetime('now', 'localtime', '-{_KEEP_BATCH_DAYS} days')"
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    if unknown:
+        metrics.inc("counters.unknown", len(unknown))
+        logger.warning(f"上报了不存在的治具编号，已忽略: {unknown[:10]}")
+    return True, unknown
+
+
+def _read_journal(path: str) -> Dict[str, int]:
+    """读取日志；崩溃时写了一半的最后一行被忽略"""
+    totals: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            no, _, count = line.rstrip("\n").partition("\t")
+            try:
+                totals[no] = totals.get(no, 0) + int(count)
+            except ValueError:
+                continue
+    return totals
+
+
+class CounterAggregator:
+    """
+    使用次数的写后汇总
+
+    增量先追加到当前日志段，再在内存中累加。flush() 时封存当前日志段并换新段，
+    以日志段文件名为批次标识写入数据库，提交后删除该日志段。
+    启动时重放遗留的日志段：已写入的批次（在 counter_batches 中）直接删除，不会重复计数。
+
+    :param db_path: 数据库路径
+    :param journal_dir: 日志目录
+    """
+
+    def __init__(self, db_path: str, journal_dir: str):
+        self.db_path = db_path
+        self.journal_dir = journal_dir
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        # 上次写入失败，日志段留在目录中等待重试
+        self._failed = False
+        self._journal = None
+        self._journal_path = ""
+        # 编号 -> id 的内存索引，上报时先确认治具存在
+        self._index_lock = threading.Lock()
+        self._index = JigIndex(sqlite3.connect(db_path, check_same_thread=False))
+        os.makedirs(journal_dir, exist_ok=True)
+        conn = db.connect(db_path)
+        try:
+            ensure_schema(conn)
+        finally:
+            conn.close()
+        self.recover()
+        self._open_segment()
+
+    def _open_segment(self):
+        self._journal_path = os.path.join(
+            self.journal_dir, f"counters-{_HOST}-{uuid.uuid4().hex}.journal"
+        )
+        self._journal = open(self._journal_path, "a", encoding="utf-8")
+
+    def known(self, no: str) -> bool:
+        with self._index_lock:
+            return self._index.lookup(no) is not None
+
+    def add(self, no: str, count: int = 1):
+        """记录一次上报，返回前已写入日志（未落盘，见 sync）"""
+        with self._lock:
+            self._journal.write(f"{no}\t{count}\n")
+            self._pending[no] = self._pending.get(no, 0) + count
+        metrics.inc("counters.cycles", count)
+
+    def sync(self):
+        """日志落盘；一次网络读取的多行共用一次 fsync"""
+        with self._lock:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def pending(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self) -> int:
+        """把内存中的增量写入数据库，返回写入的次数合计"""
+        with self._flush_lock:
+            if self._failed:
+                self._failed = False
+                self.recover()
+            with self._lock:
+                if not self._pending:
+                    return 0
+                totals, self._pending = self._pending, {}
+                self._journal.close()
+                sealed = self._journal_path
+                self._open_segment()
+            batch = os.path.basename(sealed)
+            conn = db.connect(self.db_path)
+            conn.isolation_level = None
+            try:
+                with metrics.timer("counters.flush"):
+                    apply_increments(conn, batch, totals)
+            except Exception:
+                # 日志段保留，下次写入时重放
+                self._failed = True
+                metrics.inc("counters.error")
+                logger.error(f"写入使用次数失败，保留日志 {sealed}", exc_info=True)
+                raise
+            finally:
+                conn.close()
+            os.remove(sealed)
+            cycles = sum(totals.values())
+            logger.debug(f"已写入 {len(totals)} 个治具共 {cycles} 次使用")
+            return cycles
+
+    def recover(self) -> int:
+        """重放上次未写入的日志段，返回重放的次数合计"""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, _JOURNAL_PATTERN))):
+            if path == self._journal_path:
+                continue
+            totals = _read_journal(path)
+            if totals:
+                conn = db.connect(self.db_path)
+                conn.isolation_level = None
+                try:
+                    applied, _ = apply_increments(conn, os.path.basename(path), totals)
+                finally:
+                    conn.close()
+                if applied:
+                    replayed += sum(totals.values())
+            os.remove(path)
+        if replayed:
+            logger.info(f"已从日志恢复 {replayed} 次未写入的使用次数")
+        return replayed
+
+    def close(self):
+        """写入剩余增量并关闭日志"""
+        self.flush()
+        with self._lock:
+            self._journal.close()
+            os.remove(self._journal_path)
+        with self._index_lock:
+            self._index.conn.close()
+
+
+# ---------- 上报服务 ----------
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        service: "CounterService" = self.server.service
+        buffer = b""
+        while True:
+            data = self.request.recv(65536)
+            if data:
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+            else:
+                # 对方关闭写端：最后一行可以没有换行
+                lines, buffer = [buffer], b""
+            replies = [
+                service.receive(raw.decode("utf-8", "replace"))
+                for raw in lines
+                if raw.strip()
+            ]
+            if replies:
+                service.aggregator.sync()
+                self.request.sendall(("\n".join(replies) + "\n").encode("utf-8"))
+            if not data:
+                return
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    # Windows 上 SO_REUSEADDR 允许多个程序监听同一端口，不能用
+    allow_reuse_address = sys.platform != "win32"
+
+
+class CounterService:
+    """
+    上报服务：TCP 监听 + 定时写入线程
+
+    :param settings: 使用次数上报配置
+    :param on_flushed: 写入后调用（在写入线程中），参数为写入的次数合计
+    :param db_path: 数据库路径
+    """
+
+    def __init__(
+        self,
+        settings: CounterSettings,
+        on_flushed: Optional[Callable[[int], None]] = None,
+        db_path: str = db.jig_db_path,
+    ):
+        self.settings = settings
+        self.on_flushed = on_flushed
+        self.db_path = db_path
+        self.aggregator: Optional[CounterAggregator] = None
+        self._server: Optional[_Server] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def update(self, settings: CounterSettings):
+        """修改地址和端口需重启程序后生效"""
+        self.settings = settings
+
+    def start(self):
+        if not self.settings.enabled or self._threads:
+            return
+        # 先占用端口：同一台电脑上只有一个服务重放和写入本机的日志
+        try:
+            self._server = _Server((self.settings.host, self.settings.port), _Handler)
+        except OSError as e:
+            # 已有其他程序在监听（如无界面运行的上报服务）
+            logger.warning(f"使用次数上报服务未启动: {e}")
+            return
+        journal_dir = os.path.join(db.root_path, self.settings.journal_dir)
+        try:
+            self.aggregator = CounterAggregator(self.db_path, journal_dir)
+        except BaseException:
+            self._server.server_close()
+            self._server = None
+            raise
+        self._server.service = self
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(
+                target=self._server.serve_forever,
+                name="CounterServer",
+                daemon=True,
+            ),
+            threading.Thread(target=self._run, name="CounterFlusher", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(
+            f"使用次数上报服务已启动: {self.settings.host}:{self.settings.port}"
+        )
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self.aggregator:
+            try:
+                self.aggregator.close()
+            except Exception:
+                pass
+            self.aggregator = None
+
+    def receive(self, line: str) -> str:
+        """处理一行上报，返回回复"""
+        try:
+            no, count = parse_line(line, self.settings.max_increment)
+        except CounterError as e:
+            return f"ERR {e}"
+        if not self.aggregator.known(no):
+            return f"ERR 未找到编号为 {no} 的治具"
+        self.aggregator.add(no, count)
+        return "OK"
+
+    def flush_once(self) -> int:
+        try:
+            cycles = self.aggregator.flush()
+        except Exception:
+            return 0
+        if cycles and self.on_flushed:
+            self.on_flushed(cycles)
+        return cycles
+
+    def _run(self):
+        while not self._stop.wait(self.settings.flush_seconds):
+            self.flush_once()
+
+
+# ---------- 客户端 ----------
+def send_increments(
+    increments: List[Tuple[str, int]],
+    host: str = "127.0.0.1",
+    port: int = 47017,
+    timeout: float = 5,
+) -> List[str]:
+    """向上报服务发送增量，返回每行的回复"""
+    payload = "".join(f"{no} {count}\n" for no, count in increments)
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(payload.encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+        data = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return data.decode("utf-8").splitlines()
+
+
+def add_direct(
+    db_path: str, increments: List[Tuple[str, int]]
+) -> Tuple[int, List[str]]:
+    """不经过上报服务，直接在一个事务中写入；返回 (写入的次数合计, 不存在的编号)"""
+    totals: Dict[str, int] = {}
+    for no, count in increments:
+        totals[no] = totals.get(no, 0) + count
+    conn = db.connect(db_path)
+    conn.isolation_level = None
+    try:
+        ensure_schema(conn)
+        _, unknown = apply_increments(conn, f"direct-{uuid.uuid4().hex}", totals)
+    finally:
+        conn.close()
+    return sum(v for k, v in totals.items() if k not in unknown), unknown
+
+
+def main(argv=None):
+    from custom_utils.settings import load_settings
+
+    settings = load_settings(os.path.join(db.root_path, "config.ini")).counters
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_utils.counters", description="测试工位使用次数上报"
+    )
+    parser.add_argument("--db", default=db.jig_db_path, help="数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("serve", help="在前台运行上报服务（不启动界面）")
+    p_add = sub.add_parser("add", help="上报一次或多次使用")
+    p_add.add_argument("no")
+    p_add.add_argument("count", nargs="?", type=int, default=1)
+    p_add.add_argument(
+        "--direct", action="store_true", help="不经过上报服务，直接写入数据库"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "serve":
+        settings = settings.model_copy(update={"enabled": True})
+        service = CounterService(settings, db_path=args.db)
+        service.start()
+        if not service.aggregator:
+            return 1
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.stop()
+        return 0
+
+    try:
+        no, count = parse_line(f"{args.no} {args.count}", settings.max_increment)
+    except CounterError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if not args.direct:
+        try:
+            print(send_increments([(no, count)], settings.host, settings.port)[0])
+            return 0
+        except OSError:
+            logger.info("上报服务未运行，直接写入数据库")
+    cycles, unknown = add_direct(args.db, [(no, count)])
+    if unknown:
+        print(f"ERR 未找到编号为 {no} 的治具", file=sys.stderr)
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import sqlite3
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from custom_utils import metrics
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 汇总表：由 jig 表上的触发器增量维护，概览只读取这几张小表
+SUMMARY_TABLES = ("dash_type_status", "dash_due", "dash_wear")
+
+# 每个汇总表的分组表达式，{r} 为 NEW 或 OLD
+_TYPE = "IFNULL({r}.type, '')"
+_STATUS = "IFNULL({r}.UseStatus, '')"
+_DUE = "IFNULL(date({r}.Checkdate, '+' || {r}.CheckCycle || ' days'), '')"
+# 磨损分档：已使用次数 / 最大使用次数，0-9 为 10% 一档，10 为已达上限，-1 为未知
+_WEAR = (
+    "CASE WHEN {r}.Maxcount > 0 "
+    "THEN MIN(10, {r}.Usedcount * 10 / {r}.Maxcount) ELSE -1 END"
+)
+
+_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS dash_type_status (
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (type, status)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dash_due (
+    due_date TEXT NOT NULL PRIMARY KEY,
+    n INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dash_wear (
+    bucket INTEGER NOT NULL PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+"""
+
+
+def _inc(table: str, keys: Dict[str, str], r: str) -> str:
+    cols = ", ".join(keys)
+    values = ", ".join(expr.format(r=r) for expr in keys.values())
+    return (
+        f"INSERT INTO {table} ({cols}, n) VALUES ({values}, 1) "
+        f"ON CONFLICT ({cols}) DO UPDATE SET n = n + 1;"
+    )
+
+
+def _dec(table: str, keys: Dict[str, str], r: str) -> str:
+    where = " AND ".join(f"{col} = {expr.format(r=r)}" for col, expr in keys.items())
+    return (
+        f"UPDATE {table} SET n = n - 1 WHERE {where};\n"
+        f"    DELETE FROM {table} WHERE {where} AND n <= 0;"
+    )
+
+
+# 汇总表 -> (分组列, 影响分组的 jig 列)
+_SUMMARIES = {
+    "dash_type_status": (
+        {"type": _TYPE, "status": _STATUS},
+        ("type", "UseStatus"),
+    ),
+    "dash_due": ({"due_date": _DUE}, ("Checkdate", "CheckCycle")),
+    "dash_wear": ({"bucket": _WEAR}, ("Usedcount", "Maxcount")),
+}
+
+
+def _triggers_sql(table: str) -> Dict[str, str]:
+    """生成触发器，返回 触发器名 -> CREATE TRIGGER 语句"""
+    triggers = {}
+    inserts = "\n    ".join(_inc(t, keys, "NEW") for t, (keys, _) in _SUMMARIES.items())
+    triggers[f"{table}_dash_insert"] = (
+        f"CREATE TRIGGER {table}_dash_insert AFTER INSERT ON {table}\n"
+        f"BEGIN\n    {inserts}\nEND;"
+    )
+    deletes = "\n    ".join(_dec(t, keys, "OLD") for t, (keys, _) in _SUMMARIES.items())
+    triggers[f"{table}_dash_delete"] = (
+        f"CREATE TRIGGER {table}_dash_delete AFTER DELETE ON {table}\n"
+        f"BEGIN\n    {deletes}\nEND;"
+    )
+    # 更新只在分组键真正变化时才改动汇总表，例如已使用次数 +1 通常不会跨档
+    for summary, (keys, columns) in _SUMMARIES.items():
+        name = f"{table}_{summary}_update"
+        changed = " OR ".join(
+            f"({expr.format(r='OLD')}) IS NOT ({expr.format(r='NEW')})"
+            for expr in keys.values()
+        )
+        triggers[name] = (
+            f"CREATE TRIGGER {name} AFTER UPDATE OF {', '.join(columns)} ON {table}\n"
+            f"WHEN {changed}\n"
+            f"BEGIN\n    {_dec(summary, keys, 'OLD')}\n"
+            f"    {_inc(summary, keys, 'NEW')}\nEND;"
+        )
+    return triggers
+
+
+def aggregate_sql(summary: str, table: str = "jig") -> str:
+    """
+    直接从 jig 表分组统计的 SELECT 语句，列与汇总表相同
+
+    :param table: 表名，可带库名，如 site_1.jig
+    """
+    keys, _ = _SUMMARIES[summary]
+    exprs = ", ".join(f"{expr.format(r=table)} AS {col}" for col, expr in keys.items())
+    return f"SELECT {exprs}, COUNT(*) AS n FROM {table} GROUP BY {', '.join(keys)}"
+
+
+def summary_columns(summary: str) -> List[str]:
+    """汇总表的分组列"""
+    return list(_SUMMARIES[summary][0])
+
+
+def rebuild_dashboard(conn: sqlite3.Connection, table: str = "jig"):
+    """从 jig 表全量重算汇总表（安装触发器或数据被外部修改后使用）"""
+    with metrics.timer("sql.dashboard.rebuild"):
+        for summary in _SUMMARIES:
+            cols = ", ".join(summary_columns(summary))
+            conn.execute(f"DELETE FROM {summary}")
+            conn.execute(
+                f"INSERT INTO {summary} ({cols}, n) {aggregate_sql(summary, table)}"
+            )
+
+
+def install_dashboard(conn: sqlite3.Connection, table: str = "jig") -> bool:
+    """
+    创建汇总表和触发器；触发器缺失或定义变化时重建并全量重算
+
+    :return: 是否进行了重建
+    """
+    triggers = _triggers_sql(table)
+    existing = dict(
+        conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+            (table,),
+        ).fetchall()
+    )
+    tables = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    if all(
+        existing.get(name) == sql.rstrip(";") for name, sql in triggers.items()
+    ) and (set(SUMMARY_TABLES) <= tables):
+        return False
+
+    with conn:
+        conn.executescript("BEGIN;" + _TABLES_SQL)
+        for name in existing:
+            if name.startswith(f"{table}_dash_"):
+                conn.execute(f"DROP TRIGGER {name}")
+        for sql in triggers.values():
+            conn.execute(sql)
+        rebuild_dashboard(conn, table)
+    logger.info("已安装概览汇总表和触发器")
+    return True
+
+
+def read_dashboard(
+    conn: sqlite3.Connection,
+    today: Optional[date] = None,
+    horizons: Sequence[int] = (7, 30, 90),
+) -> Dict:
+    """
+    读取概览数据
+
+    :param today: 计算到期天数的基准日期，默认为今天
+    :param horizons: 到期分档（天）
+    :return: {
+        "total": 总数,
+        "type_status": [(类型, 状态, 数量), ...],
+        "due": [("已过期", 数量), ("7天内", 数量), ...],
+        "wear": [(分档, 数量), ...],
+    }
+    """
+    today = today or date.today()
+    with metrics.timer("sql.dashboard.read"):
+        type_status: List[Tuple[str, str, int]] = conn.execute(
+            "SELECT type, status, n FROM dash_type_status ORDER BY type, status"
+        ).fetchall()
+        total = sum(row[2] for row in type_status)
+
+        due = [
+            (
+                "已过期",
+                conn.execute(
+                    "SELECT IFNULL(SUM(n), 0) FROM dash_due "
+                    "WHERE due_date <> '' AND due_date < ?",
+                    (today.isoformat(),),
+                ).fetchone()[0],
+            )
+        ]
+        for days in horizons:
+            end = today + timedelta(days=days)
+            n = conn.execute(
+                "SELECT IFNULL(SUM(n), 0) FROM dash_due "
+                "WHERE due_date >= ? AND due_date <= ?",
+                (today.isoformat(), end.isoformat()),
+            ).fetchone()[0]
+            due.append((f"{days}天内", n))
+
+        wear = conn.execute(
+            "SELECT bucket, n FROM dash_wear ORDER BY bucket"
+        ).fetchall()
+    return {"total": total, "type_status": type_status, "due": due, "wear": wear}
+
+
+def wear_label(bucket: int) -> str:
+    if bucket < 0:
+        return "未知"
+    if bucket >= 10:
+        return "已达上限"
+    return f"{bucket * 10}%-{bucket * 10 + 10}%"
@@ -0,0 +1,47 @@
+import os
+import sys
+import sqlite3
+import logging
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 获取正确的基础路径
+if getattr(sys, "frozen", False):  # 检查是否为PyInstaller打包环境
+    # 如果是打包后的exe文件运行
+    root_path = os.path.dirname(sys.executable)
+else:
+    # 如果是普通Python脚本运行
+    root_path = os.path.dirname(os.path.abspath(__file__))
+    root_path = os.path.join(root_path, "..")
+root_path = os.path.abspath(root_path)
+data_path = os.path.join(root_path, "datas")
+jig_db_path = os.path.join(data_path, "jig.db")
+enum_db_path = os.path.join(data_path, "enum.db")
+# 需要备份和维护的数据库：名称 -> 路径
+DATABASES = {"jig": jig_db_path, "enum": enum_db_path}
+
+JIG_TABLE = "jig"
+
+
+def connect(db_path: str = jig_db_path, timeout: float = 10.0) -> sqlite3.Connection:
+    """
+    打开 SQLite 连接（sqlite3 模块），遇到锁时最多等待 timeout 秒
+
+    :param db_path: 数据库路径
+    :param timeout: 忙等待秒数
+    """
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+    return conn
+
+
+def close(conn: sqlite3.Connection):
+    """
+    关闭连接，关闭前执行 PRAGMA optimize，让 SQLite 按本连接的查询情况更新统计信息
+    """
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error as e:
+        logger.debug(f"PRAGMA optimize 失败: {e}")
+    conn.close()
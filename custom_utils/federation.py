@@ -0,0 +1,240 @@
+import os
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from custom_utils import db, metrics
+from custom_utils.dashboard import SUMMARY_TABLES, aggregate_sql, summary_columns
+from custom_utils.repository import JigRepository
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+LOCAL_SITE = "本地"
+
+# SQLite 默认最多 ATTACH 10 个数据库
+MAX_ATTACHED = 10
+
+# 联合查询返回的列（各站点都有的基础字段）
+SEARCH_COLUMNS = (
+    "id",
+    "no",
+    "name",
+    "model",
+    "type",
+    "UseStatus",
+    "Usedcount",
+    "Maxcount",
+    "Checkdate",
+    "CheckCycle",
+    "Location",
+)
+
+
+class Site(NamedTuple):
+    name: str
+    path: str
+    # 在联合连接中的库名：本地为 main，其余为 site_1、site_2...
+    schema: str
+
+
+def _resolve(path: str) -> str:
+    return os.path.normcase(os.path.abspath(os.path.join(db.root_path, path)))
+
+
+def _search_where(
+    text: str = "", jig_type: str = "", status: str = ""
+) -> Tuple[str, List]:
+    clauses, params = [], []
+    if text:
+        clauses.append("(no LIKE ? OR name LIKE ? OR model LIKE ?)")
+        params += [f"%{text}%"] * 3
+    if jig_type:
+        clauses.append("type = ?")
+        params.append(jig_type)
+    if status:
+        clauses.append("UseStatus = ?")
+        params.append(status)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class Federation:
+    """
+    多站点（每条产线一个 jig.db）联合查询
+
+    不合并数据：
+    - connect() 返回的连接 ATTACH 了所有站点，并建立 UNION ALL 临时视图
+      jig_all（带 site 列）和同名的概览汇总视图，read_dashboard 可直接使用；
+    - search() 等读取在线程池中对各站点分别查询后合并，互不等待；
+    - 写入始终通过对应站点自己的 JigRepository，本地写入不受其他站点影响。
+
+    :param sites: 站点名 -> 数据库路径，与本地数据库相同的路径会被识别为本地站点
+    :param local_path: 本地数据库路径
+    """
+
+    def __init__(self, sites: Dict[str, str], local_path: str = db.jig_db_path):
+        local = _resolve(local_path)
+        local_name = LOCAL_SITE
+        remote = []
+        for name, path in sites.items():
+            resolved = _resolve(path)
+            if resolved == local:
+                local_name = name
+            elif not os.path.exists(resolved):
+                logger.warning(f"站点 {name} 的数据库不存在: {resolved}")
+            else:
+                remote.append((name, resolved))
+        if len(remote) > MAX_ATTACHED:
+            logger.warning(f"站点数量超过 {MAX_ATTACHED}，只联合前 {MAX_ATTACHED} 个")
+            remote = remote[:MAX_ATTACHED]
+
+        self.sites: List[Site] = [Site(local_name, local, "main")] + [
+            Site(name, path, f"site_{i}") for i, (name, path) in enumerate(remote, 1)
+        ]
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.sites), thread_name_prefix="federation"
+        )
+        self._repositories: Dict[str, JigRepository] = {}
+
+    @property
+    def local(self) -> Site:
+        return self.sites[0]
+
+    def site(self, name: str) -> Site:
+        for site in self.sites:
+            if site.name == name:
+                return site
+        raise KeyError(name)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for repository in self._repositories.values():
+            repository.close()
+        self._repositories.clear()
+
+    # ---------- 联合连接 ----------
+    def connect(self) -> sqlite3.Connection:
+        """打开本地数据库并 ATTACH 其他站点，建立联合视图"""
+        conn = db.connect(self.local.path)
+        for site in self.sites[1:]:
+            conn.execute(f"ATTACH DATABASE ? AS {site.schema}", (site.path,))
+        self._create_views(conn)
+        return conn
+
+    def _tables(self, conn: sqlite3.Connection, schema: str) -> set:
+        return {
+            row[0]
+            for row in conn.execute(
+                f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'"
+            )
+        }
+
+    def _create_views(self, conn: sqlite3.Connection):
+        # 各站点的列可能不同（动态字段），视图只包含共有的列
+        columns = None
+        for site in self.sites:
+            names = [
+                row[1] for row in conn.execute(f"PRAGMA {site.schema}.table_info(jig)")
+            ]
+            columns = names if columns is None else [c for c in columns if c in names]
+        cols = ", ".join(f'"{c}"' for c in columns)
+        # 视图中不能使用参数，站点名以字面量写入
+        parts = [
+            f"SELECT {_quote(site.name)} AS site, {cols} FROM {site.schema}.jig"
+            for site in self.sites
+        ]
+        conn.execute("DROP VIEW IF EXISTS temp.jig_all")
+        conn.execute(f"CREATE TEMP VIEW jig_all AS {' UNION ALL '.join(parts)}")
+
+        # 概览汇总：有汇总表的站点直接读取，没有的从 jig 表现算
+        for summary in SUMMARY_TABLES:
+            keys = ", ".join(summary_columns(summary))
+            sources = []
+            for site in self.sites:
+                if summary in self._tables(conn, site.schema):
+                    sources.append(f"SELECT {keys}, n FROM {site.schema}.{summary}")
+                else:
+                    sources.append(aggregate_sql(summary, f"{site.schema}.jig"))
+            conn.execute(f"DROP VIEW IF EXISTS temp.{summary}")
+            conn.execute(
+                f"CREATE TEMP VIEW {summary} AS SELECT {keys}, SUM(n) AS n "
+                f"FROM ({' UNION ALL '.join(sources)}) GROUP BY {keys}"
+            )
+
+    def data_version(self, conn: sqlite3.Connection) -> Tuple[int, ...]:
+        """各站点的 PRAGMA data_version，任一站点被其他连接修改后会变化"""
+        return tuple(
+            conn.execute(f"PRAGMA {site.schema}.data_version").fetchone()[0]
+            for site in self.sites
+        )
+
+    # ---------- 并行读取 ----------
+    def _query_site(self, site: Site, sql: str, params: Sequence) -> List[tuple]:
+        conn = db.connect(site.path)
+        try:
+            with metrics.timer("federation.site_query"):
+                return conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"站点 {site.name} 查询失败: {e}")
+            return []
+        finally:
+            conn.close()
+
+    def query_all(
+        self, sql: str, params: Sequence = (), sites: Optional[Sequence[str]] = None
+    ) -> List[tuple]:
+        """
+        在每个站点上执行同一条查询（每个站点一个线程、一个连接），结果前加站点名
+
+        :param sites: 只查询这些站点，默认全部
+        """
+        targets = [s for s in self.sites if sites is None or s.name in sites]
+        with metrics.timer("federation.query_all"):
+            results = self._executor.map(
+                lambda site: self._query_site(site, sql, params), targets
+            )
+            return [
+                (site.name, *row)
+                for site, rows in zip(targets, results)
+                for row in rows
+            ]
+
+    def search(
+        self,
+        text: str = "",
+        jig_type: str = "",
+        status: str = "",
+        sites: Optional[Sequence[str]] = None,
+        limit: int = 1000,
+    ) -> List[tuple]:
+        """
+        按编号/名称/机种、类型、状态跨站点查找治具
+
+        :return: [(站点, *SEARCH_COLUMNS), ...]，按编号排序
+        """
+        where, params = _search_where(text.strip(), jig_type, status)
+        sql = (
+            f"SELECT {', '.join(SEARCH_COLUMNS)} FROM jig{where} "
+            f"ORDER BY no LIMIT {int(limit)}"
+        )
+        rows = self.query_all(sql, params, sites)
+        rows.sort(key=lambda row: (str(row[2]), row[0]))
+        return rows[:limit]
+
+    def types(self) -> List[str]:
+        rows = self.query_all("SELECT DISTINCT type FROM jig")
+        return sorted({row[1] for row in rows if row[1]})
+
+    # ---------- 写入 ----------
+    def repository(self, site_name: str) -> JigRepository:
+        """站点自己的取用/归还仓库，写入只发生在该站点的数据库上"""
+        repository = self._repositories.get(site_name)
+        if repository is None:
+            repository = JigRepository(self.site(site_name).path)
+            self._repositories[site_name] = repository
+        return repository
+
+
+def _quote(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
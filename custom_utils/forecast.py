@@ -0,0 +1,215 @@
+import sys
+import time
+import sqlite3
+import logging
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+
+from custom_utils import db, metrics
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# julianday('1970-01-01')
+_UNIX_EPOCH_JD = 2440587.5
+# 校验日期之后不足多少天时，单次校验的使用速率不可靠，改用整体速率
+MIN_CHECK_DAYS = 7
+
+REASON_CYCLE = "周期"
+REASON_COUNT = "次数"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jig_forecast (
+    jig_id INTEGER PRIMARY KEY,
+    no TEXT,
+    usage_rate REAL NOT NULL,
+    check_rate REAL NOT NULL,
+    calibration_due TEXT,
+    calibration_reason TEXT,
+    days_to_calibration INTEGER,
+    retirement_date TEXT,
+    days_to_retirement INTEGER,
+    computed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jig_forecast_calibration
+    ON jig_forecast(calibration_due);
+CREATE INDEX IF NOT EXISTS idx_jig_forecast_retirement
+    ON jig_forecast(retirement_date);
+"""
+
+_COLUMNS = (
+    "id",
+    "no",
+    "julianday(Checkdate)",
+    "julianday(Makedate)",
+    "Usedcount",
+    "Maxcount",
+    "CheckUsedcount",
+    "CheckMaxcount",
+    "CheckCycle",
+)
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    conn.executescript(_SCHEMA)
+
+
+def _to_dates(days: np.ndarray) -> np.ndarray:
+    """Unix 纪元天数（float，nan 表示无）-> 'yyyy-MM-dd' 字符串数组（None 表示无）"""
+    valid = np.isfinite(days)
+    out = np.full(days.shape, None, dtype=object)
+    if valid.any():
+        out[valid] = (
+            days[valid]
+            .astype("int64")
+            .astype("datetime64[D]")
+            .astype(str)
+            .astype(object)
+        )
+    return out
+
+
+def compute_forecast(
+    columns: Dict[str, np.ndarray], today: date
+) -> Dict[str, np.ndarray]:
+    """
+    按列计算预测（纯 NumPy，无逐行循环）
+
+    使用速率 = 已使用次数 / 制作以来的天数；单次校验速率 = 单次校验已使用次数 /
+    校验以来的天数（不足 MIN_CHECK_DAYS 天时使用整体速率）。
+    下次校验日期取“校验周期到期”和“按速率用完单次校验次数”中较早者；
+    报废日期为按速率用完最大使用次数的日期，速率为 0 时为空。
+
+    :param columns: 列名 -> 数组，列名见 _COLUMNS（日期为 julianday）
+    :param today: 基准日期
+    """
+    today_jd = float(np.datetime64(today, "D").astype("int64")) + _UNIX_EPOCH_JD
+
+    check_jd = columns["julianday(Checkdate)"]
+    make_jd = columns["julianday(Makedate)"]
+    used = columns["Usedcount"]
+    maxcount = columns["Maxcount"]
+    check_used = columns["CheckUsedcount"]
+    check_max = columns["CheckMaxcount"]
+    cycle = columns["CheckCycle"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        life_days = np.maximum(today_jd - make_jd, 1.0)
+        usage_rate = np.where(np.isfinite(make_jd), used / life_days, 0.0)
+
+        check_days = today_jd - check_jd
+        check_rate = np.where(
+            check_days >= MIN_CHECK_DAYS,
+            check_used / np.maximum(check_days, 1.0),
+            usage_rate,
+        )
+        check_rate = np.nan_to_num(check_rate, nan=0.0)
+        usage_rate = np.nan_to_num(usage_rate, nan=0.0)
+
+        # 相对今天的天数
+        by_cycle = check_jd + cycle - today_jd
+        by_count = np.where(
+            check_rate > 0, np.maximum(check_max - check_used, 0) / check_rate, np.inf
+        )
+        days_to_calibration = np.fmin(by_cycle, by_count)
+        reason = np.where(by_count < by_cycle, REASON_COUNT, REASON_CYCLE).astype(
+            object
+        )
+        reason[~np.isfinite(days_to_calibration)] = None
+
+        days_to_retirement = np.where(
+            usage_rate > 0, np.maximum(maxcount - used, 0) / usage_rate, np.inf
+        )
+
+    today_days = today_jd - _UNIX_EPOCH_JD
+    days_to_calibration = np.floor(days_to_calibration)
+    days_to_retirement = np.floor(days_to_retirement)
+    # 超过约 100 年的预测视为无意义
+    days_to_retirement[days_to_retirement > 36500] = np.inf
+
+    return {
+        "usage_rate": usage_rate,
+        "check_rate": check_rate,
+        "calibration_due": _to_dates(today_days + days_to_calibration),
+        "calibration_reason": reason,
+        "days_to_calibration": days_to_calibration,
+        "retirement_date": _to_dates(today_days + days_to_retirement),
+        "days_to_retirement": days_to_retirement,
+    }
+
+
+def _int_or_none(values: np.ndarray) -> np.ndarray:
+    out = np.full(values.shape, None, dtype=object)
+    valid = np.isfinite(values)
+    out[valid] = values[valid].astype("int64").astype(object)
+    return out
+
+
+def run_forecast(db_path: str = db.jig_db_path, today: Optional[date] = None) -> int:
+    """
+    对整个库存计算预测并写入 jig_forecast 表
+
+    :return: 写入的行数
+    """
+    today = today or date.today()
+    conn = db.connect(db_path)
+    try:
+        ensure_schema(conn)
+        with metrics.timer("forecast.compute"):
+            rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jig").fetchall()
+            if rows:
+                cols = list(zip(*rows))
+                columns = {
+                    name: np.array(values, dtype=float)
+                    for name, values in zip(_COLUMNS[2:], cols[2:])
+                }
+                result = compute_forecast(columns, today)
+                records = zip(
+                    cols[0],
+                    cols[1],
+                    result["usage_rate"].tolist(),
+                    result["check_rate"].tolist(),
+                    result["calibration_due"],
+                    result["calibration_reason"],
+                    _int_or_none(result["days_to_calibration"]),
+                    result["retirement_date"],
+                    _int_or_none(result["days_to_retirement"]),
+                )
+            else:
+                records = []
+
+        with metrics.timer("forecast.write"), conn:
+            conn.execute("DELETE FROM jig_forecast")
+            conn.executemany(
+                """INSERT INTO jig_forecast
+                (jig_id, no, usage_rate, check_rate, calibration_due,
+                calibration_reason, days_to_calibration, retirement_date,
+                days_to_retirement, computed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (record + (today.isoformat(),) for record in records),
+            )
+    finally:
+        conn.close()
+    logger.info(f"已完成 {len(rows)} 个治具的寿命预测")
+    return len(rows)
+
+
+def last_computed(db_path: str = db.jig_db_path) -> Optional[str]:
+    """上次预测的日期，未计算过时返回 None"""
+    conn = db.connect(db_path)
+    try:
+        ensure_schema(conn)
+        row = conn.execute("SELECT MAX(computed_at) FROM jig_forecast").fetchone()
+    finally:
+        conn.close()
+    return row[0]
+
+
+if __name__ == "__main__":
+    # 供计划任务每晚调用：python -m custom_utils.forecast [数据库路径]
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    count = run_forecast(sys.argv[1] if len(sys.argv) > 1 else db.jig_db_path)
+    print(f"{count} rows in {time.perf_counter() - start:.2f}s")
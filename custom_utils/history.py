@@ -0,0 +1,252 @@
+import json
+import time
+import sqlite3
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from custom_utils import metrics
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+OP_INSERT = "I"
+OP_UPDATE = "U"
+OP_DELETE = "D"
+OP_COUNT = "C"
+
+# 当前时间（Unix 秒，毫秒精度），与 time.time() 可直接比较
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+# 不记录历史的列（row_version 是本库的行版本）
+IGNORED_COLUMNS = {"id", "row_version"}
+
+# 只有使用次数变化的更新（上报服务每次汇总写入都会产生）合并记录：
+# 同一治具从第一次计数更新起的这段时间内，连续的计数更新只保留一条
+COUNTER_COLUMNS = ("Usedcount", "CheckUsedcount")
+COUNT_MERGE_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jig_history (
+    id INTEGER PRIMARY KEY,
+    jig_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    op TEXT NOT NULL,
+    diff TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jig_history_jig_ts ON jig_history(jig_id, ts);
+CREATE INDEX IF NOT EXISTS idx_jig_history_ts ON jig_history(ts);
+"""
+
+
+def _history_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [
+        row[1]
+        for row in conn.execute(f"PRAGMA table_info({table})")
+        if row[1] not in IGNORED_COLUMNS
+    ]
+
+
+def _triggers_sql(table: str, columns: List[str]) -> Dict[str, str]:
+    """
+    生成历史触发器
+
+    jig_history.diff 记录的是变化前的值（反向差异）：
+    更新时只包含变化的列，删除时包含整行，新增时为空。
+
+    只有使用次数变化的更新记为 OP_COUNT：上一条记录是计数记录，且它的时间（即合并窗口的
+    开始）在 COUNT_MERGE_SECONDS 以内时，把本次的旧值合并进去（保留更早的旧值）并换成新的 id，
+    不新增记录。时间保持为窗口开始，窗口不会随着更新后移，每个窗口一条记录；
+    窗口以外的时刻可以准确还原，窗口内的时刻还原为窗口结束时的使用次数。
+    id 仍然递增，reports.data_version 照常变化。
+    """
+    counters = [c for c in columns if c in COUNTER_COLUMNS]
+    others = [c for c in columns if c not in COUNTER_COLUMNS]
+
+    def _changed(cols):
+        return " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in cols)
+
+    def _old_values(cols):
+        return "\n        UNION ALL ".join(
+            f"SELECT '{c}' AS k, OLD.{c} AS v WHERE OLD.{c} IS NOT NEW.{c}"
+            for c in cols
+        )
+
+    whole_row = ", ".join(f"'{c}', OLD.{c}" for c in columns)
+    triggers = {
+        f"{table}_history_insert": (
+            f"CREATE TRIGGER {table}_history_insert AFTER INSERT ON {table}\n"
+            f"BEGIN\n"
+            f"    INSERT INTO jig_history (jig_id, ts, op)\n"
+            f"    VALUES (NEW.id, {_NOW}, '{OP_INSERT}');\n"
+            f"END;"
+        ),
+        f"{table}_history_update": (
+            f"CREATE TRIGGER {table}_history_update AFTER UPDATE ON {table}\n"
+            f"WHEN {_changed(others if counters else columns)}\n"
+            f"BEGIN\n"
+            f"    INSERT INTO jig_history (jig_id, ts, op, diff)\n"
+            f"    SELECT OLD.id, {_NOW}, '{OP_UPDATE}', json_group_object(k, v)\n"
+            f"    FROM (\n        {_old_values(columns)}\n    );\n"
+            f"END;"
+        ),
+        f"{table}_history_delete": (
+            f"CREATE TRIGGER {table}_history_delete AFTER DELETE ON {table}\n"
+            f"BEGIN\n"
+            f"    INSERT INTO jig_history (jig_id, ts, op, diff)\n"
+            f"    VALUES (OLD.id, {_NOW}, '{OP_DELETE}', json_object({whole_row}));\n"
+            f"END;"
+        ),
+    }
+    if counters:
+        counter_diff = (
+            f"(SELECT json_group_object(k, v) FROM (\n"
+            f"        {_old_values(counters)}\n    ))"
+        )
+        triggers[f"{table}_history_count"] = (
+            f"CREATE TRIGGER {table}_history_count AFTER UPDATE ON {table}\n"
+            f"WHEN ({_changed(counters)}) AND NOT ({_changed(others) or 0})\n"
+            f"BEGIN\n"
+            f"    UPDATE jig_history\n"
+            f"    SET id = (SELECT MAX(id) FROM jig_history) + 1,\n"
+            f"        diff = json_patch({counter_diff}, diff)\n"
+            f"    WHERE id = (\n"
+            f"        SELECT id FROM jig_history WHERE jig_id = OLD.id\n"
+            f"        ORDER BY ts DESC, id DESC LIMIT 1\n"
+            f"    ) AND op = '{OP_COUNT}' AND ts > {_NOW} - {COUNT_MERGE_SECONDS};\n"
+            f"    INSERT INTO jig_history (jig_id, ts, op, diff)\n"
+            f"    SELECT OLD.id, {_NOW}, '{OP_COUNT}', {counter_diff}\n"
+            f"    WHERE changes() = 0;\n"
+            f"END;"
+        )
+    return triggers
+
+
+def install_history(conn: sqlite3.Connection, table: str = "jig") -> bool:
+    """
+    创建历史表和触发器；表结构变化后（触发器定义不同）重建触发器
+
+    :return: 是否重建了触发器
+    """
+    triggers = _triggers_sql(table, _history_columns(conn, table))
+    existing = dict(
+        conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+            (table,),
+        ).fetchall()
+    )
+    if all(existing.get(name) == sql.rstrip(";") for name, sql in triggers.items()):
+        return False
+    with conn:
+        conn.executescript("BEGIN;" + _SCHEMA)
+        for name, sql in triggers.items():
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(sql)
+    logger.info("已安装治具历史触发器")
+    return True
+
+
+def _row_dict(conn: sqlite3.Connection, table: str, jig_id: int) -> Optional[Dict]:
+    cur = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (jig_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cur.description], row))
+
+
+def _rewind(row: Optional[Dict], jig_id: int, op: str, diff: Optional[str]):
+    """把一条历史记录撤销，返回该记录之前的状态（None 表示当时不存在）"""
+    if op == OP_INSERT:
+        return None
+    old = json.loads(diff) if diff else {}
+    if op == OP_DELETE:
+        return {"id": jig_id, **old}
+    row = dict(row) if row else {"id": jig_id}
+    row.update(old)
+    return row
+
+
+def jig_as_of(
+    conn: sqlite3.Connection, jig_id: int, ts: float, table: str = "jig"
+) -> Optional[Dict]:
+    """
+    还原治具在某一时刻的状态
+
+    :param ts: Unix 时间戳（秒）
+    :return: 列名 -> 值；该时刻不存在时返回 None
+    """
+    with metrics.timer("sql.history.jig_as_of"):
+        row = _row_dict(conn, table, jig_id)
+        entries = conn.execute(
+            """SELECT op, diff FROM jig_history
+            WHERE jig_id = ? AND ts > ? ORDER BY ts DESC, id DESC""",
+            (jig_id, ts),
+        ).fetchall()
+        for op, diff in entries:
+            row = _rewind(row, jig_id, op, diff)
+    return row
+
+
+def inventory_as_of(
+    conn: sqlite3.Connection, ts: float, table: str = "jig"
+) -> List[Dict]:
+    """
+    还原整个库存在某一时刻的状态
+
+    从当前数据出发，只撤销 ts 之后的历史记录，开销与之后的修改量成正比。
+    """
+    with metrics.timer("sql.history.inventory_as_of"):
+        cur = conn.execute(f"SELECT * FROM {table}")
+        names = [d[0] for d in cur.description]
+        rows: Dict[int, Optional[Dict]] = {
+            row[0]: dict(zip(names, row)) for row in cur.fetchall()
+        }
+        entries = conn.execute(
+            """SELECT jig_id, op, diff FROM jig_history
+            WHERE ts > ? ORDER BY ts DESC, id DESC""",
+            (ts,),
+        )
+        for jig_id, op, diff in entries:
+            rows[jig_id] = _rewind(rows.get(jig_id), jig_id, op, diff)
+    return sorted((row for row in rows.values() if row), key=lambda r: r["id"])
+
+
+def jig_changes(
+    conn: sqlite3.Connection, jig_id: int, table: str = "jig", limit: int = 500
+) -> List[Tuple[float, str, Dict[str, Tuple]]]:
+    """
+    治具的修改记录（最新的在前）
+
+    :return: [(时间戳, 操作, {列名: (旧值, 新值)}), ...]
+    """
+    row = _row_dict(conn, table, jig_id)
+    entries = conn.execute(
+        """SELECT ts, op, diff FROM jig_history
+        WHERE jig_id = ? ORDER BY ts DESC, id DESC LIMIT ?""",
+        (jig_id, limit),
+    ).fetchall()
+    changes = []
+    for ts, op, diff in entries:
+        before = _rewind(row, jig_id, op, diff)
+        if op == OP_INSERT:
+            fields = {k: (None, v) for k, v in (row or {}).items() if k != "id"}
+        elif op == OP_DELETE:
+            fields = {k: (v, None) for k, v in (before or {}).items() if k != "id"}
+        else:
+            fields = {k: (v, (row or {}).get(k)) for k, v in json.loads(diff).items()}
+        changes.append((ts, op, fields))
+        row = before
+    return changes
+
+
+def purge_history(conn: sqlite3.Connection, older_than_days: float) -> int:
+    """
+    删除早于指定天数的历史记录，返回删除的行数
+
+    清理后，早于清理时刻的状态将无法准确还原。
+    """
+    with conn:
+        cur = conn.execute(
+            "DELETE FROM jig_history WHERE ts < ?",
+            (time.time() - older_than_days * 86400,),
+        )
+    return cur.rowcount
@@ -0,0 +1,122 @@
+"""
+把数据库行转换为模型对象，不经过校验
+
+治具表有 CHECK 约束，写入时已经校验过，读出时不必再校验。按列顺序预先选好每列的转换函数：
+日期列 -> datetime.date，枚举列 -> 枚举成员，其他列原样保留；无法转换的值原样返回。
+
+    cursor = conn.execute("SELECT * FROM jig")
+    hydrator = Hydrator.for_cursor(JigDynamic, cursor)
+    jigs = [hydrator.model(row) for row in cursor]
+"""
+
+import logging
+import sqlite3
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+)
+
+from pydantic import BaseModel
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+# ---------- 转换函数（表单控件等处共用） ----------
+def to_date(value) -> Optional[date]:
+    """yyyy-MM-dd 文本 -> date；空值为 None，无法解析时原样返回"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return value
+
+
+def enum_converter(enum_class: Type[Enum]) -> Callable[[Any], Any]:
+    """枚举值 -> 枚举成员；不在枚举中的值（如已删除的类型）原样返回"""
+    members = dict(enum_class._value2member_map_)
+
+    def convert(value):
+        return members.get(value, value)
+
+    return convert
+
+
+def converter_for(annotation) -> Optional[Callable[[Any], Any]]:
+    """按字段类型选择转换函数，不需要转换时返回 None"""
+    if get_origin(annotation) is Union:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            annotation = args[0]
+    if annotation is date:
+        return to_date
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return enum_converter(annotation)
+    return None
+
+
+class Hydrator:
+    """
+    按列顺序准备好的行转换器
+
+    values(row) 返回字段字典，model(row) 用 model_construct 构造模型实例（不校验）。
+    不在模型中的列（如 row_version 和动态添加的列）被忽略。
+
+    :param model_class: Pydantic 模型类
+    :param columns: 行中各列的列名，按顺序
+    """
+
+    def __init__(self, model_class: Type[BaseModel], columns: Sequence[str]):
+        self.model_class = model_class
+        model_fields = model_class.model_fields
+        by_lower = {name.lower(): name for name in model_fields}
+        self._items: List[Tuple[int, str, Optional[Callable[[Any], Any]]]] = []
+        for i, column in enumerate(columns):
+            field = by_lower.get(column.lower())
+            if field is None:
+                continue
+            converter = converter_for(model_fields[field].annotation)
+            self._items.append((i, field, converter))
+        self.fields: Tuple[str, ...] = tuple(field for _, field, _ in self._items)
+
+    @classmethod
+    def for_cursor(
+        cls, model_class: Type[BaseModel], cursor: sqlite3.Cursor
+    ) -> "Hydrator":
+        """按游标的列（cursor.description）生成"""
+        return hydrator_for(model_class, tuple(d[0] for d in cursor.description))
+
+    def values(self, row: Sequence) -> Dict[str, Any]:
+        return {
+            field: row[i] if converter is None else converter(row[i])
+            for i, field, converter in self._items
+        }
+
+    def model(self, row: Sequence) -> BaseModel:
+        # 每个实例单独一个 fields_set：修改一个实例不会影响其他实例
+        return self.model_class.model_construct(
+            _fields_set=set(self.fields), **self.values(row)
+        )
+
+
+@lru_cache(maxsize=32)
+def hydrator_for(model_class: Type[BaseModel], columns: Tuple[str, ...]) -> Hydrator:
+    """按模型和列顺序缓存的转换器"""
+    return Hydrator(model_class, columns)
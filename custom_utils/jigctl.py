@@ -0,0 +1,713 @@
+"""
+jigctl：治具管理的命令行工具，供测试工位脚本调用
+
+不导入 Qt 和 pandas，启动只需零点几秒；结果以 JSON 输出到标准输出，
+失败时输出 {"error": ...} 并返回 1。
+
+Model.py、datas/ 和 config.ini 都按程序目录查找，因此不作为包安装，
+从程序目录运行 python jigctl.py（打包后为 jigctl.exe）：
+
+    jigctl list --status 使用中 --format jsonl
+    jigctl search ABC
+    jigctl checkout J-0001
+    jigctl count J-0001 5
+    jigctl export jigs.csv --type server
+    jigctl import jigs.csv --update
+    jigctl validate --format jsonl
+    jigctl migrate
+    jigctl backup
+    jigctl stats
+"""
+
+import os
+import sys
+import csv
+import json
+import sqlite3
+import logging
+import argparse
+import multiprocessing
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from custom_utils import db
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 模块 custom_utils 中的部分模块需要从程序目录导入 Model
+if db.root_path not in sys.path:
+    sys.path.append(db.root_path)
+
+ENUM_TABLES = ("JigType", "JigUseStatus")
+
+
+class CommandError(Exception):
+    """命令执行失败，str(e) 作为 JSON 中的 error 输出"""
+
+
+def _load_settings():
+    """
+    读取 config.ini
+
+    界面在配置有误时沿用之前的配置；命令行没有之前的配置可用，直接报错，
+    免得按默认值执行 migrate、backup 等操作。
+    """
+    from configparser import ConfigParser, Error as ConfigError
+
+    from pydantic import ValidationError
+
+    from custom_utils.settings import AppSettings, parse_settings
+
+    path = os.path.join(db.root_path, "config.ini")
+    if not os.path.exists(path):
+        return AppSettings()
+    config = ConfigParser()
+    try:
+        config.read(path, encoding="utf-8")
+        return parse_settings(config)
+    except (ConfigError, ValidationError) as e:
+        raise CommandError(f"配置文件校验失败: {path}\n{e}") from e
+
+
+# ---------- 输出 ----------
+def _emit(result, fmt: str = "json", out=None):
+    out = out or sys.stdout
+    if fmt == "jsonl" and isinstance(result, list):
+        for item in result:
+            out.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+    elif fmt == "text" and isinstance(result, list):
+        if result:
+            out.write("\t".join(result[0]) + "\n")
+        for item in result:
+            out.write("\t".join("" if v is None else str(v) for v in item.values()))
+            out.write("\n")
+    else:
+        indent = 2 if fmt == "text" else None
+        json.dump(result, out, ensure_ascii=False, default=str, indent=indent)
+        out.write("\n")
+
+
+# ---------- 查询 ----------
+def _columns(conn: sqlite3.Connection) -> List[str]:
+    from custom_utils.columns import read_table_columns
+
+    columns = read_table_columns(conn)
+    if not columns:
+        raise CommandError("数据库中没有治具表，请先运行 jigctl migrate")
+    return columns
+
+
+def _column(columns: Sequence[str], name: str) -> str:
+    """列名（不区分大小写）校验后再拼入 SQL"""
+    for column in columns:
+        if column.lower() == name.lower():
+            return column
+    raise CommandError(f"没有名为 {name} 的字段")
+
+
+def _where(conn: sqlite3.Connection, args) -> Tuple[str, List]:
+    columns = _columns(conn)
+    clauses, params = [], []
+    if getattr(args, "text", None):
+        clauses.append("(no LIKE ? OR name LIKE ? OR model LIKE ?)")
+        params += [f"%{args.text}%"] * 3
+    if args.type:
+        clauses.append("type = ?")
+        params.append(args.type)
+    if args.status:
+        clauses.append("UseStatus = ?")
+        params.append(args.status)
+    if args.location:
+        clauses.append("Location = ?")
+        params.append(args.location)
+    if args.due_within is not None:
+        clauses.append("date(Checkdate, '+' || CheckCycle || ' days') <= ?")
+        params.append((date.today() + timedelta(days=args.due_within)).isoformat())
+    for condition in args.where or []:
+        name, sep, value = condition.partition("=")
+        if not sep:
+            raise CommandError(f"条件格式应为 字段=值: {condition}")
+        clauses.append(f'"{_column(columns, name.strip())}" = ?')
+        params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _select(conn: sqlite3.Connection, args) -> Tuple[List[str], sqlite3.Cursor]:
+    columns = _columns(conn)
+    fields = (
+        [_column(columns, f.strip()) for f in args.fields.split(",")]
+        if args.fields
+        else columns
+    )
+    where, params = _where(conn, args)
+    limit = f" LIMIT {int(args.limit)}" if args.limit else ""
+    cols = ", ".join(f'"{f}"' for f in fields)
+    cursor = conn.execute(f"SELECT {cols} FROM jig{where} ORDER BY no{limit}", params)
+    return fields, cursor
+
+
+def _rows(fields: List[str], cursor: sqlite3.Cursor) -> Iterator[Dict]:
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            return
+        for row in rows:
+            yield dict(zip(fields, row))
+
+
+def cmd_list(args):
+    conn = db.connect(args.db)
+    try:
+        fields, cursor = _select(conn, args)
+        return list(_rows(fields, cursor))
+    finally:
+        conn.close()
+
+
+def cmd_get(args):
+    conn = db.connect(args.db)
+    try:
+        columns = _columns(conn)
+        row = conn.execute(
+            "SELECT * FROM jig WHERE no = ?", (args.no.strip(),)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise CommandError(f"未找到编号为 {args.no.strip()} 的治具")
+    return dict(zip(columns, row))
+
+
+# ---------- 取用/归还 ----------
+def _repository_call(args, action):
+    from custom_utils.repository import JigRepository, JigRepositoryError
+
+    repository = JigRepository(args.db)
+    try:
+        mode, record = action(repository)
+    except JigRepositoryError as e:
+        raise CommandError(str(e)) from e
+    finally:
+        repository.close()
+    return {"action": mode, **record._asdict()}
+
+
+def _find(repository, no: str):
+    from custom_utils.repository import JigNotFoundError
+
+    record = repository.find(no)
+    if record is None:
+        raise JigNotFoundError(f"未找到编号为 {no.strip()} 的治具")
+    return record
+
+
+def cmd_checkout(args):
+    return _repository_call(
+        args,
+        lambda r: ("checkout", r.checkout(_find(r, args.no).id, force=args.force)),
+    )
+
+
+def cmd_return(args):
+    return _repository_call(
+        args, lambda r: ("return", r.return_jig(_find(r, args.no).id))
+    )
+
+
+def cmd_scan(args):
+    return _repository_call(
+        args, lambda r: r.scan(args.no, mode=args.mode, force=args.force)
+    )
+
+
+# ---------- 导入/导出 ----------
+def _read_records(path: str) -> Iterator[Dict]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".txt"):
+        delimiter = "\t" if ext == ".txt" else ","
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f, delimiter=delimiter)
+    elif ext == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif ext == ".json":
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+    elif ext == ".xlsx":
+        # Excel 只能经 pandas 读取，不在常规路径上
+        import pandas as pd
+
+        for record in pd.read_excel(path, dtype=str).fillna("").to_dict("records"):
+            yield record
+    else:
+        raise CommandError(f"不支持的导入格式: {path}")
+
+
+def _import_rows(records: Iterable[Dict], registry) -> Iterator[Tuple[int, Dict]]:
+    """把导入文件的记录转换为 (行号, 字段字典)"""
+    model_fields = registry.model_class.model_fields
+    for line, record in enumerate(records, 2):
+        data = {}
+        for key, value in record.items():
+            field = registry.field_by_title(key) or key
+            info = model_fields.get(field)
+            if info is None or field == "id":
+                continue
+            # 空单元格：文本字段为空字符串，其他字段使用默认值
+            if value == "" and info.annotation is not str:
+                continue
+            data[field] = value
+        yield line, data
+
+
+def cmd_import(args):
+    """
+    导入治具：表头可以是字段名，也可以是界面导出的中文标题
+
+    每行先用 JigDynamic 校验（大文件分片并行校验）；编号已存在时跳过，--update 时更新。
+    """
+    from custom_utils.columns import get_registry
+    from custom_utils.repository import ensure_no_index
+    from custom_utils.validation import validate_rows
+
+    registry = get_registry(args.db)
+    conn = db.connect(args.db)
+    conn.isolation_level = None
+    result = {"inserted": 0, "updated": 0, "skipped": 0, "errors": []}
+    try:
+        ensure_no_index(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        rows = _import_rows(_read_records(args.path), registry)
+        for chunk in validate_rows(rows, workers=args.workers, dump=True):
+            errors = {}
+            for issue in chunk.issues:
+                errors.setdefault(issue.key, []).append(
+                    f"{issue.field}: {issue.message}"
+                )
+            for line, messages in errors.items():
+                result["errors"].append({"line": line, "error": "; ".join(messages)})
+            # mode="json"：枚举为值，日期为 yyyy-MM-dd，与界面写入的格式一致
+            for line, values in chunk.valid:
+                values.pop("id", None)
+                existing = conn.execute(
+                    "SELECT id FROM jig WHERE no = ?", (values["no"],)
+                ).fetchone()
+                if existing and not args.update:
+                    result["skipped"] += 1
+                elif existing:
+                    assignments = ", ".join(f'"{k}" = ?' for k in values)
+                    conn.execute(
+                        f"UPDATE jig SET {assignments} WHERE id = ?",
+                        [*values.values(), existing[0]],
+                    )
+                    result["updated"] += 1
+                else:
+                    cols = ", ".join(f'"{k}"' for k in values)
+                    marks = ", ".join("?" * len(values))
+                    conn.execute(
+                        f"INSERT INTO jig ({cols}) VALUES ({marks})",
+                        list(values.values()),
+                    )
+                    result["inserted"] += 1
+        result["errors"].sort(key=lambda e: e["line"])
+        if args.dry_run or (result["errors"] and not args.partial):
+            conn.execute("ROLLBACK")
+            result["committed"] = False
+        else:
+            conn.execute("COMMIT")
+            result["committed"] = True
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return result
+
+
+def cmd_validate(args):
+    """用当前模型复查库中全部治具（模型约束修改后使用）"""
+    from custom_utils.validation import revalidate
+
+    if args.format != "jsonl":
+        return revalidate(args.db, workers=args.workers, max_issues=args.max_issues)
+    # jsonl：边查边输出每条错误，最后一行为汇总
+    summary = revalidate(
+        args.db,
+        workers=args.workers,
+        max_issues=0,
+        on_issue=lambda issue: _emit([issue._asdict()], "jsonl"),
+    )
+    summary.pop("issues")
+    return summary
+
+
+def _write_csv(path: str, fields: List[str], rows: Iterable[Dict], delimiter=","):
+    encoding = "utf-8-sig" if delimiter == "," else "utf-8"
+    with open(path, "w", encoding=encoding, newline="") as f:
+        writer = csv.DictWriter(f, fields, delimiter=delimiter)
+        writer.writeheader()
+        n = 0
+        for row in rows:
+            writer.writerow(row)
+            n += 1
+    return n
+
+
+def cmd_export(args):
+    ext = os.path.splitext(args.path)[1].lower()
+    conn = db.connect(args.db)
+    try:
+        if ext in (".parquet", ".arrow"):
+            from custom_utils.columnar import ColumnarError, export_table
+
+            where, params = _where(conn, args)
+            ids = [
+                row[0]
+                for row in conn.execute(
+                    f"SELECT id FROM jig{where} ORDER BY no", params
+                )
+            ]
+            conn.close()
+            try:
+                rows = export_table(args.db, args.path, ids)
+            except ColumnarError as e:
+                raise CommandError(str(e)) from e
+            return {"path": args.path, "rows": rows}
+        fields, cursor = _select(conn, args)
+        rows = _rows(fields, cursor)
+        if ext == ".csv":
+            n = _write_csv(args.path, fields, rows)
+        elif ext == ".txt":
+            n = _write_csv(args.path, fields, rows, delimiter="\t")
+        elif ext == ".jsonl":
+            n = 0
+            with open(args.path, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    n += 1
+        else:
+            raise CommandError(f"不支持的导出格式: {args.path}")
+    finally:
+        conn.close()
+    return {"path": args.path, "rows": n}
+
+
+# ---------- 数据库 ----------
+def cmd_count(args):
+    """测试工位上报使用次数：优先交给本机的上报服务汇总，服务未运行时直接写入"""
+    from custom_utils.counters import (
+        CounterError,
+        add_direct,
+        parse_line,
+        send_increments,
+    )
+
+    settings = _load_settings().counters
+    try:
+        no, count = parse_line(f"{args.no} {args.count}", settings.max_increment)
+    except CounterError as e:
+        raise CommandError(str(e)) from e
+    if not args.direct:
+        try:
+            reply = send_increments([(no, count)], settings.host, settings.port)[0]
+        except OSError:
+            logger.info("上报服务未运行，直接写入数据库")
+        else:
+            if reply != "OK":
+                raise CommandError(reply.removeprefix("ERR "))
+            return {"no": no, "count": count, "queued": True}
+    _, unknown = add_direct(args.db, [(no, count)])
+    if unknown:
+        raise CommandError(f"未找到编号为 {no} 的治具")
+    return {"no": no, "count": count, "queued": False}
+
+
+def cmd_migrate(args):
+    """
+    建表（已存在时不动）并安装索引、触发器和汇总表，可重复执行
+
+    首次执行时把数据库转换为增量回收（完整 VACUUM，期间独占数据库），应在停机时执行。
+    """
+    from custom_utils.columns import read_table_columns
+    from custom_utils.dashboard import install_dashboard
+    from custom_utils.history import install_history
+    from custom_utils.maintenance import enable_incremental_vacuum, prepare_database
+    from custom_utils.repository import ensure_no_index, ensure_row_version
+
+    settings = _load_settings()
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    conn = db.connect(args.db)
+    try:
+        created = not read_table_columns(conn)
+    finally:
+        conn.close()
+    from Model import JigDynamic
+
+    if created:
+        from custom_utils import Model2SQL
+
+        Model2SQL.create_table_from_pydantic_model(
+            JigDynamic, db_path=args.db, table_name=db.JIG_TABLE
+        )
+    prepare_database(args.db, settings.maintenance)
+    # 一次性转换为增量回收：完整 VACUUM 会独占数据库，只在这里由管理员执行
+    conn = db.connect(args.db)
+    conn.isolation_level = None
+    try:
+        vacuumed = enable_incremental_vacuum(conn)
+    finally:
+        conn.close()
+
+    conn = db.connect(args.db)
+    try:
+        columns = {c.lower() for c in read_table_columns(conn)}
+        missing = [f for f in JigDynamic.model_fields if f.lower() not in columns]
+        unique_no = ensure_no_index(conn)
+        row_version_added = ensure_row_version(conn)
+        install_dashboard(conn)
+        install_history(conn)
+        if settings.sync.enabled:
+            from custom_utils.sync import SyncError, install_sync, station_name
+
+            conn.isolation_level = None
+            try:
+                install_sync(conn, station_name(settings.sync))
+            except SyncError as e:
+                raise CommandError(f"无法启用同步: {e}") from e
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        db.close(conn)
+    return {
+        "db": args.db,
+        "created": created,
+        "unique_no": unique_no,
+        "row_version_added": row_version_added,
+        "missing_columns": missing,
+        "journal_mode": journal_mode,
+        "incremental_vacuum_enabled": vacuumed,
+    }
+
+
+def cmd_backup(args):
+    from custom_utils import backup
+
+    settings = _load_settings().backup
+    dest_dir = backup.backup_dir(settings)
+    if args.list:
+        return backup.list_backups(dest_dir, args.name)
+    if args.restore:
+        snapshot = args.restore
+        if snapshot == "latest":
+            backups = backup.list_backups(dest_dir, args.name)
+            if not backups:
+                raise CommandError("没有可用的备份")
+            snapshot = backups[-1]
+        backup.restore(snapshot, db.DATABASES[args.name], safety_dir=dest_dir)
+        return {"restored": db.DATABASES[args.name], "from": snapshot}
+    return backup.backup_all(settings)
+
+
+def cmd_stats(args):
+    from custom_utils.dashboard import SUMMARY_TABLES, read_dashboard
+    from custom_utils.maintenance import storage_stats
+
+    conn = db.connect(args.db)
+    try:
+        tables = {
+            row[0]
+            for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        }
+        if set(SUMMARY_TABLES) <= tables:
+            summary = read_dashboard(conn)
+        else:
+            # 没有汇总表（未运行过 migrate）时直接统计
+            rows = conn.execute(
+                "SELECT type, UseStatus, COUNT(*) FROM jig GROUP BY type, UseStatus"
+            ).fetchall()
+            summary = {"total": sum(r[2] for r in rows), "type_status": rows}
+        storage = storage_stats(conn, args.db)
+    finally:
+        conn.close()
+    by_status: Dict[str, int] = {}
+    by_type: Dict[str, int] = {}
+    for jig_type, status, n in summary["type_status"]:
+        by_status[status] = by_status.get(status, 0) + n
+        by_type[jig_type] = by_type.get(jig_type, 0) + n
+    result = {"total": summary["total"], "by_status": by_status, "by_type": by_type}
+    if "due" in summary:
+        result["due"] = dict(summary["due"])
+    result["storage"] = {
+        **storage._asdict(),
+        "free_ratio": round(storage.free_ratio, 4),
+    }
+    return result
+
+
+def cmd_enum(args):
+    conn = db.connect(db.enum_db_path)
+    table = args.table
+    try:
+        with conn:
+            if args.action == "add":
+                exists = conn.execute(
+                    f"SELECT 1 FROM {table} WHERE {table} = ?", (args.value,)
+                ).fetchone()
+                if exists:
+                    raise CommandError(f"{table} 中已有 {args.value}")
+                conn.execute(f"INSERT INTO {table} ({table}) VALUES (?)", (args.value,))
+            elif args.action == "remove":
+                if not conn.execute(
+                    f"DELETE FROM {table} WHERE {table} = ?", (args.value,)
+                ).rowcount:
+                    raise CommandError(f"{table} 中没有 {args.value}")
+        return [row[0] for row in conn.execute(f"SELECT {table} FROM {table}")]
+    finally:
+        conn.close()
+
+
+def cmd_report(args):
+    from custom_utils.reports import ReportError, export
+
+    params = {"days": args.days} if args.days is not None else None
+    try:
+        return {"path": export(args.name, args.dest, params, db_path=args.db)}
+    except ReportError as e:
+        raise CommandError(str(e)) from e
+
+
+# ---------- 参数 ----------
+def _add_filters(parser: argparse.ArgumentParser):
+    parser.add_argument("--type", help="治具类型")
+    parser.add_argument("--status", help="使用状态")
+    parser.add_argument("--location", help="存放位置")
+    parser.add_argument(
+        "--due-within", type=int, metavar="DAYS", help="这么多天内校验到期（含已过期）"
+    )
+    parser.add_argument(
+        "--where", action="append", metavar="字段=值", help="按字段精确匹配，可重复"
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="jigctl", description="治具管理命令行工具")
+    parser.add_argument("--db", default=db.jig_db_path, help="数据库路径")
+    parser.add_argument(
+        "--format",
+        choices=("json", "jsonl", "text"),
+        default="json",
+        help="输出格式，列表在 jsonl 下每行一条",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出日志")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="按条件列出治具")
+    _add_filters(p)
+    p.add_argument("--fields", help="只输出这些字段，逗号分隔")
+    p.add_argument("--limit", type=int)
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("search", help="按编号/名称/机种查找")
+    p.add_argument("text")
+    _add_filters(p)
+    p.add_argument("--fields", help="只输出这些字段，逗号分隔")
+    p.add_argument("--limit", type=int, default=100)
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("get", help="按编号读取一个治具")
+    p.add_argument("no")
+    p.set_defaults(func=cmd_get)
+
+    p = sub.add_parser("checkout", help="取用")
+    p.add_argument("no")
+    p.add_argument("--force", action="store_true", help="使用次数已达上限时仍然取用")
+    p.set_defaults(func=cmd_checkout)
+
+    p = sub.add_parser("return", help="归还")
+    p.add_argument("no")
+    p.set_defaults(func=cmd_return)
+
+    p = sub.add_parser("scan", help="扫码：未使用则取用，使用中则归还")
+    p.add_argument("no")
+    p.add_argument("--mode", choices=("auto", "checkout", "return"), default="auto")
+    p.add_argument("--force", action="store_true")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("import", help="从 csv/txt/json/jsonl/xlsx 导入")
+    p.add_argument("path")
+    p.add_argument("--update", action="store_true", help="编号已存在时更新")
+    p.add_argument("--dry-run", action="store_true", help="只校验，不写入")
+    p.add_argument("--partial", action="store_true", help="有错误行时仍提交其余行")
+    p.add_argument("--workers", type=int, help="校验进程数，默认为 CPU 核数")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("validate", help="用当前模型复查库中全部治具")
+    p.add_argument("--workers", type=int, help="进程数，默认为 CPU 核数")
+    p.add_argument("--max-issues", type=int, default=1000, help="最多输出的错误条数")
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("count", help="上报使用次数（测试工位每循环一次）")
+    p.add_argument("no")
+    p.add_argument("count", nargs="?", type=int, default=1)
+    p.add_argument("--direct", action="store_true", help="不经过上报服务，直接写入")
+    p.set_defaults(func=cmd_count)
+
+    p = sub.add_parser("export", help="导出为 csv/txt/jsonl/parquet/arrow")
+    p.add_argument("path")
+    _add_filters(p)
+    p.add_argument("--fields", help="只导出这些字段，逗号分隔（csv/txt/jsonl）")
+    p.add_argument("--limit", type=int)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser(
+        "migrate", help="建表并安装索引、触发器和汇总表（首次执行会 VACUUM）"
+    )
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("backup", help="备份、列出备份或从备份恢复")
+    p.add_argument("--list", action="store_true", help="列出备份")
+    p.add_argument("--restore", metavar="SNAPSHOT", help="备份文件路径，或 latest")
+    p.add_argument("--name", default="jig", choices=list(db.DATABASES))
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("stats", help="库存和存储统计")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("enum", help="查看或修改治具类型等枚举")
+    p.add_argument("action", choices=("list", "add", "remove"))
+    p.add_argument("value", nargs="?")
+    p.add_argument("--table", default="JigType", choices=ENUM_TABLES)
+    p.set_defaults(func=cmd_enum)
+
+    p = sub.add_parser("report", help="生成报表（.html / .pdf）")
+    p.add_argument("name")
+    p.add_argument("dest")
+    p.add_argument("--days", type=int)
+    p.set_defaults(func=cmd_report)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "enum" and args.action != "list" and not args.value:
+        parser.error("enum add/remove 需要指定值")
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr
+    )
+    try:
+        result = args.func(args)
+    except (CommandError, sqlite3.Error, OSError) as e:
+        _emit({"error": str(e)})
+        return 1
+    _emit(result, args.format)
+    return 0
+
+
+if __name__ == "__main__":
+    # 打包为可执行文件后，校验进程池的子进程从这里启动
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,6 +1,19 @@
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
 import logging
 from pathlib import Path
 from logging import Filter, LogRecord
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [User: %(user)s] - %(message)s"
+
+# 当前生效的后台监听器，避免重复配置
+_listener = None
 
 
 class UserContextFilter(Filter):
@@ -14,7 +27,7 @@ class UserContextFilter(Filter):
 
     def filter(self, record: LogRecord) -> bool:
         # 给每条日志记录添加当前用户信息
-        record.user = getattr(self, "current_user", "Unknown")
+        record.user = self.current_user
         return True
 
 
@@ -26,48 +39,215 @@ class UserContextFormatter(logging.Formatter):
     自定义日志格式器，能够在日志中添加当前用户信息
     """
 
+    def __init__(self, fmt=LOG_FORMAT, datefmt=None):
+        super().__init__(fmt=fmt, datefmt=datefmt)
+
     def format(self, record):
-        # 动态添加用户信息到日志记录中
-        if hasattr(user_context_filter, "current_user"):
+        # 记录在入队时已由 user_context_filter 带上用户，这里只做兜底
+        if not hasattr(record, "user"):
             record.user = user_context_filter.current_user
-        else:
-            record.user = "Unknown"
-
-        # 使用带有用户信息的格式
-        self._style._fmt = (
-            "%(asctime)s - %(name)s - %(levelname)s - [User: %(user)s] - %(message)s"
-        )
         return super().format(record)
 
 
-def setup_logging(log_level=logging.INFO, log_dir="logs", log_filename="app.log"):
+class JsonLinesFormatter(logging.Formatter):
+    """
+    每条日志输出为一行 JSON
+    """
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "user": getattr(record, "user", "Unknown"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _UserQueueHandler(QueueHandler):
+    """
+    只做最少工作的 QueueHandler：合并消息参数后入队，格式化交给后台线程
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+def _next_midnight(now: float) -> float:
+    t = time.localtime(now)
+    return time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+
+class SizedTimedRotatingFileHandler(BaseRotatingHandler):
+    """
+    按大小和日期同时轮转的文件处理器
+
+    :param filename: 日志文件路径
+    :param max_bytes: 单个文件最大字节数，0 表示不按大小轮转
+    :param backup_count: 保留的历史文件个数
+    :param daily: 是否在每天零点轮转
+    :param compress: 是否把轮转出的文件压缩为 .gz
+    """
+
+    def __init__(
+        self,
+        filename,
+        max_bytes=10 * 1024 * 1024,
+        backup_count=10,
+        daily=True,
+        compress=False,
+        encoding="utf-8",
+    ):
+        super().__init__(filename, "a", encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.daily = daily
+        self.compress = compress
+        self.rollover_at = _next_midnight(time.time()) if daily else None
+
+    def shouldRollover(self, record) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record) + self.terminator
+            self.stream.seek(0, 2)
+            if self.stream.tell() + len(msg.encode(self.encoding)) >= self.max_bytes:
+                return True
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename):
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            dfn = f"{self.baseFilename}.{stamp}"
+            n = 1
+            while os.path.exists(dfn) or os.path.exists(dfn + ".gz"):
+                dfn = f"{self.baseFilename}.{stamp}-{n}"
+                n += 1
+            if self.compress:
+                with open(self.baseFilename, "rb") as src:
+                    with gzip.open(dfn + ".gz", "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                os.remove(self.baseFilename)
+            else:
+                os.replace(self.baseFilename, dfn)
+            self._purge_old()
+
+        if self.daily:
+            self.rollover_at = _next_midnight(time.time())
+
+    def _purge_old(self):
+        if self.backup_count <= 0:
+            return
+        base = Path(self.baseFilename)
+        olds = sorted(
+            base.parent.glob(base.name + ".*"), key=lambda p: p.stat().st_mtime_ns
+        )
+        for p in olds[: max(0, len(olds) - self.backup_count)]:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+def setup_logging(
+    log_level=logging.INFO,
+    log_dir="logs",
+    log_filename="app.log",
+    console_level=None,
+    max_bytes=10 * 1024 * 1024,
+    backup_count=10,
+    json_lines=False,
+    compress=True,
+):
     """
-    配置全局日志：同时输出到控制台和文件
+    配置全局日志：调用线程只负责入队，控制台和文件输出由后台线程完成
+
+    :param log_level: 文件日志级别，同时也是根 logger 的级别
+    :param log_dir: 日志目录
+    :param log_filename: 日志文件名
+    :param console_level: 控制台日志级别，默认与 log_level 相同
+    :param max_bytes: 单个日志文件最大字节数
+    :param backup_count: 保留的历史日志文件个数
+    :param json_lines: 是否额外输出 JSON Lines 日志（文件名后缀为 .jsonl）
+    :param compress: 轮转后的历史文件是否压缩
     """
+    global _listener
+    if _listener is not None:
+        return _listener
+
     # 创建日志目录
     log_path = Path(log_dir)
     log_path.mkdir(exist_ok=True)
     full_log_path = log_path / log_filename
 
+    if console_level is None:
+        console_level = log_level
+
     # 创建格式器
     formatter = UserContextFormatter(datefmt="%Y-%m-%d %H:%M:%S")
 
     # 创建处理器：控制台
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
+    console_handler.setLevel(console_level)
     console_handler.setFormatter(formatter)
 
-    # 创建处理器：文件（带轮转更佳，这里先用基础版）
-    file_handler = logging.FileHandler(full_log_path, encoding="utf-8")
+    # 创建处理器：文件（按大小和日期轮转）
+    file_handler = SizedTimedRotatingFileHandler(
+        full_log_path, max_bytes=max_bytes, backup_count=backup_count, compress=compress
+    )
     file_handler.setLevel(log_level)
     file_handler.setFormatter(formatter)
+    handlers = [console_handler, file_handler]
+
+    if json_lines:
+        json_handler = SizedTimedRotatingFileHandler(
+            full_log_path.with_suffix(".jsonl"),
+            max_bytes=max_bytes,
+            backup_count=backup_count,
+            compress=compress,
+        )
+        json_handler.setLevel(log_level)
+        json_handler.setFormatter(JsonLinesFormatter(datefmt="%Y-%m-%dT%H:%M:%S"))
+        handlers.append(json_handler)
 
-    # 获取根 logger 并设置级别
+    # 获取根 logger 并设置级别：低于该级别的日志在创建记录前就被丢弃
     root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
+    root_logger.setLevel(min(log_level, console_level))
 
     # 避免重复添加 handler（重要！）
-    if not root_logger.handlers:
-        root_logger.addHandler(console_handler)
-        root_logger.addHandler(file_handler)
-        root_logger.addFilter(user_context_filter)
+    if root_logger.handlers:
+        return None
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _UserQueueHandler(log_queue)
+    # 在调用线程中带上当前用户，保证与日志发生时一致
+    queue_handler.addFilter(user_context_filter)
+    root_logger.addHandler(queue_handler)
+
+    # respect_handler_level：各处理器的级别在格式化之前生效
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """停止后台日志线程并刷新所有输出"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
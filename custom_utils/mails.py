@@ -6,18 +6,47 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def send_email(subject, message, user_id, from_addr, to_addr, pwd):
+SMTP_HOST = "mail01-ap-dg.dg.apitech.com.tw"
+SMTP_PORT = 465
+
+
+def build_message(subject, message, from_addr, to_addr) -> MIMEMultipart:
     msg = MIMEMultipart()
     msg["From"] = from_addr
     msg["to"] = to_addr
     msg["Subject"] = subject  # 标题
 
     msg.attach(MIMEText(message, "html"))  # 正文
+    return msg
+
+
+def open_smtp(user_id, pwd, timeout=30) -> smtplib.SMTP:
+    """建立并登录 SMTP 连接，调用方负责关闭（可用 with 语句）"""
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=timeout)
+    try:
+        server.starttls()
+        server.login(f"APINTDMN3\\{user_id}", pwd)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def verify_login(user_id, pwd, timeout=30) -> bool:
+    """只登录邮件服务器验证账号密码，不发送邮件"""
+    try:
+        with open_smtp(user_id, pwd, timeout):
+            return True
+    except Exception as e:
+        logger.error(f"邮件服务器登录失败:{e}")
+        return False
+
+
+def send_email(subject, message, user_id, from_addr, to_addr, pwd, timeout=30):
+    msg = build_message(subject, message, from_addr, to_addr)
 
     try:
-        with smtplib.SMTP("mail01-ap-dg.dg.apitech.com.tw", 465) as server:
-            server.starttls()
-            server.login(f"APINTDMN3\\{user_id}", pwd)
+        with open_smtp(user_id, pwd, timeout) as server:
             server.send_message(msg)
             logger.info("邮件发送成功！")
             return True
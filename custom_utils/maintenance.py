@@ -0,0 +1,323 @@
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from custom_utils import db, metrics
+from custom_utils.settings import MaintenanceSettings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class StorageStats(NamedTuple):
+    page_size: int
+    page_count: int
+    freelist_count: int
+    file_bytes: int
+    wal_bytes: int
+    journal_mode: str
+    auto_vacuum: int
+    # 非连续页比例，dbstat 不可用时为 None
+    fragmentation: Optional[float]
+
+    @property
+    def free_ratio(self) -> float:
+        return self.freelist_count / self.page_count if self.page_count else 0.0
+
+    def describe(self) -> str:
+        frag = "-" if self.fragmentation is None else f"{self.fragmentation:.1%}"
+        return (
+            f"{self.file_bytes / 1024 / 1024:.2f} MB，{self.page_count} 页"
+            f"（每页 {self.page_size} 字节），空闲 {self.freelist_count} 页"
+            f"（{self.free_ratio:.1%}），碎片 {frag}，"
+            f"日志模式 {self.journal_mode}，WAL {self.wal_bytes / 1024 / 1024:.2f} MB"
+        )
+
+
+def _pragma(conn: sqlite3.Connection, name: str):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def fragmentation(conn: sqlite3.Connection) -> Optional[float]:
+    """
+    按 B 树顺序遍历页面，统计页号不紧接上一页的比例（与 sqlite3_analyzer 相同的口径）
+
+    需要 SQLite 编译时启用 dbstat 虚拟表，否则返回 None。
+    """
+    try:
+        rows = conn.execute(
+            "SELECT name, pageno FROM dbstat WHERE aggregate = 0 ORDER BY name, path"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    total = gaps = 0
+    prev_name = prev_page = None
+    for name, pageno in rows:
+        if name == prev_name:
+            total += 1
+            if pageno != prev_page + 1:
+                gaps += 1
+        prev_name, prev_page = name, pageno
+    return gaps / total if total else 0.0
+
+
+def storage_stats(conn: sqlite3.Connection, db_path: str) -> StorageStats:
+    wal_path = db_path + "-wal"
+    return StorageStats(
+        page_size=_pragma(conn, "page_size"),
+        page_count=_pragma(conn, "page_count"),
+        freelist_count=_pragma(conn, "freelist_count"),
+        file_bytes=os.path.getsize(db_path),
+        wal_bytes=os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        journal_mode=_pragma(conn, "journal_mode"),
+        auto_vacuum=_pragma(conn, "auto_vacuum"),
+        fragmentation=fragmentation(conn),
+    )
+
+
+def publish_stats(name: str, stats: StorageStats):
+    """写入指标仪表，在性能统计窗口中显示"""
+    prefix = f"storage.{name}"
+    metrics.set_gauge(f"{prefix}.file_mb", round(stats.file_bytes / 1024 / 1024, 2))
+    metrics.set_gauge(f"{prefix}.wal_mb", round(stats.wal_bytes / 1024 / 1024, 2))
+    metrics.set_gauge(f"{prefix}.pages", stats.page_count)
+    metrics.set_gauge(f"{prefix}.free_pages", stats.freelist_count)
+    if stats.fragmentation is not None:
+        metrics.set_gauge(f"{prefix}.fragmentation", round(stats.fragmentation, 4))
+
+
+def set_journal_mode(conn: sqlite3.Connection, wal: bool) -> str:
+    """切换日志模式（持久保存在数据库文件中），返回切换后的模式"""
+    wanted = "wal" if wal else "delete"
+    if _pragma(conn, "journal_mode") != wanted:
+        mode = conn.execute(f"PRAGMA journal_mode = {wanted}").fetchone()[0]
+        logger.info(f"日志模式: {mode}")
+    return _pragma(conn, "journal_mode")
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """
+    开启增量回收；已有数据库需要一次完整 VACUUM 才能生效
+
+    VACUUM 重写整个文件，期间独占数据库，只在管理员执行 jigctl migrate 时调用，
+    不在定时维护中执行。
+
+    :return: 是否执行了 VACUUM
+    """
+    if _pragma(conn, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL:
+        return False
+    with metrics.timer("maintenance.vacuum"):
+        conn.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+        conn.execute("VACUUM")
+    logger.info("已开启增量回收")
+    return True
+
+
+def incremental_vacuum(
+    conn: sqlite3.Connection, free_percent: float, chunk: int
+) -> int:
+    """
+    空闲页超过 free_percent% 时分批回收，每批单独提交，不长时间占用写锁
+
+    :return: 回收的页数
+    """
+    if _pragma(conn, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+        return 0
+    before = free = _pragma(conn, "freelist_count")
+    if free * 100 < _pragma(conn, "page_count") * free_percent:
+        return 0
+    with metrics.timer("maintenance.incremental_vacuum"):
+        while free > 0:
+            # 必须取完结果，语句才会执行到底
+            conn.execute(f"PRAGMA incremental_vacuum({chunk})").fetchall()
+            remaining = _pragma(conn, "freelist_count")
+            if remaining >= free:
+                break
+            free = remaining
+    logger.info(f"增量回收 {before - free} 页")
+    return before - free
+
+
+def _analyzed_rows(conn: sqlite3.Connection) -> Dict[str, int]:
+    """sqlite_stat1 中记录的各表行数（ANALYZE 时的行数）"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone()
+    if not exists:
+        return {}
+    rows = {}
+    for tbl, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+        rows[tbl] = int(stat.split()[0])
+    return rows
+
+
+def analyze_if_shifted(conn: sqlite3.Connection, percent: float) -> List[str]:
+    """
+    对行数与上次 ANALYZE 相比变化超过 percent% 的表重新 ANALYZE
+
+    :return: 重新统计的表
+    """
+    analyzed = _analyzed_rows(conn)
+    tables = [
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name NOT LIKE 'sqlite_%'"
+        )
+    ]
+    shifted = []
+    for table in tables:
+        count = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        old = analyzed.get(table)
+        if old is None:
+            if count:
+                shifted.append(table)
+        elif abs(count - old) * 100 > max(old, 1) * percent:
+            shifted.append(table)
+    if shifted:
+        with metrics.timer("maintenance.analyze"):
+            for table in shifted:
+                conn.execute(f'ANALYZE "{table}"')
+        logger.info(f"已重新统计: {', '.join(shifted)}")
+    return shifted
+
+
+def checkpoint(
+    conn: sqlite3.Connection, db_path: str, limit_mb: float
+) -> Optional[str]:
+    """
+    WAL 检查点：平时用 PASSIVE（不等待读者），WAL 文件超过 limit_mb 时用 TRUNCATE 截断
+
+    :return: 使用的检查点模式，非 WAL 模式时返回 None
+    """
+    if _pragma(conn, "journal_mode") != "wal":
+        return None
+    wal_path = db_path + "-wal"
+    size = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    mode = "TRUNCATE" if size > limit_mb * 1024 * 1024 else "PASSIVE"
+    busy, _, _ = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    if busy:
+        logger.debug(f"WAL 检查点未完成（{mode}），有其他连接正在使用")
+    return mode
+
+
+def prepare_database(db_path: str, settings: MaintenanceSettings):
+    """启动时设置日志模式，在打开其他连接之前调用"""
+    conn = db.connect(db_path)
+    try:
+        set_journal_mode(conn, settings.wal)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"无法切换日志模式（{db_path}）: {e}")
+    finally:
+        conn.close()
+
+
+def maintain(
+    db_path: str, settings: MaintenanceSettings, name: str = None
+) -> StorageStats:
+    """对一个数据库执行一轮维护，返回维护后的存储统计"""
+    name = name or os.path.splitext(os.path.basename(db_path))[0]
+    conn = db.connect(db_path)
+    conn.isolation_level = None
+    try:
+        # 未开启增量回收（尚未执行 jigctl migrate）时跳过回收
+        incremental_vacuum(conn, settings.free_percent, settings.vacuum_pages)
+        analyze_if_shifted(conn, settings.analyze_percent)
+        checkpoint(conn, db_path, settings.wal_limit_mb)
+        stats = storage_stats(conn, db_path)
+    finally:
+        db.close(conn)
+    publish_stats(name, stats)
+    logger.info(f"{name}: {stats.describe()}")
+    return stats
+
+
+class MaintenanceScheduler:
+    """
+    定时存储维护线程：增量回收、按需 ANALYZE、WAL 检查点和存储统计
+
+    :param settings: 维护配置
+    :param databases: 名称 -> 数据库路径
+    """
+
+    def __init__(self, settings: MaintenanceSettings, databases: Dict[str, str] = None):
+        self.settings = settings
+        self.databases = databases or db.DATABASES
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def update(self, settings: MaintenanceSettings):
+        self.settings = settings
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="MaintenanceScheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        for name, path in self.databases.items():
+            if not os.path.exists(path):
+                continue
+            try:
+                maintain(path, self.settings, name)
+            except Exception as e:
+                metrics.inc("maintenance.error")
+                logger.error(f"数据库维护失败（{name}）: {e}", exc_info=True)
+
+    def _run(self):
+        # 启动后稍等再执行，避免和主窗口初始化争用数据库
+        if self._stop.wait(60):
+            return
+        while not self._stop.is_set():
+            if self.settings.enabled:
+                self.run_once()
+            self._stop.wait(self.settings.interval_minutes * 60)
+
+
+def main(argv=None):
+    from custom_utils.settings import load_settings
+
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_utils.maintenance", description="治具数据库存储维护"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="显示存储统计")
+    sub.add_parser("run", help="立即执行一轮维护")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    settings = load_settings(os.path.join(db.root_path, "config.ini")).maintenance
+
+    for name, path in db.DATABASES.items():
+        if not os.path.exists(path):
+            continue
+        if args.command == "run":
+            stats = maintain(path, settings, name)
+        else:
+            conn = db.connect(path)
+            try:
+                stats = storage_stats(conn, path)
+            finally:
+                conn.close()
+        print(f"{name}: {stats.describe()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
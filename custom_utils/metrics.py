@@ -0,0 +1,256 @@
+import json
+import time
+import logging
+import threading
+from collections import deque
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from custom_utils.jiglogger import user_context_filter
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def _current_user() -> str:
+    return getattr(user_context_filter, "current_user", "Unknown")
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    """最近秩法计算百分位数，sorted_samples 必须已排序"""
+    if not sorted_samples:
+        return 0.0
+    rank = int(round(pct / 100.0 * (len(sorted_samples) - 1)))
+    return sorted_samples[rank]
+
+
+class Counter:
+    """单调递增计数器"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+
+class Histogram:
+    """
+    直方图：记录次数、总和、最值，并保留最近 reservoir_size 个样本用于计算百分位数
+    """
+
+    __slots__ = ("count", "total", "min", "max", "samples")
+
+    def __init__(self, reservoir_size: int = 2048):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.samples = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.samples.append(value)
+
+    def merge(self, other: "Histogram"):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.samples.extend(other.samples)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": _percentile(ordered, 50),
+            "p95": _percentile(ordered, 95),
+            "p99": _percentile(ordered, 99),
+        }
+
+
+class _Timer:
+    """计时上下文，退出时把耗时（毫秒）写入直方图"""
+
+    __slots__ = ("_registry", "_name", "_start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str):
+        self._registry = registry
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self._start) * 1000.0
+        self._registry.observe(self._name, elapsed_ms)
+        if exc_type is not None:
+            self._registry.inc(self._name + ".error")
+        return False
+
+
+class MetricsRegistry:
+    """
+    轻量级指标注册表：计数器、直方图、计时器、仪表
+
+    每个指标以 (名称, 当前用户) 为键，用户取自 user_context_filter.current_user；
+    仪表（如队列深度）反映系统状态，不区分用户。
+    """
+
+    def __init__(self, reservoir_size: int = 2048):
+        self.reservoir_size = reservoir_size
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, str], Counter] = {}
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._gauges: Dict[str, float] = {}
+        self._dump_timer: Optional[threading.Timer] = None
+        self._dump_interval = 0.0
+        self._dump_path: Optional[Path] = None
+
+    # ---------- 记录 ----------
+    def inc(self, name: str, n: int = 1):
+        key = (name, _current_user())
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = Counter()
+            counter.inc(n)
+
+    def observe(self, name: str, value: float):
+        key = (name, _current_user())
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(self.reservoir_size)
+            hist.observe(value)
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def timer(self, name: str) -> _Timer:
+        """
+        计时上下文管理器::
+
+            with registry.timer("sql.select"):
+                model.select()
+        """
+        return _Timer(self, name)
+
+    def timed(self, name: Optional[str] = None):
+        """计时装饰器，默认以函数的限定名作为指标名"""
+
+        def decorator(func):
+            metric_name = name or f"{func.__module__}.{func.__qualname__}"
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Timer(self, metric_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    # ---------- 读取 ----------
+    def snapshot(self, by_user: bool = True) -> List[dict]:
+        """
+        返回所有指标的汇总
+
+        :param by_user: True 时按用户分别统计，False 时合并所有用户
+        :return: 每个指标一个 dict，包含 name/user/kind 以及统计值
+        """
+        with self._lock:
+            counters = {k: c.value for k, c in self._counters.items()}
+            gauges = dict(self._gauges)
+            histograms = {}
+            for (name, user), hist in self._histograms.items():
+                key = (name, user if by_user else "*")
+                merged = histograms.get(key)
+                if merged is None:
+                    merged = histograms[key] = Histogram(self.reservoir_size * 4)
+                merged.merge(hist)
+
+        rows = []
+        merged_counters: Dict[Tuple[str, str], int] = {}
+        for (name, user), value in counters.items():
+            key = (name, user if by_user else "*")
+            merged_counters[key] = merged_counters.get(key, 0) + value
+        for (name, user), value in sorted(merged_counters.items()):
+            rows.append({"name": name, "user": user, "kind": "counter", "count": value})
+        for name, value in sorted(gauges.items()):
+            rows.append({"name": name, "user": "-", "kind": "gauge", "count": value})
+        for (name, user), hist in sorted(histograms.items()):
+            row = {"name": name, "user": user, "kind": "timer"}
+            row.update(hist.summary())
+            rows.append(row)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._gauges.clear()
+
+    # ---------- 定期输出 ----------
+    def dump(self, path) -> None:
+        """把当前快照以 JSON Lines 形式追加到文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ts = time.strftime("%Y-%m-%d %H:%M:%S")
+        with open(path, "a", encoding="utf-8") as f:
+            for row in self.snapshot():
+                row["ts"] = ts
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        logger.debug(f"性能指标已写入 {path}")
+
+    def start_periodic_dump(self, path, interval: float = 300.0):
+        """
+        启动后台定时输出
+
+        :param path: 输出文件路径（JSON Lines）
+        :param interval: 间隔秒数
+        """
+        self.stop_periodic_dump()
+        self._dump_path = Path(path)
+        self._dump_interval = interval
+        self._schedule_dump()
+
+    def stop_periodic_dump(self):
+        if self._dump_timer is not None:
+            self._dump_timer.cancel()
+            self._dump_timer = None
+
+    def _schedule_dump(self):
+        self._dump_timer = threading.Timer(self._dump_interval, self._periodic_dump)
+        self._dump_timer.daemon = True
+        self._dump_timer.start()
+
+    def _periodic_dump(self):
+        try:
+            self.dump(self._dump_path)
+        except Exception as e:
+            logger.error(f"性能指标写入失败: {e}")
+        self._schedule_dump()
+
+
+# 全局注册表
+registry = MetricsRegistry()
+inc = registry.inc
+observe = registry.observe
+set_gauge = registry.set_gauge
+timer = registry.timer
+timed = registry.timed
@@ -0,0 +1,323 @@
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from custom_utils import metrics
+from custom_utils.mails import build_message, open_smtp
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mail_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    message TEXT NOT NULL,
+    from_addr TEXT NOT NULL,
+    to_addr TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+-- 同一封邮件在待发送期间只保留一条
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mail_outbox_pending_digest
+    ON mail_outbox(digest) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_mail_outbox_due
+    ON mail_outbox(status, next_attempt);
+"""
+
+
+def _digest(subject, message, from_addr, to_addr) -> str:
+    data = "\0".join([from_addr, to_addr, subject, message]).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class MailOutbox:
+    """
+    持久化的发件箱（SQLite）
+
+    :param db_path: 发件箱数据库路径
+    :param max_attempts: 最多尝试次数，超过后标记为失败
+    :param base_delay: 首次重试的等待秒数，之后按 2 的幂次增长
+    :param max_delay: 重试等待的上限秒数
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_attempts: int = 8,
+        base_delay: float = 30,
+        max_delay: float = 3600,
+    ):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, subject, message, from_addr, to_addr, user_id) -> bool:
+        """
+        加入发件箱
+
+        :return: 新加入返回 True；已有相同的待发邮件时返回 False
+        """
+        digest = _digest(subject, message, from_addr, to_addr)
+        conn = self._connect()
+        try:
+            with conn:
+                cur = conn.execute(
+                    """INSERT OR IGNORE INTO mail_outbox
+                    (digest, subject, message, from_addr, to_addr, user_id, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        digest,
+                        subject,
+                        message,
+                        from_addr,
+                        to_addr,
+                        user_id,
+                        time.time(),
+                    ),
+                )
+        finally:
+            conn.close()
+        if cur.rowcount == 0:
+            logger.debug(f"发件箱中已有相同邮件，忽略: {subject}")
+            metrics.inc("mail.deduplicated")
+            return False
+        logger.debug(f"邮件已加入发件箱: {subject}")
+        return True
+
+    def due(self, limit: int = 100) -> List[sqlite3.Row]:
+        """取出已到发送时间的待发邮件"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                """SELECT * FROM mail_outbox
+                WHERE status = 'pending' AND next_attempt <= ?
+                ORDER BY id LIMIT ?""",
+                (time.time(), limit),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def mark_sent(self, ids: List[int]):
+        if not ids:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "UPDATE mail_outbox SET status = 'sent', sent_at = ? WHERE id = ?",
+                    [(time.time(), i) for i in ids],
+                )
+        finally:
+            conn.close()
+
+    def mark_retry(self, rows: List[sqlite3.Row], error: str):
+        """记录一次发送失败，按指数退避安排下次尝试或标记为失败"""
+        if not rows:
+            return
+        now = time.time()
+        params = []
+        failed = 0
+        for row in rows:
+            attempts = row["attempts"] + 1
+            if attempts >= self.max_attempts:
+                status = STATUS_FAILED
+                failed += 1
+            else:
+                status = STATUS_PENDING
+            delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+            params.append((status, attempts, now + delay, error, row["id"]))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    """UPDATE mail_outbox
+                    SET status = ?, attempts = ?, next_attempt = ?, last_error = ?
+                    WHERE id = ?""",
+                    params,
+                )
+        finally:
+            conn.close()
+        metrics.inc("mail.retry", len(rows) - failed)
+        if failed:
+            metrics.inc("mail.failed", failed)
+            logger.error(f"{failed} 封邮件多次发送失败，已放弃: {error}")
+
+    def stats(self) -> Dict[str, int]:
+        """各状态的邮件数量"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM mail_outbox GROUP BY status"
+            ).fetchall()
+        finally:
+            conn.close()
+        result = {STATUS_PENDING: 0, STATUS_SENT: 0, STATUS_FAILED: 0}
+        result.update({status: count for status, count in rows})
+        return result
+
+    def purge_sent(self, older_than_days: float = 30):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM mail_outbox WHERE status = 'sent' AND sent_at < ?",
+                    (time.time() - older_than_days * 86400,),
+                )
+        finally:
+            conn.close()
+
+
+class OutboxWorker:
+    """
+    后台投递线程：按发件人分批，每批复用一个 SMTP 连接
+
+    发件人的密码只保存在内存中；没有凭据的邮件会留在发件箱，
+    直到该用户再次登录并调用 set_credentials。
+
+    :param outbox: 发件箱
+    :param connect: 建立已登录 SMTP 连接的函数 (user_id, pwd, timeout)，可替换为测试桩
+    :param poll_interval: 空闲时轮询间隔（秒）
+    :param timeout: SMTP 超时（秒）
+    """
+
+    def __init__(
+        self,
+        outbox: MailOutbox,
+        connect: Callable = open_smtp,
+        poll_interval: float = 30,
+        timeout: float = 30,
+    ):
+        self.outbox = outbox
+        self.connect = connect
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._credentials: Dict[str, Tuple[str, str]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def set_credentials(self, from_addr: str, user_id: str, pwd: str):
+        self._credentials[from_addr] = (user_id, pwd)
+        self.wake()
+
+    def send(self, subject, message, from_addr, to_addr, user_id) -> bool:
+        """加入发件箱并唤醒投递线程，立即返回"""
+        added = self.outbox.enqueue(subject, message, from_addr, to_addr, user_id)
+        self.wake()
+        return added
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="OutboxWorker", daemon=True
+        )
+        self._thread.start()
+        logger.info("邮件投递线程已启动")
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.deliver_once()
+            except Exception as e:
+                logger.error(f"邮件投递异常: {e}", exc_info=True)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def deliver_once(self) -> int:
+        """投递一轮到期邮件，返回成功发送的数量"""
+        rows = self.outbox.due()
+        batches: Dict[str, List[sqlite3.Row]] = {}
+        for row in rows:
+            if row["from_addr"] in self._credentials:
+                batches.setdefault(row["from_addr"], []).append(row)
+
+        sent_total = 0
+        for from_addr, batch in batches.items():
+            sent_total += self._deliver_batch(from_addr, batch)
+        self._update_gauges()
+        return sent_total
+
+    def _deliver_batch(self, from_addr: str, batch: List[sqlite3.Row]) -> int:
+        user_id, pwd = self._credentials[from_addr]
+        sent_ids = []
+        with metrics.timer("mail.batch"):
+            try:
+                server = self.connect(user_id, pwd, self.timeout)
+            except Exception as e:
+                logger.warning(f"连接邮件服务器失败，稍后重试: {e}")
+                self.outbox.mark_retry(batch, str(e))
+                return 0
+            try:
+                for i, row in enumerate(batch):
+                    msg = build_message(
+                        row["subject"], row["message"], row["from_addr"], row["to_addr"]
+                    )
+                    try:
+                        server.send_message(msg)
+                        sent_ids.append(row["id"])
+                    except Exception as e:
+                        logger.warning(f"邮件发送失败，稍后重试: {e}")
+                        self.outbox.mark_retry([row], str(e))
+                        # 连接已断开时剩余邮件一并推迟
+                        if not _is_connected(server):
+                            self.outbox.mark_retry(batch[i + 1 :], str(e))
+                            break
+            finally:
+                try:
+                    server.quit()
+                except Exception:
+                    pass
+                self.outbox.mark_sent(sent_ids)
+        if sent_ids:
+            metrics.inc("mail.sent", len(sent_ids))
+            logger.info(f"已发送 {len(sent_ids)} 封邮件")
+        return len(sent_ids)
+
+    def _update_gauges(self):
+        stats = self.outbox.stats()
+        metrics.set_gauge("mail.queue_depth", stats[STATUS_PENDING])
+        metrics.set_gauge("mail.failed_total", stats[STATUS_FAILED])
+
+
+def _is_connected(server) -> bool:
+    try:
+        return server.noop()[0] == 250
+    except Exception:
+        return False
@@ -0,0 +1,492 @@
+import os
+import sys
+import glob
+import html
+import json
+import shutil
+import sqlite3
+import hashlib
+import logging
+import argparse
+from datetime import date, datetime
+from string import Template
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, TextIO
+
+from custom_utils import db, metrics
+from Model import JigUseStatus
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每次从游标读取的行数，输出按批写入，不在内存中保留整张报表
+FETCH_SIZE = 1000
+
+
+class ReportError(Exception):
+    """报表不存在、参数错误或生成失败"""
+
+
+class Report(NamedTuple):
+    name: str
+    title: str
+    # 使用命名参数（:today、:days 等）的查询
+    sql: str
+    # 表头，与查询的列一一对应
+    headers: Sequence[str]
+    # 参数默认值，调用时传入的参数覆盖默认值
+    defaults: Dict[str, object] = {}
+
+
+REPORTS: Dict[str, Report] = {}
+
+
+def register(report: Report) -> Report:
+    """登记报表，同名报表会被替换"""
+    REPORTS[report.name] = report
+    return report
+
+
+_DUE = "date(Checkdate, '+' || CheckCycle || ' days')"
+
+register(
+    Report(
+        "expiring",
+        "校验到期治具",
+        f"""SELECT no, name, model, type, UseStatus, Checkdate, CheckCycle,
+            {_DUE} AS due,
+            CAST(julianday({_DUE}) - julianday(:today) AS INTEGER) AS days_left,
+            Location
+        FROM jig
+        WHERE UseStatus != :scrap AND {_DUE} <= date(:today, '+' || :days || ' days')
+        ORDER BY due, no""",
+        (
+            "治具编号",
+            "治具名称",
+            "适用机种",
+            "治具类型",
+            "使用状态",
+            "校验日期",
+            "校验周期（天）",
+            "到期日期",
+            "剩余天数",
+            "存放位置",
+        ),
+        {"days": 14, "scrap": JigUseStatus.SCRAP.value},
+    )
+)
+
+register(
+    Report(
+        "scrapped",
+        "待报废治具",
+        """SELECT no, name, model, type, UseStatus, Usedcount, Maxcount,
+            ROUND(100.0 * Usedcount / NULLIF(Maxcount, 0), 1) AS wear,
+            Makedate, Location, Remark
+        FROM jig
+        WHERE UseStatus = :scrap OR Usedcount >= Maxcount
+        ORDER BY type, no""",
+        (
+            "治具编号",
+            "治具名称",
+            "适用机种",
+            "治具类型",
+            "使用状态",
+            "已使用次数",
+            "最大使用次数",
+            "磨损 %",
+            "制作日期",
+            "存放位置",
+            "备注",
+        ),
+        {"scrap": JigUseStatus.SCRAP.value},
+    )
+)
+
+register(
+    Report(
+        "usage_by_type",
+        "按类型统计使用情况",
+        """SELECT type, COUNT(*),
+            SUM(UseStatus = :using), SUM(UseStatus = :scrap),
+            SUM(Usedcount),
+            ROUND(AVG(100.0 * Usedcount / NULLIF(Maxcount, 0)), 1)
+        FROM jig
+        GROUP BY type
+        ORDER BY type""",
+        ("治具类型", "数量", "使用中", "待报废", "累计使用次数", "平均磨损 %"),
+        {"using": JigUseStatus.USING.value, "scrap": JigUseStatus.SCRAP.value},
+    )
+)
+
+
+# ---------- 模板 ----------
+# 报表页面模板，$rows 处逐行写入表格内容，$count 在所有行写完后才能确定
+PAGE_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+body { font-family: "Microsoft YaHei", sans-serif; font-size: 12px; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #999; padding: 2px 6px; }
+th { background: #eee; }
+.meta { color: #666; }
+</style>
+</head>
+<body>
+<h2>$title</h2>
+<p class="meta">生成时间：$generated　$params</p>
+<table>
+<thead><tr>$headers</tr></thead>
+<tbody>
+$rows
+</tbody>
+</table>
+<p class="meta">共 $count 条</p>
+</body>
+</html>
+""")
+
+# 邮件摘要中每个报表的片段
+DIGEST_TEMPLATE = Template("""<h3>$title（共 $count 条）</h3>
+<table border="1" cellspacing="0" cellpadding="3">
+<tr>$headers</tr>
+$rows
+</table>
+$more""")
+
+
+def load_template(path: Optional[str]) -> Template:
+    """读取自定义页面模板，模板中需要有 $rows；未指定或不存在时使用内置模板"""
+    if not path or not os.path.exists(path):
+        return PAGE_TEMPLATE
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if "$rows" not in text:
+        raise ReportError(f"报表模板中缺少 $rows: {path}")
+    return Template(text)
+
+
+def _cell(value) -> str:
+    return "<td>" + ("" if value is None else html.escape(str(value))) + "</td>"
+
+
+def _headers(report: Report) -> str:
+    return "".join(f"<th>{html.escape(h)}</th>" for h in report.headers)
+
+
+def _params_text(params: Dict[str, object]) -> str:
+    return html.escape(", ".join(f"{k}={v}" for k, v in params.items()))
+
+
+def resolve_params(report: Report, params: Optional[Dict] = None) -> Dict:
+    """默认值 + 传入参数，today 默认为当天"""
+    resolved = {"today": date.today().isoformat(), **report.defaults}
+    resolved.update(params or {})
+    return resolved
+
+
+def get_report(name: str) -> Report:
+    report = REPORTS.get(name)
+    if report is None:
+        raise ReportError(f"没有名为 {name} 的报表")
+    return report
+
+
+def iter_rows(
+    conn: sqlite3.Connection, report: Report, params: Dict
+) -> Iterator[tuple]:
+    """按批从游标读取报表行"""
+    try:
+        cursor = conn.execute(report.sql, params)
+    except sqlite3.Error as e:
+        raise ReportError(f"报表 {report.name} 查询失败: {e}") from e
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+def render_html(
+    conn: sqlite3.Connection,
+    report: Report,
+    out: TextIO,
+    params: Optional[Dict] = None,
+    template: Template = PAGE_TEMPLATE,
+) -> int:
+    """
+    把报表写入 out，边查询边输出，返回行数
+
+    :param conn: 数据库连接
+    :param report: 报表定义
+    :param out: 文本输出（文件等）
+    :param params: 查询参数
+    :param template: 页面模板，以 $rows 分为表头部分和结尾部分
+    """
+    params = resolve_params(report, params)
+    values = {
+        "title": html.escape(report.title),
+        "generated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "params": _params_text(params),
+        "headers": _headers(report),
+    }
+    head, tail = template.template.split("$rows", 1)
+    out.write(Template(head).safe_substitute(values))
+    count = 0
+    buffer: List[str] = []
+    for row in iter_rows(conn, report, params):
+        buffer.append("<tr>" + "".join(_cell(v) for v in row) + "</tr>\n")
+        count += 1
+        if len(buffer) >= FETCH_SIZE:
+            out.write("".join(buffer))
+            buffer.clear()
+    out.write("".join(buffer))
+    out.write(Template(tail).safe_substitute(values, count=count))
+    return count
+
+
+def html_to_pdf(html_path: str, pdf_path: str):
+    """
+    用 Qt 的 QTextDocument 把 HTML 报表转换为 PDF
+
+    QTextDocument 需要整份 HTML 在内存中，大报表建议只生成 HTML。
+    """
+    from PySide6.QtGui import QGuiApplication, QPageSize, QPdfWriter, QTextDocument
+
+    # 命令行中使用时没有 QApplication，排版需要字体数据库
+    app = QGuiApplication.instance() or QGuiApplication([])  # noqa: F841
+    with open(html_path, encoding="utf-8") as f:
+        document = QTextDocument()
+        document.setHtml(f.read())
+    writer = QPdfWriter(pdf_path)
+    writer.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+    writer.setResolution(96)
+    document.setPageSize(writer.pageLayout().paintRectPixels(96).size().toSizeF())
+    document.print_(writer)
+
+
+# ---------- 缓存 ----------
+def data_version(conn: sqlite3.Connection) -> Optional[str]:
+    """
+    数据版本：修改记录表的最大 id 和表结构版本
+
+    jig 表的每次增删改都会新增或合并一条 jig_history 记录，id 都会增大（见 history.py），
+    因此 id 不变即数据未变。
+    没有修改记录表时返回 None，不使用缓存。
+    """
+    try:
+        row = conn.execute(
+            "SELECT (SELECT IFNULL(MAX(id), 0) FROM jig_history), "
+            "(SELECT schema_version FROM pragma_schema_version)"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return f"{row[0]}.{row[1]}"
+
+
+class ReportCache:
+    """
+    生成过的报表文件，按报表名、参数、格式和数据版本命名
+
+    :param directory: 缓存目录
+    :param keep: 每个报表最多保留的文件数
+    """
+
+    def __init__(self, directory: str, keep: int = 20):
+        self.directory = directory
+        self.keep = keep
+
+    def path(self, report: Report, params: Dict, version: str, fmt: str) -> str:
+        key = json.dumps([report.sql, params, version], sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{report.name}-{digest}.{fmt}")
+
+    def prune(self, report: Report):
+        files = sorted(
+            glob.glob(os.path.join(self.directory, f"{report.name}-*")),
+            key=os.path.getmtime,
+        )
+        for path in files[: -self.keep]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def default_cache() -> ReportCache:
+    return ReportCache(os.path.join(db.root_path, "datas", "report_cache"))
+
+
+def generate(
+    name: str,
+    params: Optional[Dict] = None,
+    fmt: str = "html",
+    db_path: str = db.jig_db_path,
+    cache: Optional[ReportCache] = None,
+    template_path: Optional[str] = None,
+) -> str:
+    """
+    生成报表文件并返回路径；数据和参数都没有变化时直接返回缓存的文件
+
+    :param name: 报表名
+    :param params: 查询参数
+    :param fmt: html 或 pdf
+    :param db_path: 数据库路径
+    :param cache: 报表缓存，默认为 datas/report_cache
+    :param template_path: 自定义页面模板
+    """
+    if fmt not in ("html", "pdf"):
+        raise ReportError(f"不支持的报表格式: {fmt}")
+    report = get_report(name)
+    params = resolve_params(report, params)
+    template = load_template(template_path)
+    cache = cache or default_cache()
+    os.makedirs(cache.directory, exist_ok=True)
+
+    conn = db.connect(db_path)
+    try:
+        # 版本号和查询在同一个读事务中，缓存内容与版本号一致
+        conn.execute("BEGIN")
+        version = data_version(conn)
+        if version is not None:
+            version += (
+                "." + hashlib.sha256(template.template.encode("utf-8")).hexdigest()[:8]
+            )
+            path = cache.path(report, params, version, fmt)
+            if os.path.exists(path):
+                metrics.inc("report.cache_hit")
+                return path
+        else:
+            path = os.path.join(cache.directory, f"{report.name}-nocache.{fmt}")
+        metrics.inc("report.cache_miss")
+
+        html_path = path if fmt == "html" else path[: -len(fmt)] + "html"
+        tmp_path = html_path + ".partial"
+        with metrics.timer(f"report.{name}"):
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                count = render_html(conn, report, out, params, template)
+            os.replace(tmp_path, html_path)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if fmt == "pdf":
+        tmp_pdf = path + ".partial"
+        html_to_pdf(html_path, tmp_pdf)
+        os.replace(tmp_pdf, path)
+    cache.prune(report)
+    logger.info(f"已生成报表 {report.title}（{count} 行）: {path}")
+    return path
+
+
+def export(name: str, dest: str, params: Optional[Dict] = None, **kwargs) -> str:
+    """生成报表（按 dest 的扩展名选择格式）并复制到 dest"""
+    fmt = os.path.splitext(dest)[1].lower().lstrip(".") or "html"
+    shutil.copyfile(generate(name, params, fmt, **kwargs), dest)
+    return dest
+
+
+# ---------- 邮件摘要 ----------
+def digest_html(
+    conn: sqlite3.Connection,
+    names: Sequence[str],
+    params: Optional[Dict] = None,
+    max_rows: int = 50,
+) -> str:
+    """
+    几个报表的摘要（每个报表只列出前 max_rows 行），用作邮件正文
+
+    :param names: 报表名
+    :param params: 各报表共用的查询参数
+    :param max_rows: 每个报表列出的最多行数
+    """
+    parts = [f"<h2>治具报表摘要 {date.today().isoformat()}</h2>"]
+    for name in names:
+        report = get_report(name)
+        resolved = resolve_params(report, params)
+        rows, count = [], 0
+        for row in iter_rows(conn, report, resolved):
+            if count < max_rows:
+                rows.append("<tr>" + "".join(_cell(v) for v in row) + "</tr>")
+            count += 1
+        if count == 0:
+            continue
+        more = f"<p>另有 {count - max_rows} 条未列出</p>" if count > max_rows else ""
+        parts.append(
+            DIGEST_TEMPLATE.substitute(
+                title=html.escape(report.title),
+                count=count,
+                headers=_headers(report),
+                rows="\n".join(rows),
+                more=more,
+            )
+        )
+    if len(parts) == 1:
+        parts.append("<p>没有需要处理的治具。</p>")
+    return "\n".join(parts)
+
+
+def send_digest(
+    mail_worker,
+    from_addr: str,
+    to_addr: str,
+    user_id: str,
+    names: Sequence[str],
+    params: Optional[Dict] = None,
+    max_rows: int = 50,
+    db_path: str = db.jig_db_path,
+) -> bool:
+    """生成摘要并交给发件箱（OutboxWorker）在后台发送"""
+    conn = db.connect(db_path)
+    try:
+        message = digest_html(conn, names, params, max_rows)
+    finally:
+        conn.close()
+    return mail_worker.send(
+        subject=f"治具报表摘要 {date.today().isoformat()}",
+        message=message,
+        from_addr=from_addr,
+        to_addr=to_addr,
+        user_id=user_id,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_utils.reports", description="治具报表"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出报表")
+    p_render = sub.add_parser("render", help="生成报表")
+    p_render.add_argument("name", choices=list(REPORTS))
+    p_render.add_argument("dest", help="目标文件，.html 或 .pdf")
+    p_render.add_argument("--days", type=int, help="校验到期报表：未来多少天内到期")
+    p_render.add_argument("--template", help="自定义页面模板")
+    p_render.add_argument("--db", default=db.jig_db_path, help="数据库路径")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "list":
+        for report in REPORTS.values():
+            print(f"{report.name}\t{report.title}")
+        return 0
+    params = {"days": args.days} if args.days is not None else None
+    try:
+        export(
+            args.name,
+            args.dest,
+            params,
+            db_path=args.db,
+            template_path=args.template,
+        )
+    except ReportError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(args.dest)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from custom_utils import db, metrics
+from custom_utils.hydrate import Hydrator
+from Model import JigDynamic, JigUseStatus
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 扫码模式
+SCAN_AUTO = "auto"  # 未使用则取用，使用中则归还
+SCAN_CHECKOUT = "checkout"
+SCAN_RETURN = "return"
+
+
+class JigRepositoryError(Exception):
+    """取用/归还失败，str(e) 为可直接显示给用户的提示"""
+
+
+class JigNotFoundError(JigRepositoryError):
+    pass
+
+
+class JigStatusError(JigRepositoryError):
+    pass
+
+
+class JigLimitError(JigRepositoryError):
+    """使用次数已达上限，确认后以 force=True 重试"""
+
+
+class JigRecord(NamedTuple):
+    id: int
+    no: str
+    name: str
+    model: str
+    type: str
+    status: str
+    used: int
+    max: int
+    check_used: int
+    check_max: int
+
+    def limit_warnings(self) -> List[str]:
+        warnings = []
+        if self.used >= self.max:
+            warnings.append("使用次数")
+        if self.check_used >= self.check_max:
+            warnings.append("单次校验使用次数")
+        return warnings
+
+
+_SELECT = """SELECT id, no, name, model, type, UseStatus, Usedcount, Maxcount,
+    CheckUsedcount, CheckMaxcount FROM jig"""
+
+STATUS_MESSAGES = {
+    JigUseStatus.USING.value: "治具在使用中",
+    JigUseStatus.UNUSE.value: "治具未在使用",
+    JigUseStatus.ERROR.value: "治具异常",
+    JigUseStatus.SCRAP.value: "治具待报废",
+}
+
+
+def ensure_no_index(conn: sqlite3.Connection) -> bool:
+    """
+    为治具编号建立唯一索引；已有重复编号时退而建立普通索引
+
+    :return: 是否为唯一索引
+    """
+    indexes = {
+        row[1]: row[2] for row in conn.execute("PRAGMA index_list(jig)").fetchall()
+    }
+    if indexes.get("idx_jig_no_unique"):
+        return True
+    duplicates = conn.execute(
+        "SELECT no FROM jig GROUP BY no HAVING COUNT(*) > 1 LIMIT 10"
+    ).fetchall()
+    if duplicates:
+        if "idx_jig_no" not in indexes:
+            conn.execute("CREATE INDEX idx_jig_no ON jig(no)")
+            conn.commit()
+        logger.warning(
+            f"治具编号存在重复，无法建立唯一索引: {[row[0] for row in duplicates]}"
+        )
+        return False
+    conn.execute("CREATE UNIQUE INDEX idx_jig_no_unique ON jig(no)")
+    conn.execute("DROP INDEX IF EXISTS idx_jig_no")
+    conn.commit()
+    logger.info("已建立治具编号唯一索引")
+    return True
+
+
+# 行版本列：每次修改加一，用于乐观并发控制
+ROW_VERSION = "row_version"
+
+_ROW_VERSION_TRIGGER = f"""CREATE TRIGGER jig_row_version AFTER UPDATE ON jig
+WHEN NEW.{ROW_VERSION} IS OLD.{ROW_VERSION}
+BEGIN
+    UPDATE jig SET {ROW_VERSION} = OLD.{ROW_VERSION} + 1 WHERE id = NEW.id;
+END"""
+
+
+def ensure_row_version(conn: sqlite3.Connection) -> bool:
+    """
+    添加行版本列和维护它的触发器
+
+    任何连接（扫码、使用次数上报、同步等）修改治具后 row_version 都会加一；
+    按版本更新的语句自己设置新版本，触发器不再重复增加。
+
+    :return: 是否新增了列
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jig)")}
+    trigger = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+        ("jig_row_version",),
+    ).fetchone()
+    if ROW_VERSION in columns and trigger and trigger[0] == _ROW_VERSION_TRIGGER:
+        return False
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if ROW_VERSION not in columns:
+            conn.execute(
+                f"ALTER TABLE jig ADD COLUMN {ROW_VERSION} INTEGER NOT NULL DEFAULT 0"
+            )
+        conn.execute("DROP TRIGGER IF EXISTS jig_row_version")
+        conn.execute(_ROW_VERSION_TRIGGER)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    logger.info("已安装治具行版本")
+    return ROW_VERSION not in columns
+
+
+class JigIndex:
+    """
+    治具编号 -> id 的内存哈希表
+
+    其他连接提交修改后（PRAGMA data_version 变化），查找改为按编号索引的单点查询，
+    同时在后台线程用单独的连接重建哈希表，重建完成后替换；扫码路径上不整体重建。
+    命中后还会核对读到的记录编号，因此过期条目不会导致误操作。
+
+    :param conn: 查找使用的连接
+    :param db_path: 后台重建时打开的数据库，默认取 conn 的主数据库文件（内存库不重建）
+    """
+
+    def __init__(self, conn: sqlite3.Connection, db_path: Optional[str] = None):
+        self.conn = conn
+        if db_path is None:
+            db_path = next(
+                (
+                    row[2]
+                    for row in conn.execute("PRAGMA database_list")
+                    if row[1] == "main"
+                ),
+                "",
+            )
+        self.db_path = db_path
+        self._ids: Dict[str, int] = {}
+        self._data_version = None
+        self._lock = threading.Lock()
+        self._rebuilding: Optional[threading.Thread] = None
+
+    def _data_version_now(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def reload(self):
+        """在当前线程整体重建（启动时）"""
+        with metrics.timer("scan.index.reload"):
+            version = self._data_version_now()
+            ids = dict(self.conn.execute("SELECT no, id FROM jig").fetchall())
+        with self._lock:
+            self._ids = ids
+            self._data_version = version
+
+    def _rebuild(self, version: int):
+        try:
+            conn = db.connect(self.db_path)
+            try:
+                with metrics.timer("scan.index.rebuild"):
+                    ids = dict(conn.execute("SELECT no, id FROM jig").fetchall())
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"重建治具编号索引失败: {e}")
+            return
+        # version 是开始重建前读到的版本，之后的修改会让版本再次变化，继续走单点查询
+        with self._lock:
+            self._ids = ids
+            self._data_version = version
+
+    def _rebuild_in_background(self, version: int):
+        if not self.db_path:
+            return
+        with self._lock:
+            if self._rebuilding is not None and self._rebuilding.is_alive():
+                return
+            self._rebuilding = threading.Thread(
+                target=self._rebuild, args=(version,), name="JigIndex", daemon=True
+            )
+            self._rebuilding.start()
+
+    def lookup(self, no: str) -> Optional[int]:
+        version = self._data_version_now()
+        with self._lock:
+            if version == self._data_version:
+                return self._ids.get(no)
+        metrics.inc("scan.index.stale")
+        row = self.conn.execute("SELECT id FROM jig WHERE no = ?", (no,)).fetchone()
+        self._rebuild_in_background(version)
+        return row[0] if row else None
+
+    def discard(self, no: str):
+        """去掉过期的条目"""
+        with self._lock:
+            self._ids.pop(no, None)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class JigRepository:
+    """
+    治具取用/归还（sqlite3，不经过表格模型）
+
+    每次操作在一个 BEGIN IMMEDIATE 事务中先读后写，更新语句带上原状态作为条件，
+    多个工位同时操作同一治具时只有一个会成功。
+
+    :param db_path: 数据库路径
+    :param install_schema: 安装编号索引和行版本（只读角色不修改在线库的结构）
+    """
+
+    def __init__(self, db_path: str = db.jig_db_path, install_schema: bool = True):
+        self.db_path = db_path
+        self.conn = db.connect(db_path)
+        self.conn.isolation_level = None  # 手动控制事务
+        self.unique_no = None
+        if install_schema:
+            self.unique_no = ensure_no_index(self.conn)
+            ensure_row_version(self.conn)
+        self.index = JigIndex(self.conn)
+        self.index.reload()
+
+    def close(self):
+        db.close(self.conn)
+
+    # ---------- 查询 ----------
+    def get(self, jig_id: int) -> Optional[JigRecord]:
+        row = self.conn.execute(f"{_SELECT} WHERE id = ?", (jig_id,)).fetchone()
+        return JigRecord(*row) if row else None
+
+    def find(self, no: str) -> Optional[JigRecord]:
+        """按治具编号查找，先查内存索引"""
+        no = no.strip()
+        jig_id = self.index.lookup(no)
+        if jig_id is not None:
+            record = self.get(jig_id)
+            if record and record.no == no:
+                return record
+            # 内存索引已过期，按编号查询
+            self.index.discard(no)
+        row = self.conn.execute(f"{_SELECT} WHERE no = ?", (no,)).fetchone()
+        return JigRecord(*row) if row else None
+
+    def get_model(self, jig_id: int) -> Optional[BaseModel]:
+        """整条治具的模型对象，按数据库中的值直接构造（不校验）"""
+        cursor = self.conn.execute("SELECT * FROM jig WHERE id = ?", (jig_id,))
+        row = cursor.fetchone()
+        return Hydrator.for_cursor(JigDynamic, cursor).model(row) if row else None
+
+    def iter_models(
+        self, where: str = "", params: Sequence = ()
+    ) -> Iterator[BaseModel]:
+        """
+        按 id 顺序逐条返回治具的模型对象（不校验）
+
+        :param where: WHERE 子句（不含 WHERE），用 ? 占位
+        :param params: 占位参数
+        """
+        sql = "SELECT * FROM jig" + (f" WHERE {where}" if where else "")
+        cursor = self.conn.execute(sql + " ORDER BY id", params)
+        hydrator = Hydrator.for_cursor(JigDynamic, cursor)
+        for row in cursor:
+            yield hydrator.model(row)
+
+    # ---------- 取用/归还 ----------
+    def _transaction(self, jig_id: int, update):
+        """在写事务中读取最新记录并执行 update(record)，返回更新后的记录"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            record = self.get(jig_id)
+            if record is None:
+                raise JigNotFoundError("治具不存在")
+            update(record)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return self.get(jig_id)
+
+    def checkout(self, jig_id: int, force: bool = False) -> JigRecord:
+        """
+        取用治具
+
+        :param force: 使用次数已达上限时仍然取用
+        :raises JigStatusError: 治具不是未使用状态
+        :raises JigLimitError: 使用次数已达上限且 force 为 False
+        """
+
+        def update(record: JigRecord):
+            if record.status != JigUseStatus.UNUSE.value:
+                raise JigStatusError(
+                    STATUS_MESSAGES.get(record.status, "异常的治具状态")
+                )
+            warnings = record.limit_warnings()
+            if warnings and not force:
+                raise JigLimitError(" ".join(warnings) + " 已达上限!")
+            self.conn.execute(
+                "UPDATE jig SET UseStatus = ? WHERE id = ? AND UseStatus = ?",
+                (JigUseStatus.USING.value, record.id, JigUseStatus.UNUSE.value),
+            )
+
+        with metrics.timer("jig.checkout.sql"):
+            record = self._transaction(jig_id, update)
+        metrics.inc("jig.checkout")
+        logger.info(f"取用编号为{record.no}的{record.name}")
+        return record
+
+    def return_jig(self, jig_id: int) -> JigRecord:
+        """
+        归还治具，使用次数和单次校验使用次数各加一
+
+        :raises JigStatusError: 治具不是使用中状态
+        """
+
+        def update(record: JigRecord):
+            if record.status != JigUseStatus.USING.value:
+                raise JigStatusError(
+                    STATUS_MESSAGES.get(record.status, "异常的治具状态")
+                )
+            self.conn.execute(
+                """UPDATE jig SET UseStatus = ?,
+                Usedcount = Usedcount + 1, CheckUsedcount = CheckUsedcount + 1
+                WHERE id = ? AND UseStatus = ?""",
+                (JigUseStatus.UNUSE.value, record.id, JigUseStatus.USING.value),
+            )
+
+        with metrics.timer("jig.return.sql"):
+            record = self._transaction(jig_id, update)
+        metrics.inc("jig.return")
+        logger.info(f"归还编号为{record.no}的{record.name}")
+        return record
+
+    def scan(
+        self, code: str, mode: str = SCAN_AUTO, force: bool = False
+    ) -> Tuple[str, JigRecord]:
+        """
+        处理一次扫码
+
+        :param code: 扫到的治具编号
+        :param mode: SCAN_AUTO / SCAN_CHECKOUT / SCAN_RETURN
+        :return: (实际执行的操作 SCAN_CHECKOUT 或 SCAN_RETURN, 更新后的记录)
+        """
+        with metrics.timer("scan.total"):
+            record = self.find(code)
+            if record is None:
+                raise JigNotFoundError(f"未找到编号为 {code.strip()} 的治具")
+            if mode == SCAN_AUTO:
+                mode = (
+                    SCAN_RETURN
+                    if record.status == JigUseStatus.USING.value
+                    else SCAN_CHECKOUT
+                )
+            if mode == SCAN_CHECKOUT:
+                return mode, self.checkout(record.id, force=force)
+            return mode, self.return_jig(record.id)
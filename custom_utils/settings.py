@@ -0,0 +1,285 @@
+import os
+import re
+import logging
+import threading
+from configparser import ConfigParser, Error as ConfigError
+from typing import Dict, List, Literal, Optional, Set, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def _yes_no(v):
+    if isinstance(v, str):
+        return v.strip().lower() in ("是", "yes", "true", "1", "y")
+    return v
+
+
+class _Section(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
+
+
+class ColorSettings(_Section):
+    warning: str = Field("orange", alias="警告")
+    serious: str = Field("red", alias="严重警告")
+
+
+class CheckSettings(_Section):
+    warn_days: int = Field(14, ge=0, alias="前多少天警告")
+    expired_serious: bool = Field(True, alias="过期是否加重警告")
+
+    @field_validator("expired_serious", mode="before")
+    @classmethod
+    def _parse_yes_no(cls, v):
+        return _yes_no(v)
+
+
+class CountSettings(_Section):
+    warning: int = Field(50, ge=0, alias="剩余多少次警告")
+    serious: int = Field(10, ge=0, alias="剩余多少次严重警告")
+
+
+class LoginSettings(_Section):
+    session_hours: float = Field(12, ge=0, alias="会话有效小时数")
+    timeout: float = Field(15, gt=0, alias="验证超时秒数")
+
+
+class BackupSettings(_Section):
+    enabled: bool = Field(True, alias="启用")
+    interval_hours: float = Field(4, gt=0, alias="间隔小时数")
+    keep: int = Field(42, ge=1, alias="保留份数")
+    directory: str = Field("backups", alias="目录")
+    pages_per_step: int = Field(256, gt=0, alias="每步页数")
+    step_sleep_ms: int = Field(10, ge=0, alias="步间隔毫秒")
+
+    @field_validator("enabled", mode="before")
+    @classmethod
+    def _parse_yes_no(cls, v):
+        return _yes_no(v)
+
+
+class MaintenanceSettings(_Section):
+    enabled: bool = Field(True, alias="启用")
+    interval_minutes: float = Field(60, gt=0, alias="间隔分钟数")
+    # 数据库放在网络共享目录时 WAL 不可用，默认使用回滚日志；只有本机数据库才开启
+    wal: bool = Field(False, alias="wal模式")
+    wal_limit_mb: float = Field(64, gt=0, alias="wal上限mb")
+    free_percent: float = Field(10, ge=0, le=100, alias="空闲页百分比")
+    vacuum_pages: int = Field(500, gt=0, alias="每次回收页数")
+    analyze_percent: float = Field(20, gt=0, alias="行数变化百分比")
+
+    @field_validator("enabled", "wal", mode="before")
+    @classmethod
+    def _parse_yes_no(cls, v):
+        return _yes_no(v)
+
+
+class SyncSettings(_Section):
+    enabled: bool = Field(False, alias="启用")
+    # 中心数据库路径，通常在网络共享上
+    central: str = Field("", alias="中心数据库")
+    # 留空时使用计算机名
+    station: str = Field("", alias="站点名")
+    interval_seconds: float = Field(60, gt=0, alias="间隔秒数")
+    rule: Literal["字段", "整行"] = Field("字段", alias="冲突规则")
+    batch_size: int = Field(500, gt=0, alias="每批条数")
+
+    @field_validator("enabled", mode="before")
+    @classmethod
+    def _parse_yes_no(cls, v):
+        return _yes_no(v)
+
+
+class SnapshotSettings(_Section):
+    # 访客等只读角色从本地只读快照浏览，不在在线库上加锁
+    enabled: bool = Field(True, alias="启用")
+    refresh_seconds: float = Field(120, gt=0, alias="刷新秒数")
+    # 留空时使用系统临时目录
+    directory: str = Field("", alias="目录")
+    # 由其他程序维护的副本文件，设置后直接以只读方式打开，不再生成快照
+    replica: str = Field("", alias="副本")
+    pages_per_step: int = Field(256, gt=0, alias="每步页数")
+    step_sleep_ms: int = Field(5, ge=0, alias="步间隔毫秒")
+
+    @field_validator("enabled", mode="before")
+    @classmethod
+    def _parse_yes_no(cls, v):
+        return _yes_no(v)
+
+
+class AnalyticsSettings(_Section):
+    # 定时导出完整库存的列式快照，供质量部门分析
+    enabled: bool = Field(False, alias="启用")
+    interval_hours: float = Field(24, gt=0, alias="间隔小时数")
+    directory: str = Field("analytics", alias="目录")
+    format: Literal["parquet", "arrow"] = Field("parquet", alias="格式")
+    keep: int = Field(30, ge=1, alias="保留份数")
+    batch_size: int = Field(65536, gt=0, alias="每批行数")
+
+    @field_validator("enabled", mode="before")
+    @classmethod
+    def _parse_yes_no(cls, v):
+        return _yes_no(v)
+
+
+class ReportSettings(_Section):
+    # 自定义页面模板（string.Template，需包含 $rows），留空使用内置模板
+    template: str = Field("", alias="模板")
+    # 邮件摘要包含的报表，逗号分隔
+    digest_reports: str = Field("expiring,scrapped", alias="摘要报表")
+    digest_rows: int = Field(50, gt=0, alias="摘要行数")
+
+    @property
+    def digest_names(self) -> List[str]:
+        return [n.strip() for n in self.digest_reports.split(",") if n.strip()]
+
+
+class CounterSettings(_Section):
+    # 测试工位上报使用次数：汇总后定时批量写入
+    enabled: bool = Field(False, alias="启用")
+    host: str = Field("127.0.0.1", alias="地址")
+    port: int = Field(47017, gt=0, lt=65536, alias="端口")
+    flush_seconds: float = Field(5, gt=0, alias="写入间隔秒数")
+    # 本机日志目录，相对路径以程序目录为基准
+    journal_dir: str = Field("datas/counters", alias="日志目录")
+    max_increment: int = Field(1000, gt=0, alias="单次上限")
+
+    @field_validator("enabled", mode="before")
+    @classmethod
+    def _parse_yes_no(cls, v):
+        return _yes_no(v)
+
+
+class WatchSettings(_Section):
+    # 监视测试机日志目录，按行解析治具编号，计入使用次数或取用/归还
+    enabled: bool = Field(False, alias="启用")
+    directory: str = Field("", alias="目录")
+    pattern: str = Field("*.log", alias="文件名")
+    # 命名分组：no 为治具编号（必需）；event 为取用/归还（可选，缺省为一次使用）；
+    # count 为次数（可选，缺省为 1）
+    regex: str = Field(
+        r"(?:(?P<event>取用|归还|checkout|return)\s+)?(?:治具|fixture)\s*[:=]\s*"
+        r"(?P<no>[^\s,;]+)(?:\s+(?:次数|cycles)\s*[:=]\s*(?P<count>\d+))?",
+        alias="匹配",
+    )
+    encoding: str = Field("utf-8", alias="编码")
+    poll_seconds: float = Field(2, gt=0, alias="轮询秒数")
+    flush_seconds: float = Field(2, ge=0, alias="写入间隔秒数")
+    # 首次启用时目录中已有的日志是否从头读取
+    read_existing: bool = Field(False, alias="读取已有文件")
+
+    @field_validator("enabled", "read_existing", mode="before")
+    @classmethod
+    def _parse_yes_no(cls, v):
+        return _yes_no(v)
+
+    @field_validator("regex")
+    @classmethod
+    def _check_regex(cls, v):
+        if "(?P<no>" not in v:
+            raise ValueError("匹配表达式中需要命名分组 (?P<no>...)")
+        try:
+            re.compile(v)
+        except re.error as e:
+            raise ValueError(f"匹配表达式无效: {e}") from e
+        return v
+
+
+class AppSettings(_Section):
+    """
+    config.ini 的类型化视图，节名和键名与配置文件中的中文一致
+    """
+
+    colors: ColorSettings = Field(default_factory=ColorSettings, alias="颜色")
+    check: CheckSettings = Field(default_factory=CheckSettings, alias="校验")
+    usage: CountSettings = Field(default_factory=CountSettings, alias="使用次数")
+    check_usage: CountSettings = Field(
+        default_factory=CountSettings, alias="单次校验可使用次数"
+    )
+    login: LoginSettings = Field(default_factory=LoginSettings, alias="登录")
+    backup: BackupSettings = Field(default_factory=BackupSettings, alias="备份")
+    maintenance: MaintenanceSettings = Field(
+        default_factory=MaintenanceSettings, alias="维护"
+    )
+    # 多站点联合查询：站点名 -> 数据库路径（相对路径以程序目录为基准）
+    sites: Dict[str, str] = Field(default_factory=dict, alias="站点")
+    sync: SyncSettings = Field(default_factory=SyncSettings, alias="同步")
+    snapshot: SnapshotSettings = Field(
+        default_factory=SnapshotSettings, alias="只读快照"
+    )
+    analytics: AnalyticsSettings = Field(
+        default_factory=AnalyticsSettings, alias="分析快照"
+    )
+    reports: ReportSettings = Field(default_factory=ReportSettings, alias="报表")
+    counters: CounterSettings = Field(default_factory=CounterSettings, alias="使用计数")
+    watch: WatchSettings = Field(default_factory=WatchSettings, alias="日志监视")
+
+
+def parse_settings(config: ConfigParser) -> AppSettings:
+    """把 ConfigParser 转换为 AppSettings，校验失败时抛出 ValidationError"""
+    data = {section: dict(config.items(section)) for section in config.sections()}
+    return AppSettings.model_validate(data)
+
+
+# 缓存：路径 -> ((mtime_ns, size), AppSettings)
+_cache: Dict[str, Tuple[Tuple[int, int], AppSettings]] = {}
+_cache_lock = threading.Lock()
+
+
+def _file_stamp(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_settings(path: str) -> AppSettings:
+    """
+    读取并校验配置文件，文件未变化时直接返回缓存
+
+    文件不存在时返回默认值；无法解析或校验失败时记录错误并沿用上一次的有效配置。
+    """
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        return AppSettings()
+    stamp = _file_stamp(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    config = ConfigParser()
+    try:
+        config.read(path, encoding="utf-8")
+        settings = parse_settings(config)
+    except (ConfigError, ValidationError) as e:
+        # 格式错误（如重复的节）和校验失败一样处理
+        logger.error(f"配置文件校验失败，沿用之前的配置: {e}")
+        return cached[1] if cached else AppSettings()
+
+    with _cache_lock:
+        _cache[path] = (stamp, settings)
+    logger.debug(f"已加载配置: {path}")
+    return settings
+
+
+def diff_settings(old: Optional[AppSettings], new: AppSettings) -> Set[str]:
+    """
+    比较两份配置，返回发生变化的键，格式为 "节.键"，如 "usage.warning"
+
+    old 为 None 时返回所有键。
+    """
+    changed = set()
+    for section_name in AppSettings.model_fields:
+        new_section = getattr(new, section_name)
+        old_section = getattr(old, section_name) if old is not None else None
+        if not isinstance(new_section, BaseModel):
+            if old_section != new_section:
+                changed.add(section_name)
+            continue
+        for key in type(new_section).model_fields:
+            if old_section is None or getattr(old_section, key) != getattr(
+                new_section, key
+            ):
+                changed.add(f"{section_name}.{key}")
+    return changed
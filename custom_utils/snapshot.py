@@ -0,0 +1,124 @@
+import os
+import glob
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+from custom_utils import db, metrics
+from custom_utils.settings import SnapshotSettings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def readonly_uri(path: str, immutable: bool = True) -> str:
+    """
+    只读 URI：immutable=1 时 SQLite 不加锁、不检查文件变化，只能用于不会再被修改的文件
+
+    用于 QSqlDatabase 时需设置连接选项 QSQLITE_OPEN_URI。
+    """
+    uri = Path(os.path.abspath(path)).as_uri()
+    return uri + ("?immutable=1" if immutable else "?mode=ro")
+
+
+class SnapshotManager:
+    """
+    在线数据库的只读快照
+
+    访客等只读角色从本地快照文件读取，不在在线库上加共享锁。每次刷新用备份 API
+    复制到一个新文件（复制时分步进行，不阻塞写入），已打开的旧快照从不被修改，
+    因此可以用 immutable=1 打开；切换到新快照后再删除旧文件。
+
+    配置了副本（由其他程序维护的复制文件）时不复制，直接以 mode=ro 打开副本。
+
+    :param db_path: 在线数据库路径
+    :param settings: 快照配置
+    """
+
+    def __init__(self, db_path: str, settings: SnapshotSettings):
+        self.db_path = db_path
+        self.settings = settings
+        self.stem = os.path.splitext(os.path.basename(db_path))[0]
+        self.directory = settings.directory or os.path.join(
+            tempfile.gettempdir(), "jig_snapshots"
+        )
+        self.current: Optional[str] = None
+        self._lock = threading.Lock()
+        self._data_version = None
+        # 只用于检测在线库是否有修改，空闲时不持有锁；刷新在后台线程进行
+        self._watch = sqlite3.connect(db_path, check_same_thread=False)
+
+    @property
+    def replica(self) -> Optional[str]:
+        if not self.settings.replica:
+            return None
+        return os.path.join(db.root_path, self.settings.replica)
+
+    def uri(self, path: Optional[str] = None) -> str:
+        path = path or self.current
+        return readonly_uri(path, immutable=path != self.replica)
+
+    def _version(self) -> int:
+        return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self) -> bool:
+        """在线库自上次快照以来是否被修改（包括本程序其他连接的写入）"""
+        with self._lock:
+            return self._version() != self._data_version
+
+    def refresh(self) -> str:
+        """
+        生成新快照并返回其路径；使用副本时直接返回副本路径
+
+        可以在后台线程中调用。
+        """
+        if self.replica:
+            self.current = self.replica
+            return self.current
+        with self._lock, metrics.timer("snapshot.refresh"):
+            os.makedirs(self.directory, exist_ok=True)
+            # 先取版本号：复制期间的修改会使下次检查再刷新一次，不会遗漏
+            data_version = self._version()
+            path = os.path.join(
+                self.directory, f"{self.stem}-{os.getpid()}-{time.time_ns()}.db"
+            )
+            tmp_path = path + ".partial"
+            src = db.connect(self.db_path)
+            dst = sqlite3.connect(tmp_path)
+            try:
+                src.backup(
+                    dst,
+                    pages=self.settings.pages_per_step,
+                    sleep=self.settings.step_sleep_ms / 1000,
+                )
+                # 快照只读，不需要回滚日志
+                dst.execute("PRAGMA journal_mode = OFF")
+            finally:
+                dst.close()
+                src.close()
+            os.replace(tmp_path, path)
+            self._data_version = data_version
+            self.current = path
+        logger.debug(f"已生成只读快照: {path}")
+        return path
+
+    def prune(self):
+        """删除本进程之前的快照（仍被打开的文件在 Windows 上删除失败，下次再删）"""
+        pattern = os.path.join(self.directory, f"{self.stem}-{os.getpid()}-*.db*")
+        for path in glob.glob(pattern):
+            if path == self.current:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            self._watch.close()
+        self.current = None
+        self.prune()
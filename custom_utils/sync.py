@@ -0,0 +1,662 @@
+import os
+import sys
+import gzip
+import json
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from custom_utils import db, metrics
+from custom_utils.columns import read_table_columns
+from custom_utils.settings import SyncSettings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 冲突规则
+RULE_FIELD = "字段"  # 每个字段分别以最后修改者为准
+RULE_ROW = "整行"  # 整行以最后修改者为准
+
+# 行删除/恢复以伪字段记录：1 为已删除，0 为存在
+DELETED = "_deleted"
+
+# 不参与同步的列：id 和行版本 row_version 各库不同，行以治具编号 no 标识
+IGNORED_COLUMNS = {"id", "no", "row_version"}
+
+# 当前时间（Unix 秒，毫秒精度）
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO sync_state (key, value) VALUES
+    ('version', 0), ('applying', 0), ('origin', ''), ('pushed', 0), ('pulled', 0);
+CREATE TABLE IF NOT EXISTS sync_fields (
+    no TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value,
+    ts REAL NOT NULL,
+    origin TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (no, field)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sync_fields_version ON sync_fields(version);
+"""
+
+_STATE = "(SELECT value FROM sync_state WHERE key = '{}')"
+_UPSERT = (
+    "ON CONFLICT (no, field) DO UPDATE SET value = excluded.value, "
+    "ts = excluded.ts, origin = excluded.origin, version = excluded.version"
+)
+
+
+class SyncError(Exception):
+    pass
+
+
+class Change(NamedTuple):
+    """一个字段的修改"""
+
+    no: str
+    field: str
+    value: object
+    ts: float
+    origin: str
+
+
+class SyncResult(NamedTuple):
+    pushed: int
+    pulled: int
+    # 本站点实际应用的修改数（未被冲突规则拒绝的）
+    applied: int
+
+
+# ---------- 记录修改 ----------
+def _sync_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [
+        row[1]
+        for row in conn.execute(f"PRAGMA table_info({table})")
+        if row[1] not in IGNORED_COLUMNS
+    ]
+
+
+def _record(r: str, rows: str, where: str = "true") -> str:
+    """把 rows（k, v 两列）记录为 {r}.no 的修改"""
+    return (
+        f"INSERT INTO sync_fields (no, field, value, ts, origin, version)\n"
+        f"    SELECT {r}.no, k, v, {_NOW}, {_STATE.format('origin')}, "
+        f"{_STATE.format('version')}\n"
+        f"    FROM ({rows}) WHERE {where}\n"
+        f"    {_UPSERT};"
+    )
+
+
+def _triggers_sql(table: str, columns: List[str]) -> Dict[str, str]:
+    """
+    生成记录修改的触发器，sync_fields 中每个 (编号, 字段) 只保留最新的一条
+
+    sync_state.applying 为 1 时（正在应用其他站点的修改）不记录，避免修改被来回推送。
+    """
+    bump = "UPDATE sync_state SET value = value + 1 WHERE key = 'version';"
+    not_applying = f"{_STATE.format('applying')} = 0"
+    # 编号变化视为删除旧编号、新增新编号
+    renamed = "OLD.no IS NOT NEW.no"
+    deleted = f"SELECT '{DELETED}' AS k, 1 AS v"
+    inserted = " UNION ALL ".join(
+        [f"SELECT '{DELETED}' AS k, 0 AS v"]
+        + [f"SELECT '{c}', NEW.{c}" for c in columns]
+    )
+    updated = " UNION ALL ".join(
+        [f"SELECT '{DELETED}' AS k, 0 AS v, {renamed} AS c"]
+        + [
+            f"SELECT '{c}', NEW.{c}, OLD.{c} IS NOT NEW.{c} OR {renamed}"
+            for c in columns
+        ]
+    )
+    changed = " OR ".join([renamed] + [f"OLD.{c} IS NOT NEW.{c}" for c in columns])
+    return {
+        f"{table}_sync_insert": (
+            f"CREATE TRIGGER {table}_sync_insert AFTER INSERT ON {table}\n"
+            f"WHEN {not_applying}\n"
+            f"BEGIN\n"
+            f"    {bump}\n"
+            f"    {_record('NEW', inserted)}\n"
+            f"END;"
+        ),
+        f"{table}_sync_update": (
+            f"CREATE TRIGGER {table}_sync_update AFTER UPDATE ON {table}\n"
+            f"WHEN {not_applying} AND ({changed})\n"
+            f"BEGIN\n"
+            f"    {bump}\n"
+            f"    {_record('OLD', deleted, renamed)}\n"
+            f"    {_record('NEW', updated, 'c')}\n"
+            f"END;"
+        ),
+        f"{table}_sync_delete": (
+            f"CREATE TRIGGER {table}_sync_delete AFTER DELETE ON {table}\n"
+            f"WHEN {not_applying}\n"
+            f"BEGIN\n"
+            f"    {bump}\n"
+            f"    {_record('OLD', deleted)}\n"
+            f"END;"
+        ),
+    }
+
+
+def _baseline_sql(table: str, columns: List[str], ts: float) -> str:
+    """尚未记录的行和列（含新增的列）记为基线，时间为 ts，版本为当前版本"""
+    fields = "\n        UNION ALL ".join(
+        [f"SELECT no, '{DELETED}' AS k, 0 AS v FROM {table}"]
+        + [f"SELECT no, '{c}', {c} FROM {table}" for c in columns]
+    )
+    return (
+        f"INSERT OR IGNORE INTO sync_fields (no, field, value, ts, origin, version)\n"
+        f"    SELECT no, k, v, {float(ts)}, {_STATE.format('origin')}, "
+        f"{_STATE.format('version')}\n"
+        f"    FROM ({fields})"
+    )
+
+
+def install_sync(
+    conn: sqlite3.Connection, origin: str, table: str = "jig", baseline_ts: float = -1
+) -> bool:
+    """
+    创建同步表和触发器；表结构变化后重建触发器
+
+    安装时现有数据记为基线，之后在任何站点上的修改都比基线新。
+    站点的基线时间为 -1，中心库为 0：首次同步时两边都有的治具以中心库为准，
+    只在站点上有的治具会被推送到中心库。
+
+    连接需为手动事务模式（isolation_level = None）。
+
+    :param origin: 本库的站点名，记录在本库产生的修改上
+    :return: 是否重建了触发器
+    """
+    duplicates = conn.execute(
+        f"SELECT no FROM {table} GROUP BY no HAVING COUNT(*) > 1 LIMIT 10"
+    ).fetchall()
+    if duplicates:
+        raise SyncError(
+            f"治具编号重复，无法同步: {', '.join(row[0] for row in duplicates)}"
+        )
+    columns = _sync_columns(conn, table)
+    triggers = _triggers_sql(table, columns)
+    existing = dict(
+        conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+            (table,),
+        ).fetchall()
+    )
+    up_to_date = all(
+        existing.get(name) == sql.rstrip(";") for name, sql in triggers.items()
+    )
+    if up_to_date and get_state(conn, "origin") == origin:
+        return False
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for statement in _SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        set_state(conn, "origin", origin)
+        if not up_to_date:
+            for name, sql in triggers.items():
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(sql)
+            conn.execute(
+                "UPDATE sync_state SET value = value + 1 WHERE key = 'version'"
+            )
+            conn.execute(_baseline_sql(table, columns, baseline_ts))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    if not up_to_date:
+        logger.info(f"已安装同步触发器（{origin}）")
+    return not up_to_date
+
+
+def get_state(conn: sqlite3.Connection, key: str):
+    return conn.execute("SELECT " + _STATE.format(key)).fetchone()[0]
+
+
+def set_state(conn: sqlite3.Connection, key: str, value):
+    conn.execute("UPDATE sync_state SET value = ? WHERE key = ?", (value, key))
+
+
+# ---------- 导出与应用 ----------
+def export_changes(
+    conn: sqlite3.Connection,
+    since: int,
+    limit: int,
+    origin: Optional[str] = None,
+    exclude_origin: Optional[str] = None,
+    whole_rows: bool = False,
+) -> Tuple[List[Change], int]:
+    """
+    读取 version > since 的修改，最多约 limit 条；同一次修改（同一 version）不会被拆开
+
+    :param origin: 只导出该来源的修改（推送时为本站点）
+    :param exclude_origin: 不导出该来源的修改（拉取时排除请求方自己的修改）
+    :param whole_rows: 导出有修改的行的所有字段（整行冲突规则需要整行覆盖）
+    :return: (修改列表, 新的游标)
+    """
+    clauses, params = ["version > ?"], [since]
+    if origin is not None:
+        clauses.append("origin = ?")
+        params.append(origin)
+    if exclude_origin is not None:
+        clauses.append("origin <> ?")
+        params.append(exclude_origin)
+    where = " AND ".join(clauses)
+
+    conn.execute("BEGIN")
+    try:
+        cutoff = conn.execute(
+            f"SELECT version FROM sync_fields WHERE {where} "
+            f"ORDER BY version LIMIT 1 OFFSET ?",
+            (*params, max(limit - 1, 0)),
+        ).fetchone()
+        if cutoff is None:
+            # 不足一批：导出全部，游标移到当前版本
+            cursor = get_state(conn, "version")
+            rows = conn.execute(
+                f"SELECT no, field, value, ts, origin FROM sync_fields WHERE {where} "
+                f"ORDER BY version",
+                params,
+            ).fetchall()
+        else:
+            cursor = cutoff[0]
+            rows = conn.execute(
+                f"SELECT no, field, value, ts, origin FROM sync_fields "
+                f"WHERE {where} AND version <= ? ORDER BY version",
+                (*params, cursor),
+            ).fetchall()
+        if whole_rows:
+            rows = _whole_rows(conn, list(dict.fromkeys(row[0] for row in rows)))
+    finally:
+        conn.execute("COMMIT")
+    return [Change(*row) for row in rows], cursor
+
+
+def _whole_rows(conn: sqlite3.Connection, nos: List[str]) -> List[tuple]:
+    rows = []
+    for i in range(0, len(nos), 500):
+        chunk = nos[i : i + 500]
+        rows += conn.execute(
+            f"SELECT no, field, value, ts, origin FROM sync_fields "
+            f"WHERE no IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall()
+    order = {no: i for i, no in enumerate(nos)}
+    return sorted(rows, key=lambda row: order[row[0]])
+
+
+def _wins(change: Change, local: Optional[Tuple[float, str]]) -> bool:
+    """时间较新者胜；时间相同按来源名比较，保证各站点结果一致"""
+    return local is None or (change.ts, change.origin) > local
+
+
+def apply_changes(
+    conn: sqlite3.Connection,
+    changes: List[Change],
+    rule: str = RULE_FIELD,
+    table: str = "jig",
+) -> int:
+    """
+    在一个事务中应用其他站点的修改，按冲突规则丢弃较旧的修改
+
+    应用期间 sync_state.applying 为 1，本库的同步触发器不会把这些修改再记一遍；
+    被采纳的修改以原来的时间和来源写入 sync_fields，并分配本库的新版本号。
+
+    :return: 采纳的修改数
+    """
+    columns = set(_sync_columns(conn, table))
+    by_no: Dict[str, List[Change]] = {}
+    for change in changes:
+        by_no.setdefault(change.no, []).append(change)
+
+    applied = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        set_state(conn, "applying", 1)
+        for no, row_changes in by_no.items():
+            local = {
+                field: (ts, origin)
+                for field, ts, origin in conn.execute(
+                    "SELECT field, ts, origin FROM sync_fields WHERE no = ?", (no,)
+                )
+            }
+            if rule == RULE_ROW:
+                newest_local = max(local.values(), default=None)
+                newest = max(row_changes, key=lambda c: (c.ts, c.origin))
+                winners = row_changes if _wins(newest, newest_local) else []
+            else:
+                winners = [c for c in row_changes if _wins(c, local.get(c.field))]
+            if not winners:
+                continue
+
+            conn.execute(
+                "UPDATE sync_state SET value = value + 1 WHERE key = 'version'"
+            )
+            version = get_state(conn, "version")
+            conn.executemany(
+                f"INSERT INTO sync_fields (no, field, value, ts, origin, version) "
+                f"VALUES (?, ?, ?, ?, ?, ?) {_UPSERT}",
+                [(no, c.field, c.value, c.ts, c.origin, version) for c in winners],
+            )
+            _apply_row(conn, table, no, columns)
+            applied += len(winners)
+        set_state(conn, "applying", 0)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return applied
+
+
+def _apply_row(conn: sqlite3.Connection, table: str, no: str, columns: set):
+    """按 sync_fields 中该编号的最新值更新 jig 表"""
+    state = dict(
+        conn.execute("SELECT field, value FROM sync_fields WHERE no = ?", (no,))
+    )
+    exists = conn.execute(f"SELECT 1 FROM {table} WHERE no = ?", (no,)).fetchone()
+    if state.get(DELETED) == 1:
+        if exists:
+            conn.execute(f"DELETE FROM {table} WHERE no = ?", (no,))
+        return
+    values = {k: v for k, v in state.items() if k in columns}
+    if exists:
+        assignments = ", ".join(f"{k} = ?" for k in values)
+        conn.execute(
+            f"UPDATE {table} SET {assignments} WHERE no = ?", (*values.values(), no)
+        )
+    else:
+        names = ", ".join(["no", *values])
+        marks = ", ".join("?" * (len(values) + 1))
+        try:
+            conn.execute(
+                f"INSERT INTO {table} ({names}) VALUES ({marks})",
+                (no, *values.values()),
+            )
+        except sqlite3.IntegrityError as e:
+            # 字段不全（如两边表结构不同），保留在 sync_fields 中，等后续修改补全
+            logger.warning(f"无法新增治具 {no}: {e}")
+
+
+# ---------- 传输 ----------
+def encode_batch(changes: List[Change]) -> bytes:
+    """压缩的 JSON 批次"""
+    return gzip.compress(
+        json.dumps([list(c) for c in changes], ensure_ascii=False).encode("utf-8")
+    )
+
+
+def decode_batch(payload: bytes) -> List[Change]:
+    return [Change(*row) for row in json.loads(gzip.decompress(payload))]
+
+
+class FileTransport:
+    """
+    中心数据库为一个 SQLite 文件（本地磁盘或网络共享）
+
+    每次推送/拉取只短暂打开中心库；中心库不存在时建表。批次以压缩 JSON 传递，
+    换成 HTTP 等其他传输方式时只需实现同样的 push/pull。
+
+    :param central_path: 中心数据库路径
+    :param rule: 冲突规则
+    """
+
+    CENTRAL_ORIGIN = "中心"
+
+    def __init__(self, central_path: str, rule: str = RULE_FIELD):
+        self.central_path = central_path
+        self.rule = rule
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(os.path.abspath(self.central_path))
+        if not os.path.isdir(directory):
+            raise SyncError(f"中心数据库所在的目录不存在: {directory}")
+        conn = db.connect(self.central_path, timeout=30)
+        conn.isolation_level = None
+        try:
+            if not read_table_columns(conn):
+                self._create_schema(conn)
+            install_sync(conn, self.CENTRAL_ORIGIN, baseline_ts=0)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        """新的中心库：与 jigctl migrate 一样按模型建表，编号唯一"""
+        from custom_utils import Model2SQL
+        from custom_utils.repository import ensure_no_index
+        from Model import JigDynamic
+
+        logger.info(f"创建中心数据库: {self.central_path}")
+        Model2SQL.create_table_from_pydantic_model(
+            JigDynamic, db_path=self.central_path, table_name=db.JIG_TABLE
+        )
+        ensure_no_index(conn)
+
+    def push(self, payload: bytes) -> int:
+        conn = self._connect()
+        try:
+            return apply_changes(conn, decode_batch(payload), self.rule)
+        finally:
+            db.close(conn)
+
+    def pull(self, since: int, station: str, limit: int) -> Tuple[bytes, int]:
+        conn = self._connect()
+        try:
+            changes, cursor = export_changes(
+                conn,
+                since,
+                limit,
+                exclude_origin=station,
+                whole_rows=self.rule == RULE_ROW,
+            )
+        finally:
+            db.close(conn)
+        return encode_batch(changes), cursor
+
+
+# ---------- 同步 ----------
+class SyncEngine:
+    """
+    站点与中心数据库之间的双向同步
+
+    站点平时只读写本地 jig.db，修改由触发器记录；sync() 先推送本站点的修改，
+    再拉取其他站点经中心汇总的修改。游标在每批提交后才前进，中断后重试不会重复应用。
+
+    :param local_path: 本地数据库路径
+    :param transport: 中心数据库的传输方式，如 FileTransport
+    :param station: 本站点名
+    """
+
+    def __init__(
+        self,
+        local_path: str,
+        transport: FileTransport,
+        station: str,
+        rule: str = RULE_FIELD,
+        batch_size: int = 500,
+    ):
+        self.local_path = local_path
+        self.transport = transport
+        self.station = station
+        self.rule = rule
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = db.connect(self.local_path)
+        conn.isolation_level = None
+        install_sync(conn, self.station)
+        return conn
+
+    def push(self, conn: sqlite3.Connection) -> int:
+        pushed = 0
+        while True:
+            since = get_state(conn, "pushed")
+            changes, cursor = export_changes(
+                conn,
+                since,
+                self.batch_size,
+                origin=self.station,
+                whole_rows=self.rule == RULE_ROW,
+            )
+            if changes:
+                with metrics.timer("sync.push"):
+                    self.transport.push(encode_batch(changes))
+                pushed += len(changes)
+            if cursor == since:
+                return pushed
+            set_state(conn, "pushed", cursor)
+            if not changes:
+                return pushed
+
+    def pull(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        pulled = applied = 0
+        while True:
+            since = get_state(conn, "pulled")
+            with metrics.timer("sync.pull"):
+                payload, cursor = self.transport.pull(
+                    since, self.station, self.batch_size
+                )
+            changes = decode_batch(payload)
+            if changes:
+                applied += apply_changes(conn, changes, self.rule)
+                pulled += len(changes)
+            if cursor == since:
+                return pulled, applied
+            set_state(conn, "pulled", cursor)
+            if not changes:
+                return pulled, applied
+
+    def sync(self) -> SyncResult:
+        with self._lock:
+            conn = self._connect()
+            try:
+                pushed = self.push(conn)
+                pulled, applied = self.pull(conn)
+            finally:
+                db.close(conn)
+        metrics.inc("sync.pushed", pushed)
+        metrics.inc("sync.applied", applied)
+        if pushed or pulled:
+            logger.info(f"同步完成：推送 {pushed}，拉取 {pulled}，采纳 {applied}")
+        return SyncResult(pushed, pulled, applied)
+
+
+def station_name(settings: SyncSettings) -> str:
+    return settings.station or socket.gethostname()
+
+
+def engine_from_settings(
+    settings: SyncSettings, local_path: str = db.jig_db_path
+) -> SyncEngine:
+    central = os.path.join(db.root_path, settings.central)
+    transport = FileTransport(central, settings.rule)
+    return SyncEngine(
+        local_path,
+        transport,
+        station_name(settings),
+        rule=settings.rule,
+        batch_size=settings.batch_size,
+    )
+
+
+class SyncScheduler:
+    """
+    定时同步线程
+
+    :param settings: 同步配置
+    :param on_applied: 拉取到并采纳了其他站点的修改时调用（在同步线程中），参数为采纳数
+    """
+
+    def __init__(
+        self,
+        settings: SyncSettings,
+        on_applied: Optional[Callable[[int], None]] = None,
+        local_path: str = db.jig_db_path,
+    ):
+        self.settings = settings
+        self.on_applied = on_applied
+        self.local_path = local_path
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def update(self, settings: SyncSettings):
+        self.settings = settings
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="SyncScheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self) -> Optional[SyncResult]:
+        if not (self.settings.enabled and self.settings.central):
+            return None
+        try:
+            result = engine_from_settings(self.settings, self.local_path).sync()
+        except Exception as e:
+            metrics.inc("sync.error")
+            logger.error(f"同步失败: {e}", exc_info=True)
+            return None
+        if result.applied and self.on_applied:
+            self.on_applied(result.applied)
+        return result
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.settings.interval_seconds)
+
+
+def main(argv=None):
+    from custom_utils.settings import load_settings
+
+    settings = load_settings(os.path.join(db.root_path, "config.ini")).sync
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_utils.sync", description="站点与中心数据库同步"
+    )
+    parser.add_argument("--local", default=db.jig_db_path, help="本地数据库")
+    parser.add_argument("--central", default=settings.central, help="中心数据库")
+    parser.add_argument("--station", default=station_name(settings), help="站点名")
+    parser.add_argument("--rule", default=settings.rule, choices=[RULE_FIELD, RULE_ROW])
+    args = parser.parse_args(argv)
+    if not args.central:
+        parser.error("未设置中心数据库")
+
+    logging.basicConfig(level=logging.INFO)
+    engine = SyncEngine(
+        args.local,
+        FileTransport(args.central, args.rule),
+        args.station,
+        rule=args.rule,
+        batch_size=settings.batch_size,
+    )
+    result = engine.sync()
+    print(f"推送 {result.pushed}，拉取 {result.pulled}，采纳 {result.applied}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+批量校验：把行分片交给进程池，每片用 TypeAdapter(List[JigDynamic]) 一次校验
+
+用于大文件导入和模型约束修改后的全库复查：
+
+    python -m custom_utils.validation            # 复查 jig.db
+    python -m custom_utils.validation --workers 4 --jsonl
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from custom_utils import db, metrics
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每个分片的行数：太小时进程间通信占比高，太大时结果返回不及时
+DEFAULT_CHUNK = 5000
+
+# 错误值在结果中最多保留的字符数
+_MAX_VALUE = 80
+
+
+class ValidationIssue(NamedTuple):
+    """一条校验错误"""
+
+    # 导入时为文件行号，复查数据库时为 id
+    key: Any
+    no: Optional[str]
+    field: str
+    # pydantic 的错误类型，如 less_than_equal、enum
+    type: str
+    message: str
+    value: Any
+
+
+class ChunkResult(NamedTuple):
+    issues: List[ValidationIssue]
+    # dump=True 时为通过校验的行：(key, model_dump(mode="json"))
+    valid: List[Tuple[Any, Dict]]
+    count: int
+
+
+# ---------- 子进程 ----------
+# 每个进程只建一次 TypeAdapter，之后的分片复用
+_adapter = None
+_maximums: Dict[str, float] = {}
+
+
+def _init_worker(root_path: str = db.root_path):
+    """在子进程中导入 Model（不依赖 Qt 和 pandas）并构建批量校验器"""
+    global _adapter, _maximums
+    from pydantic import TypeAdapter
+
+    if root_path not in sys.path:
+        sys.path.append(root_path)
+    from Model import JigDynamic
+
+    _adapter = TypeAdapter(List[JigDynamic])
+    # json_schema_extra 中的 maximum 只是界面输入框的上限，pydantic 不检查，这里一并复查
+    _maximums = {
+        name: info.json_schema_extra["maximum"]
+        for name, info in JigDynamic.model_fields.items()
+        if isinstance(info.json_schema_extra, dict)
+        and "maximum" in info.json_schema_extra
+    }
+
+
+def _short(value):
+    if isinstance(value, (dict, list)):
+        return None
+    if isinstance(value, str) and len(value) > _MAX_VALUE:
+        return value[:_MAX_VALUE] + "…"
+    return value
+
+
+def _validate_chunk(
+    keys: List[Any], rows: List[Dict], dump: bool = False
+) -> ChunkResult:
+    """校验一个分片：整片一次交给 pydantic-core，有错误时只对其余行再校验一次"""
+    from pydantic import ValidationError
+
+    if _adapter is None:
+        _init_worker()
+    issues = []
+    bad = set()
+    try:
+        models = _adapter.validate_python(rows)
+        good = range(len(rows))
+    except ValidationError as e:
+        for err in e.errors(include_url=False):
+            index, *loc = err["loc"]
+            bad.add(index)
+            issues.append(
+                ValidationIssue(
+                    keys[index],
+                    rows[index].get("no"),
+                    ".".join(map(str, loc)),
+                    err["type"],
+                    err["msg"],
+                    _short(err.get("input")),
+                )
+            )
+        good = [i for i in range(len(rows)) if i not in bad]
+        models = _adapter.validate_python([rows[i] for i in good])
+    valid = []
+    for i, jig in zip(good, models):
+        ok = True
+        for name, maximum in _maximums.items():
+            value = getattr(jig, name)
+            if value is not None and value > maximum:
+                ok = False
+                issues.append(
+                    ValidationIssue(
+                        keys[i],
+                        jig.no,
+                        name,
+                        "maximum",
+                        f"Input should be less than or equal to {maximum}",
+                        value,
+                    )
+                )
+        if dump and ok:
+            valid.append((keys[i], jig.model_dump(mode="json")))
+    return ChunkResult(issues, valid, len(rows))
+
+
+# ---------- 分片与调度 ----------
+def _chunks(
+    rows: Iterable[Tuple[Any, Dict]], chunk_size: int
+) -> Iterator[Tuple[List, List]]:
+    keys, chunk = [], []
+    for key, row in rows:
+        keys.append(key)
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield keys, chunk
+            keys, chunk = [], []
+    if chunk:
+        yield keys, chunk
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def validate_rows(
+    rows: Iterable[Tuple[Any, Dict]],
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK,
+    dump: bool = False,
+) -> Iterator[ChunkResult]:
+    """
+    校验 (key, 字段字典) 序列，按输入顺序逐片返回结果
+
+    只有一个分片或 workers=1 时在当前进程中校验，省去启动进程池的开销；
+    否则用 spawn 方式启动进程池（与 Windows 一致，GUI 进程中也不会复制线程状态），
+    同时在途的分片不超过进程数的两倍，内存占用与总行数无关。
+
+    :param rows: (key, 字段字典)，key 原样出现在错误和结果中
+    :param workers: 进程数，默认为 CPU 核数
+    :param chunk_size: 每个分片的行数
+    :param dump: 是否返回通过校验的行（model_dump(mode="json")）
+    """
+    workers = workers or default_workers()
+    chunks = _chunks(rows, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if second is None or workers == 1:
+        yield _validate_chunk(*first, dump=dump)
+        if second is not None:
+            yield _validate_chunk(*second, dump=dump)
+        for chunk in chunks:
+            yield _validate_chunk(*chunk, dump=dump)
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(db.root_path,),
+    )
+    pending = deque()
+    try:
+        for chunk in (first, second):
+            pending.append(executor.submit(_validate_chunk, *chunk, dump=dump))
+        for chunk in chunks:
+            pending.append(executor.submit(_validate_chunk, *chunk, dump=dump))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+# ---------- 全库复查 ----------
+def _db_rows(db_path: str, table: str) -> Iterator[Tuple[int, Dict]]:
+    """按 id 顺序读取模型字段；NULL 视为未填写，交给模型的默认值和必填检查"""
+    from custom_utils.columns import get_registry
+
+    registry = get_registry(db_path, table)
+    model_fields = registry.model_class.model_fields
+    conn = db.connect(db_path)
+    try:
+        columns = [
+            (i, field)
+            for i, field in enumerate(registry.fields)
+            if field in model_fields
+        ]
+        cursor = conn.execute(f"SELECT * FROM {table} ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(DEFAULT_CHUNK)
+            if not rows:
+                break
+            for row in rows:
+                data = {f: row[i] for i, f in columns if row[i] is not None}
+                yield data.get("id"), data
+    finally:
+        conn.close()
+
+
+def revalidate(
+    db_path: str = db.jig_db_path,
+    table: str = db.JIG_TABLE,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK,
+    max_issues: Optional[int] = 1000,
+    on_issue=None,
+) -> Dict:
+    """
+    用当前模型复查数据库中的全部治具，返回汇总
+
+    :param db_path: 数据库路径
+    :param table: 表名
+    :param workers: 进程数，默认为 CPU 核数
+    :param chunk_size: 每个分片的行数
+    :param max_issues: 汇总中最多保留的错误条数，None 为不限
+    :param on_issue: 每条错误的回调，用于边查边输出
+    """
+    summary = {"checked": 0, "invalid_rows": 0, "issues": []}
+    by_field = Counter()
+    with metrics.timer("validation.revalidate"):
+        for result in validate_rows(
+            _db_rows(db_path, table), workers=workers, chunk_size=chunk_size
+        ):
+            summary["checked"] += result.count
+            summary["invalid_rows"] += len({issue.key for issue in result.issues})
+            for issue in result.issues:
+                by_field[issue.field] += 1
+                if on_issue:
+                    on_issue(issue)
+                if max_issues is None or len(summary["issues"]) < max_issues:
+                    summary["issues"].append(issue._asdict())
+    summary["by_field"] = dict(by_field.most_common())
+    metrics.set_gauge("validation.invalid_rows", summary["invalid_rows"])
+    logger.info(
+        f"已复查 {summary['checked']} 行，{summary['invalid_rows']} 行不符合模型约束"
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_utils.validation",
+        description="用当前模型复查治具表中的全部数据",
+    )
+    parser.add_argument("--db", default=db.jig_db_path, help="数据库路径")
+    parser.add_argument("--workers", type=int, help="进程数，默认为 CPU 核数")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument(
+        "--jsonl", action="store_true", help="每条错误输出一行 JSON，最后输出汇总"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    def emit(issue: ValidationIssue):
+        print(json.dumps(issue._asdict(), ensure_ascii=False, default=str))
+
+    summary = revalidate(
+        args.db,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        max_issues=0 if args.jsonl else 1000,
+        on_issue=emit if args.jsonl else None,
+    )
+    if args.jsonl:
+        summary.pop("issues")
+    print(json.dumps(summary, ensure_ascii=False, default=str))
+    return 1 if summary["invalid_rows"] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,538 @@
+"""
+监视测试机的日志目录，把日志中的治具使用记录写入 jig.db
+
+每个文件记住已读到的字节位置，只读取新增的完整行；读取位置与使用次数、取用/归还
+在同一个事务中提交，程序中途退出也不会重复计数或遗漏。Linux 上用 inotify 得到
+文件变化通知，其他系统（或 inotify 不可用时）定时扫描目录。
+
+    python -m custom_utils.watchfolder D:/tester/logs --once
+"""
+
+import os
+import re
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import fnmatch
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from custom_utils import db, metrics
+from custom_utils.counters import increment
+from custom_utils.settings import WatchSettings
+from Model import JigUseStatus
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watch_offsets (
+    path TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+) WITHOUT ROWID;
+"""
+
+# 事件
+EVENT_CYCLE = "cycle"
+EVENT_CHECKOUT = "checkout"
+EVENT_RETURN = "return"
+
+_EVENT_WORDS = {
+    "取用": EVENT_CHECKOUT,
+    "checkout": EVENT_CHECKOUT,
+    "归还": EVENT_RETURN,
+    "return": EVENT_RETURN,
+}
+
+# 单个文件每批最多读取的字节数，积压的大文件分几批读完，一批的事务不会太长
+_MAX_READ = 4 * 1024 * 1024
+
+# 即使有 inotify，也定时全量扫描一次，补上可能丢失的通知
+_RESCAN_SECONDS = 60
+
+# 按编号查询治具时每条语句的编号个数（SQLite 变量个数有上限）
+_LOOKUP_CHUNK = 500
+
+
+class LogEvent(NamedTuple):
+    no: str
+    event: str
+    count: int
+
+
+class _Read(NamedTuple):
+    path: str
+    file_id: str
+    # 读取时数据库中记录的 (文件标识, 位置)，没有记录时为 None
+    stored: Optional[Tuple[str, int]]
+    offset: int
+    text: str
+
+
+class IngestResult(NamedTuple):
+    files: int = 0
+    lines: int = 0
+    cycles: int = 0
+    events: int = 0
+    unknown: int = 0
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    conn.executescript(_SCHEMA)
+
+
+def parse_events(text: str, regex: "re.Pattern") -> Iterator[LogEvent]:
+    """逐行匹配；一行最多一条记录"""
+    groups = regex.groupindex
+    for line in text.splitlines():
+        match = regex.search(line)
+        if match is None:
+            continue
+        event = EVENT_CYCLE
+        if "event" in groups and match.group("event"):
+            event = _EVENT_WORDS.get(match.group("event").lower(), EVENT_CYCLE)
+        count = 1
+        if "count" in groups and match.group("count"):
+            count = int(match.group("count"))
+        yield LogEvent(match.group("no"), event, count)
+
+
+def existing_nos(conn: sqlite3.Connection, nos: Set[str]) -> Set[str]:
+    """数据库中存在的治具编号，只查询给出的编号"""
+    found = set()
+    nos = list(nos)
+    for i in range(0, len(nos), _LOOKUP_CHUNK):
+        chunk = nos[i : i + _LOOKUP_CHUNK]
+        found.update(
+            row[0]
+            for row in conn.execute(
+                f"SELECT no FROM jig WHERE no IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+        )
+    return found
+
+
+def _file_id(st: os.stat_result) -> str:
+    """文件标识：被删除后同名重建或轮转时从头读取"""
+    return f"{st.st_dev}:{st.st_ino}"
+
+
+def _stored(conn: sqlite3.Connection, path: str) -> Optional[Tuple[str, int]]:
+    row = conn.execute(
+        "SELECT file_id, offset FROM watch_offsets WHERE path = ?", (path,)
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+# ---------- 变化通知 ----------
+class _Inotify:
+    """inotify（ctypes），只监视一个目录，不递归"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _HEADER = struct.Struct("iIII")
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("系统不支持 inotify")
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"无法监视目录: {directory}")
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """等待变化，返回变化的文件名；通知队列溢出时返回 None（需要全量扫描）"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            pos = 0
+            while pos < len(data):
+                _, mask, _, length = self._HEADER.unpack_from(data, pos)
+                pos += self._HEADER.size
+                if mask & self.IN_Q_OVERFLOW:
+                    return None
+                name = data[pos : pos + length].rstrip(b"\0")
+                pos += length
+                if name:
+                    names.add(os.fsdecode(name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller:
+    """定时扫描目录，按大小和修改时间判断变化"""
+
+    def __init__(self, directory: str, stop: threading.Event):
+        self.directory = directory
+        self._stop = stop
+        self._stats: Dict[str, Tuple[int, int]] = {}
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        self._stop.wait(timeout)
+        changed = set()
+        stats = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return changed
+        for entry in entries:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            stats[entry.name] = (st.st_size, st.st_mtime_ns)
+            if self._stats.get(entry.name) != stats[entry.name]:
+                changed.add(entry.name)
+        self._stats = stats
+        return changed
+
+    def close(self):
+        pass
+
+
+# ---------- 读取与写入 ----------
+class FolderIngester:
+    """
+    日志目录监视线程
+
+    变化的文件先收集起来，每隔 flush_seconds 统一读取新增内容，在一个事务中写入：
+    使用次数按治具汇总后累加，取用/归还按日志顺序执行，最后更新各文件的读取位置。
+    多个工位监视同一目录时，事务中重新核对读取位置，已被其他工位读过的内容不再计数。
+
+    :param settings: 日志监视配置
+    :param on_applied: 写入后调用（在监视线程中），参数为 IngestResult
+    :param db_path: 数据库路径
+    """
+
+    def __init__(
+        self,
+        settings: WatchSettings,
+        on_applied: Optional[Callable[[IngestResult], None]] = None,
+        db_path: str = db.jig_db_path,
+    ):
+        self.settings = settings
+        self.on_applied = on_applied
+        self.db_path = db_path
+        self._regex = re.compile(settings.regex)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 因单批读取上限没有读完的文件，下一批继续
+        self._backlog: Set[str] = set()
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(db.root_path, self.settings.directory)
+
+    def update(self, settings: WatchSettings):
+        """修改目录需重启程序后生效"""
+        self.settings = settings
+        self._regex = re.compile(settings.regex)
+
+    def start(self):
+        if not (self.settings.enabled and self.settings.directory):
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        if not os.path.isdir(self.directory):
+            logger.warning(f"日志目录不存在，未启动监视: {self.directory}")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="FolderIngester", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def matching_files(self) -> Set[str]:
+        try:
+            return {
+                entry.name
+                for entry in os.scandir(self.directory)
+                if entry.is_file()
+                and fnmatch.fnmatch(entry.name, self.settings.pattern)
+            }
+        except OSError:
+            return set()
+
+    def _read_new(self, conn: sqlite3.Connection, name: str) -> Optional[_Read]:
+        """读取文件新增的完整行"""
+        path = os.path.abspath(os.path.join(self.directory, name))
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        file_id = _file_id(st)
+        row = _stored(conn, path)
+        start = 0
+        if row and row[0] == file_id and st.st_size >= row[1]:
+            start = row[1]
+        if st.st_size == start:
+            return None
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(min(st.st_size - start, _MAX_READ))
+        end = data.rfind(b"\n")
+        if end < 0:
+            # 还没有写完一整行
+            return None
+        if start + len(data) < st.st_size:
+            self._backlog.add(name)
+        text = data[: end + 1].decode(self.settings.encoding, "replace")
+        return _Read(path, file_id, row, start + end + 1, text)
+
+    def _baseline(self, conn: sqlite3.Connection, prefix: str, names: Set[str]):
+        """首次启用时记下已有文件的末尾，只读取之后新增的内容"""
+        conn.execute("BEGIN IMMEDIATE")
+        # 目录本身也记一行，之后出现的新文件都从头读取
+        conn.execute(
+            "INSERT OR IGNORE INTO watch_offsets (path, file_id, offset) "
+            "VALUES (?, '', 0)",
+            (prefix,),
+        )
+        for name in names:
+            path = os.path.abspath(os.path.join(self.directory, name))
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            conn.execute(
+                "INSERT OR IGNORE INTO watch_offsets (path, file_id, offset) "
+                "VALUES (?, ?, ?)",
+                (path, _file_id(st), st.st_size),
+            )
+        conn.execute("COMMIT")
+        logger.info(f"日志监视首次启用，跳过已有的 {len(names)} 个文件")
+
+    def ingest_once(self, names: Optional[Set[str]] = None) -> IngestResult:
+        """
+        读取并写入一批文件；names 为 None 时处理目录中的全部日志文件
+
+        :param names: 变化的文件名
+        """
+        full = names is None
+        if full:
+            names = self.matching_files()
+        names = set(names) | self._backlog
+        self._backlog = set()
+        conn = db.connect(self.db_path)
+        conn.isolation_level = None
+        try:
+            ensure_schema(conn)
+            prefix = os.path.abspath(self.directory) + os.sep
+            if full and not self.settings.read_existing:
+                known = conn.execute(
+                    "SELECT 1 FROM watch_offsets WHERE path = ?", (prefix,)
+                ).fetchone()
+                if not known:
+                    self._baseline(conn, prefix, names)
+                    return IngestResult()
+            reads = []
+            with metrics.timer("watch.read"):
+                for name in sorted(names):
+                    read = self._read_new(conn, name)
+                    if read:
+                        reads.append((read, list(parse_events(read.text, self._regex))))
+            totals: Dict[str, int] = {}
+            events: List[LogEvent] = []
+            lines = unknown = 0
+            with metrics.timer("watch.write"):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # 其他工位可能同时监视同一目录：读取之后位置已被改动的文件
+                    # 已由对方写入，丢弃本次读到的内容
+                    kept = [
+                        (read, parsed)
+                        for read, parsed in reads
+                        if _stored(conn, read.path) == read.stored
+                    ]
+                    if len(kept) < len(reads):
+                        metrics.inc("watch.read_discarded", len(reads) - len(kept))
+                        logger.info(
+                            f"{len(reads) - len(kept)} 个文件已由其他工位读取，已跳过"
+                        )
+                    reads = [read for read, _ in kept]
+                    known = existing_nos(
+                        conn, {e.no for _, parsed in kept for e in parsed}
+                    )
+                    for _, parsed in kept:
+                        for event in parsed:
+                            lines += 1
+                            if event.no not in known:
+                                unknown += 1
+                            elif event.event == EVENT_CYCLE:
+                                totals[event.no] = totals.get(event.no, 0) + event.count
+                            else:
+                                events.append(event)
+                    applied = self._apply_events(conn, events)
+                    increment(conn, totals)
+                    conn.executemany(
+                        "INSERT INTO watch_offsets (path, file_id, offset) "
+                        "VALUES (?, ?, ?) ON CONFLICT (path) DO UPDATE SET "
+                        "file_id = excluded.file_id, offset = excluded.offset, "
+                        "updated_at = excluded.updated_at",
+                        [(r.path, r.file_id, r.offset) for r in reads],
+                    )
+                    if full:
+                        # 已删除的文件不再需要记录位置
+                        present = {
+                            os.path.abspath(os.path.join(self.directory, n))
+                            for n in self.matching_files()
+                        }
+                        stale = [
+                            (path,)
+                            for (path,) in conn.execute(
+                                "SELECT path FROM watch_offsets "
+                                "WHERE substr(path, 1, ?) = ?",
+                                (len(prefix), prefix),
+                            )
+                            if path not in present and path != prefix
+                        ]
+                        conn.executemany(
+                            "DELETE FROM watch_offsets WHERE path = ?", stale
+                        )
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+        result = IngestResult(len(reads), lines, sum(totals.values()), applied, unknown)
+        if unknown:
+            metrics.inc("watch.unknown", unknown)
+        if lines:
+            metrics.inc("watch.lines", lines)
+            logger.debug(f"日志监视: {result}")
+        return result
+
+    def _apply_events(self, conn: sqlite3.Connection, events: List[LogEvent]) -> int:
+        """取用/归还与界面操作规则相同：状态不符时跳过；归还时使用次数加一"""
+        applied = 0
+        for event in events:
+            if event.event == EVENT_CHECKOUT:
+                cursor = conn.execute(
+                    "UPDATE jig SET UseStatus = ? WHERE no = ? AND UseStatus = ?",
+                    (JigUseStatus.USING.value, event.no, JigUseStatus.UNUSE.value),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jig SET UseStatus = ? WHERE no = ? AND UseStatus = ?",
+                    (JigUseStatus.UNUSE.value, event.no, JigUseStatus.USING.value),
+                )
+                if cursor.rowcount:
+                    increment(conn, {event.no: 1})
+            if cursor.rowcount:
+                applied += 1
+            else:
+                metrics.inc("watch.event_skipped")
+                logger.info(
+                    f"日志中的{event.event}与治具 {event.no} 的状态不符，已跳过"
+                )
+        return applied
+
+    def _watcher(self):
+        try:
+            return _Inotify(self.directory)
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify 不可用，改为定时扫描: {e}")
+            return _Poller(self.directory, self._stop)
+
+    def _run(self):
+        watcher = self._watcher()
+        dirty: Optional[Set[str]] = None
+        last_write = last_scan = 0.0
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now - last_scan >= _RESCAN_SECONDS:
+                    # None 表示全量扫描
+                    dirty, last_scan = None, now
+                if (dirty is None or dirty or self._backlog) and (
+                    now - last_write >= self.settings.flush_seconds
+                ):
+                    try:
+                        result = self.ingest_once(dirty)
+                    except Exception as e:
+                        metrics.inc("watch.error")
+                        logger.error(f"读取日志目录失败: {e}", exc_info=True)
+                    else:
+                        if (result.cycles or result.events) and self.on_applied:
+                            self.on_applied(result)
+                    dirty, last_write = set(), time.monotonic()
+                changed = watcher.wait(self.settings.poll_seconds)
+                if changed is None:
+                    dirty = None
+                elif dirty is not None:
+                    dirty |= {
+                        n for n in changed if fnmatch.fnmatch(n, self.settings.pattern)
+                    }
+        finally:
+            watcher.close()
+
+
+def main(argv=None):
+    from custom_utils.settings import load_settings
+
+    settings = load_settings(os.path.join(db.root_path, "config.ini")).watch
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_utils.watchfolder", description="监视测试机日志目录"
+    )
+    parser.add_argument("directory", nargs="?", default=settings.directory)
+    parser.add_argument("--db", default=db.jig_db_path, help="数据库路径")
+    parser.add_argument("--once", action="store_true", help="读取一次后退出")
+    args = parser.parse_args(argv)
+    if not args.directory:
+        parser.error("未设置日志目录")
+
+    logging.basicConfig(level=logging.INFO)
+    settings = settings.model_copy(
+        update={"enabled": True, "directory": os.path.abspath(args.directory)}
+    )
+    ingester = FolderIngester(settings, db_path=args.db)
+    if args.once:
+        print(ingester.ingest_once())
+        return 0
+    ingester.on_applied = lambda result: logger.info(str(result))
+    ingester.start()
+    try:
+        while ingester._thread and ingester._thread.is_alive():
+            ingester._thread.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ingester.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import sys
+import os
+import logging
+from datetime import date
+
+from PySide6.QtWidgets import (
+    QWidget,
+    QLabel,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QGroupBox,
+    QVBoxLayout,
+)
+from PySide6.QtCore import Qt, QTimer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from custom_utils import db
+from custom_utils.dashboard import read_dashboard, wear_label
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def _item(value) -> QTableWidgetItem:
+    item = QTableWidgetItem(str(value))
+    if isinstance(value, int):
+        item.setTextAlignment(
+            Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        )
+    return item
+
+
+class DashboardWidget(QWidget):
+    """
+    库存概览：类型 × 状态、校验到期、磨损分档
+
+    数据来自触发器维护的汇总表（需先调用 install_dashboard）；每隔 poll_interval 毫秒检查一次
+    PRAGMA data_version，只有其他连接提交过修改（如取用、归还）时才重新读取。
+
+    :param federation: custom_utils.federation.Federation，给出时显示所有站点的合计
+    """
+
+    def __init__(
+        self, db_path=db.jig_db_path, parent=None, poll_interval=1000, federation=None
+    ):
+        super().__init__(parent)
+        self.federation = federation
+        self.conn = federation.connect() if federation else db.connect(db_path)
+        self._data_version = None
+        self._today = None
+
+        self.mainLayout = QVBoxLayout()
+        self.setLayout(self.mainLayout)
+
+        self.label_total = QLabel()
+        self.mainLayout.addWidget(self.label_total)
+
+        self.table_status = self._add_table(self.tr("类型 / 状态"))
+        self.table_due = self._add_table(self.tr("校验到期"))
+        self.table_wear = self._add_table(self.tr("磨损（已使用 / 最大使用次数）"))
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(poll_interval)
+        self.timer.timeout.connect(self.poll)
+
+        self.refresh()
+
+    def _add_table(self, title) -> QTableWidget:
+        group = QGroupBox(title)
+        layout = QVBoxLayout()
+        group.setLayout(layout)
+        table = QTableWidget()
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.ResizeToContents
+        )
+        layout.addWidget(table)
+        self.mainLayout.addWidget(group)
+        return table
+
+    def _version(self):
+        if self.federation:
+            return self.federation.data_version(self.conn)
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self):
+        """数据库或日期变化时刷新"""
+        version = self._version()
+        if version != self._data_version or date.today() != self._today:
+            self.refresh()
+
+    def refresh(self):
+        self._data_version = self._version()
+        self._today = date.today()
+        try:
+            data = read_dashboard(self.conn, today=self._today)
+        except Exception as e:
+            logger.error(f"读取概览失败: {e}", exc_info=True)
+            return
+
+        self.label_total.setText(self.tr("治具总数：") + str(data["total"]))
+        self._fill_status(data["type_status"])
+        self._fill_rows(self.table_due, [self.tr("到期"), self.tr("数量")], data["due"])
+        wear = [(wear_label(bucket), n) for bucket, n in data["wear"]]
+        self._fill_rows(self.table_wear, [self.tr("磨损"), self.tr("数量")], wear)
+
+    def _fill_status(self, type_status):
+        types = sorted({row[0] for row in type_status})
+        statuses = sorted({row[1] for row in type_status})
+        counts = {(t, s): n for t, s, n in type_status}
+        table = self.table_status
+        table.clear()
+        table.setRowCount(len(types))
+        table.setColumnCount(len(statuses) + 1)
+        table.setHorizontalHeaderLabels(statuses + [self.tr("合计")])
+        table.setVerticalHeaderLabels(types)
+        for r, t in enumerate(types):
+            row_total = 0
+            for c, s in enumerate(statuses):
+                n = counts.get((t, s), 0)
+                row_total += n
+                table.setItem(r, c, _item(n))
+            table.setItem(r, len(statuses), _item(row_total))
+
+    def _fill_rows(self, table: QTableWidget, headers, rows):
+        table.clear()
+        table.setRowCount(len(rows))
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.verticalHeader().setVisible(False)
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                table.setItem(r, c, _item(value))
+
+    # 隐藏时不轮询
+    def showEvent(self, event):
+        self.timer.start()
+        self.poll()
+        return super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        return super().hideEvent(event)
+
+    def close_db(self):
+        self.timer.stop()
+        db.close(self.conn)
@@ -38,6 +38,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from Model import JigDynamic, JigType, JigUseStatus
 from custom_utils import Model2SQL
 from custom_utils.ColorModel import ColoredSqlProxyModel
+from custom_utils import metrics
 
 
 # 配置日志
@@ -57,6 +58,7 @@ data_path = os.path.join(data_path, "datas")
 class EnumManageWin(QDialog):
     DataChanged = Signal()
 
+    @metrics.timed("dialog.EnumManageWin")
     def __init__(self, parent=None):
         super().__init__(parent)
         logger.info("初始化管理窗口")
@@ -113,6 +115,7 @@ class EnumManageWin(QDialog):
     def setTablename(self, tablename: str):
         self.tableName = tablename
 
+    @metrics.timed("sql.enum.load")
     def load_from_db_to_listwidget(self):
         # 清空现有项
         self.listWidget.clear()
@@ -141,6 +144,7 @@ class EnumManageWin(QDialog):
             self.listWidget.addItem(item)
         logger.info("已重置列表")
 
+    @metrics.timed("sql.enum.save")
     def save_enum_to_db(self):
         changed = False
         for i in range(self.listWidget.count()):
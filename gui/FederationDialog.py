@@ -0,0 +1,208 @@
+import sys
+import os
+import logging
+
+from PySide6.QtWidgets import (
+    QDialog,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QComboBox,
+    QLineEdit,
+    QLabel,
+    QMessageBox,
+    QPushButton,
+    QSplitter,
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+)
+from PySide6.QtCore import Qt, QTimer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from Model import JigUseStatus
+from custom_utils import metrics
+from custom_utils.ColumnSizer import ColumnSizer
+from custom_utils.federation import SEARCH_COLUMNS, Federation
+from custom_utils.repository import JigLimitError, JigRepositoryError
+from gui.DashboardWidget import DashboardWidget
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+ALL = "全部"
+
+
+class FederationDialog(QDialog):
+    """
+    全厂库存：跨站点查找治具、查看合计概览，并在治具所在站点取用/归还
+
+    :param federation: custom_utils.federation.Federation，对话框关闭时一并关闭
+    :param columns: custom_utils.columns.ColumnRegistry，用于显示字段标题
+    """
+
+    @metrics.timed("dialog.FederationDialog")
+    def __init__(self, federation: Federation, columns=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(self.tr("全厂库存"))
+        self.resize(1200, 700)
+        self.federation = federation
+        self.columns = columns
+
+        self.mainLayout = QVBoxLayout()
+        self.setLayout(self.mainLayout)
+
+        filterLayout = QHBoxLayout()
+        filterLayout.addWidget(QLabel(self.tr("查找：")))
+        self.edit_search = QLineEdit()
+        self.edit_search.setPlaceholderText(self.tr("编号 / 名称 / 机种"))
+        filterLayout.addWidget(self.edit_search)
+        filterLayout.addWidget(QLabel(self.tr("站点：")))
+        self.combo_site = QComboBox()
+        self.combo_site.addItems([ALL] + [site.name for site in federation.sites])
+        filterLayout.addWidget(self.combo_site)
+        filterLayout.addWidget(QLabel(self.tr("类型：")))
+        self.combo_type = QComboBox()
+        self.combo_type.addItems([ALL] + federation.types())
+        filterLayout.addWidget(self.combo_type)
+        filterLayout.addWidget(QLabel(self.tr("状态：")))
+        self.combo_status = QComboBox()
+        self.combo_status.addItems([ALL] + [s.value for s in JigUseStatus])
+        filterLayout.addWidget(self.combo_status)
+        self.mainLayout.addLayout(filterLayout)
+
+        splitter = QSplitter()
+        left = QWidget()
+        leftLayout = QVBoxLayout()
+        leftLayout.setContentsMargins(0, 0, 0, 0)
+        left.setLayout(leftLayout)
+        self.table = QTableWidget(0, len(SEARCH_COLUMNS))
+        self.table.setHorizontalHeaderLabels(
+            [self.tr("站点")] + [self._title(c) for c in SEARCH_COLUMNS[1:]]
+        )
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.horizontalHeader().setSortIndicator(1, Qt.SortOrder.AscendingOrder)
+        self.column_sizer = ColumnSizer(self.table)
+        leftLayout.addWidget(self.table)
+        self.label_count = QLabel()
+        leftLayout.addWidget(self.label_count)
+        splitter.addWidget(left)
+        self.dashboard = DashboardWidget(federation=federation)
+        splitter.addWidget(self.dashboard)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 1)
+        self.mainLayout.addWidget(splitter)
+
+        btnLayout = QHBoxLayout()
+        btnLayout.addStretch()
+        self.btn_checkout = QPushButton(self.tr("取用"))
+        self.btn_checkout.clicked.connect(self.checkout)
+        btnLayout.addWidget(self.btn_checkout)
+        self.btn_return = QPushButton(self.tr("归还"))
+        self.btn_return.clicked.connect(self.return_jig)
+        btnLayout.addWidget(self.btn_return)
+        self.btn_close = QPushButton(self.tr("关闭"))
+        self.btn_close.clicked.connect(self.close)
+        btnLayout.addWidget(self.btn_close)
+        self.mainLayout.addLayout(btnLayout)
+
+        # 输入时合并查询
+        self.searchTimer = QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(300)
+        self.searchTimer.timeout.connect(self.search)
+        self.edit_search.textChanged.connect(self.searchTimer.start)
+        self.edit_search.returnPressed.connect(self.search)
+        self.combo_site.currentTextChanged.connect(self.search)
+        self.combo_type.currentTextChanged.connect(self.search)
+        self.combo_status.currentTextChanged.connect(self.search)
+
+        self.search()
+
+    def _title(self, field: str) -> str:
+        if self.columns is not None and self.columns.index(field) >= 0:
+            return self.columns.title(field)
+        return field
+
+    @staticmethod
+    def _value(combo: QComboBox) -> str:
+        text = combo.currentText()
+        return "" if text == ALL else text
+
+    def search(self):
+        self.searchTimer.stop()
+        site = self._value(self.combo_site)
+        rows = self.federation.search(
+            self.edit_search.text(),
+            jig_type=self._value(self.combo_type),
+            status=self._value(self.combo_status),
+            sites=[site] if site else None,
+        )
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            # 第 1 列显示站点，id 存在站点单元格中
+            site_item = QTableWidgetItem(row[0])
+            site_item.setData(Qt.ItemDataRole.UserRole, row[1])
+            self.table.setItem(r, 0, site_item)
+            for c, value in enumerate(row[2:], 1):
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, value)
+                self.table.setItem(r, c, item)
+        self.table.setSortingEnabled(True)
+        self.label_count.setText(self.tr("共 ") + str(len(rows)) + self.tr(" 条"))
+
+    def _selected(self):
+        """选中行的 (站点, 治具 id)"""
+        row = self.table.currentRow()
+        if row < 0:
+            return None
+        item = self.table.item(row, 0)
+        return item.text(), item.data(Qt.ItemDataRole.UserRole)
+
+    def checkout(self):
+        selected = self._selected()
+        if selected is None:
+            return
+        site, jig_id = selected
+        repository = self.federation.repository(site)
+        try:
+            try:
+                record = repository.checkout(jig_id)
+            except JigLimitError as e:
+                reply = QMessageBox.warning(
+                    self,
+                    self.tr("警告"),
+                    str(e) + "\n" + self.tr("是否继续取用？"),
+                    buttons=QMessageBox.StandardButton.Yes
+                    | QMessageBox.StandardButton.No,
+                    defaultButton=QMessageBox.StandardButton.No,
+                )
+                if reply != QMessageBox.StandardButton.Yes:
+                    return
+                record = repository.checkout(jig_id, force=True)
+        except JigRepositoryError as e:
+            QMessageBox.information(self, self.tr("提示"), str(e))
+            return
+        logger.info(f"在站点 {site} 取用 {record.no}")
+        self.search()
+
+    def return_jig(self):
+        selected = self._selected()
+        if selected is None:
+            return
+        site, jig_id = selected
+        try:
+            record = self.federation.repository(site).return_jig(jig_id)
+        except JigRepositoryError as e:
+            QMessageBox.information(self, self.tr("提示"), str(e))
+            return
+        logger.info(f"在站点 {site} 归还 {record.no}")
+        self.search()
+
+    def closeEvent(self, event):
+        self.dashboard.close_db()
+        self.federation.close()
+        return super().closeEvent(event)
@@ -0,0 +1,142 @@
+import sys
+import os
+import logging
+from datetime import date
+
+from PySide6.QtWidgets import (
+    QApplication,
+    QDialog,
+    QTableView,
+    QComboBox,
+    QLabel,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QAbstractItemView,
+)
+from PySide6.QtCore import Qt, QSortFilterProxyModel
+from PySide6.QtSql import QSqlDatabase, QSqlQuery, QSqlQueryModel
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from custom_utils import db, metrics
+from custom_utils.ColumnSizer import ColumnSizer
+from custom_utils.forecast import last_computed, run_forecast
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class ForecastDialog(QDialog):
+    """
+    寿命预测：按使用速率推算的下次校验日期和报废日期
+    """
+
+    HEADERS = [
+        "治具编号",
+        "治具名称",
+        "治具类型",
+        "下次校验",
+        "校验原因",
+        "距校验（天）",
+        "预计报废",
+        "距报废（天）",
+        "日均使用次数",
+    ]
+
+    # 筛选项 -> WHERE 条件，? 为今天（均可使用 jig_forecast 上的索引）
+    FILTERS = {
+        "全部": "",
+        "30天内需校验": "WHERE f.calibration_due <= date(?, '+30 days')",
+        "90天内需校验": "WHERE f.calibration_due <= date(?, '+90 days')",
+        "一年内报废": "WHERE f.retirement_date <= date(?, '+365 days')",
+    }
+
+    @metrics.timed("dialog.ForecastDialog")
+    def __init__(self, parent=None, db_path=db.jig_db_path):
+        super().__init__(parent)
+        self.setWindowTitle(self.tr("寿命预测"))
+        self.resize(1000, 600)
+        self.db_path = db_path
+
+        self.mainLayout = QVBoxLayout()
+        self.setLayout(self.mainLayout)
+
+        topLayout = QHBoxLayout()
+        topLayout.addWidget(QLabel(self.tr("筛选：")))
+        self.combo_filter = QComboBox()
+        self.combo_filter.addItems(list(self.FILTERS))
+        self.combo_filter.currentTextChanged.connect(self.refresh)
+        topLayout.addWidget(self.combo_filter)
+        topLayout.addStretch()
+        self.label_computed = QLabel()
+        topLayout.addWidget(self.label_computed)
+        self.mainLayout.addLayout(topLayout)
+
+        self.model = QSqlQueryModel(self)
+        self.agent = QSortFilterProxyModel(self)
+        self.agent.setSourceModel(self.model)
+        self.table = QTableView()
+        self.table.setModel(self.agent)
+        self.table.setSortingEnabled(True)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.column_sizer = ColumnSizer(self.table)
+        self.mainLayout.addWidget(self.table)
+
+        btnLayout = QHBoxLayout()
+        btnLayout.addStretch()
+        self.btn_recompute = QPushButton(self.tr("重新计算"))
+        self.btn_recompute.clicked.connect(self.recompute)
+        btnLayout.addWidget(self.btn_recompute)
+        self.btn_export = QPushButton(self.tr("导出"))
+        self.btn_export.clicked.connect(self.export)
+        btnLayout.addWidget(self.btn_export)
+        self.btn_close = QPushButton(self.tr("关闭"))
+        self.btn_close.clicked.connect(self.close)
+        btnLayout.addWidget(self.btn_close)
+        self.mainLayout.addLayout(btnLayout)
+
+        # 当天还没有计算过时先计算一次
+        if last_computed(self.db_path) != date.today().isoformat():
+            self.recompute()
+        else:
+            self.refresh()
+
+    def recompute(self):
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            run_forecast(self.db_path)
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.refresh()
+
+    def refresh(self):
+        where = self.FILTERS[self.combo_filter.currentText()]
+        query = QSqlQuery(QSqlDatabase.database())
+        query.prepare(
+            f"""SELECT f.no, j.name, j.type, f.calibration_due, f.calibration_reason,
+            f.days_to_calibration, f.retirement_date, f.days_to_retirement,
+            ROUND(f.usage_rate, 2)
+            FROM jig_forecast f JOIN jig j ON j.id = f.jig_id
+            {where}
+            ORDER BY f.calibration_due"""
+        )
+        if "?" in where:
+            query.addBindValue(date.today().isoformat())
+        if not query.exec():
+            logger.error(f"读取寿命预测失败: {query.lastError().text()}")
+            return
+        self.model.setQuery(query)
+        while self.model.canFetchMore():
+            self.model.fetchMore()
+        for i, title in enumerate(self.HEADERS):
+            self.model.setHeaderData(i, Qt.Orientation.Horizontal, title)
+        self.label_computed.setText(
+            self.tr("计算日期：") + str(last_computed(self.db_path) or "-")
+        )
+
+    def export(self):
+        # 延迟导入，避免与主窗口循环导入
+        from gui.mainWin import export_table_to_file
+
+        export_table_to_file(self, self.agent, view=self.table)
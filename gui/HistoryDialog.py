@@ -0,0 +1,130 @@
+import sys
+import os
+import logging
+from datetime import datetime
+
+from PySide6.QtWidgets import (
+    QDialog,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QDateTimeEdit,
+    QLabel,
+    QPushButton,
+    QGroupBox,
+    QVBoxLayout,
+    QHBoxLayout,
+)
+from PySide6.QtCore import QDateTime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from custom_utils import db
+from custom_utils.history import (
+    OP_COUNT,
+    OP_DELETE,
+    OP_INSERT,
+    jig_as_of,
+    jig_changes,
+)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+OP_NAMES = {OP_INSERT: "新增", OP_DELETE: "删除", OP_COUNT: "使用"}
+
+
+class HistoryDialog(QDialog):
+    """
+    治具修改记录，以及还原到任意时刻的状态
+
+    :param jig_id: 治具 id
+    :param columns: custom_utils.columns.ColumnRegistry，用于显示字段标题
+    """
+
+    def __init__(self, jig_id, columns=None, parent=None, db_path=db.jig_db_path):
+        super().__init__(parent)
+        self.setWindowTitle(self.tr("修改记录"))
+        self.resize(800, 600)
+        self.jig_id = jig_id
+        self.columns = columns
+        self.conn = db.connect(db_path)
+
+        self.mainLayout = QVBoxLayout()
+        self.setLayout(self.mainLayout)
+
+        self.table_changes = QTableWidget(0, 5)
+        self.table_changes.setHorizontalHeaderLabels(
+            [
+                self.tr("时间"),
+                self.tr("操作"),
+                self.tr("字段"),
+                self.tr("原值"),
+                self.tr("新值"),
+            ]
+        )
+        self.table_changes.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table_changes.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.ResizeToContents
+        )
+        self.mainLayout.addWidget(self.table_changes)
+
+        group = QGroupBox(self.tr("历史状态"))
+        groupLayout = QVBoxLayout()
+        group.setLayout(groupLayout)
+        timeLayout = QHBoxLayout()
+        timeLayout.addWidget(QLabel(self.tr("时刻：")))
+        self.edit_time = QDateTimeEdit(QDateTime.currentDateTime())
+        self.edit_time.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+        self.edit_time.setCalendarPopup(True)
+        self.edit_time.dateTimeChanged.connect(self.show_as_of)
+        timeLayout.addWidget(self.edit_time)
+        timeLayout.addStretch()
+        groupLayout.addLayout(timeLayout)
+        self.table_state = QTableWidget(0, 2)
+        self.table_state.setHorizontalHeaderLabels([self.tr("字段"), self.tr("值")])
+        self.table_state.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table_state.horizontalHeader().setStretchLastSection(True)
+        groupLayout.addWidget(self.table_state)
+        self.mainLayout.addWidget(group)
+
+        btnLayout = QHBoxLayout()
+        btnLayout.addStretch()
+        self.btn_close = QPushButton(self.tr("关闭"))
+        self.btn_close.clicked.connect(self.close)
+        btnLayout.addWidget(self.btn_close)
+        self.mainLayout.addLayout(btnLayout)
+
+        self.load_changes()
+        self.show_as_of()
+
+    def _title(self, field):
+        return self.columns.title(field) if self.columns else field
+
+    def load_changes(self):
+        rows = []
+        for ts, op, fields in jig_changes(self.conn, self.jig_id):
+            when = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+            op_name = self.tr(OP_NAMES.get(op, "修改"))
+            for field, (old, new) in fields.items():
+                rows.append((when, op_name, self._title(field), old, new))
+        self.table_changes.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                text = "" if value is None else str(value)
+                self.table_changes.setItem(r, c, QTableWidgetItem(text))
+
+    def show_as_of(self):
+        ts = self.edit_time.dateTime().toSecsSinceEpoch() + 0.999
+        state = jig_as_of(self.conn, self.jig_id, ts)
+        items = [] if state is None else [(k, v) for k, v in state.items() if k != "id"]
+        if state is None:
+            items = [(self.tr("状态"), self.tr("该时刻不存在"))]
+        self.table_state.setRowCount(len(items))
+        for r, (field, value) in enumerate(items):
+            self.table_state.setItem(r, 0, QTableWidgetItem(self._title(field)))
+            text = "" if value is None else str(value)
+            self.table_state.setItem(r, 1, QTableWidgetItem(text))
+
+    def closeEvent(self, event):
+        db.close(self.conn)
+        return super().closeEvent(event)
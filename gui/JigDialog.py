@@ -7,6 +7,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from PySide6.QtWidgets import QDialog, QVBoxLayout
 from PySide6.QtCore import Signal
 from custom_utils.PydanticFormWidget import PydanticFormWidget
+from custom_utils import metrics
 
 from Model import JigDynamic
 
@@ -17,7 +18,16 @@ logger = logging.getLogger(__name__)
 class JigDialog(QDialog):
     JigUpdate = Signal(int)
 
-    def __init__(self, parent=None, proxy_model=None, proxy_row_index=None, datas=None):
+    @metrics.timed("dialog.JigDialog")
+    def __init__(
+        self,
+        parent=None,
+        proxy_model=None,
+        proxy_row_index=None,
+        datas=None,
+        columns=None,
+        commit_handler=None,
+    ):
         super().__init__(parent)
         logger.info("初始化JigDialog对话框")
         self.setWindowTitle("添加治具")
@@ -33,6 +43,8 @@ class JigDialog(QDialog):
             parent=self,
             proxy_model=proxy_model,
             proxy_row_index=proxy_row_index,
+            columns=columns,
+            commit_handler=commit_handler,
         )
         self.mainlayout.addWidget(self.form)
 
@@ -0,0 +1,172 @@
+import sys
+import os
+import shutil
+import logging
+
+from PySide6.QtWidgets import (
+    QApplication,
+    QDialog,
+    QComboBox,
+    QSpinBox,
+    QLabel,
+    QMessageBox,
+    QFileDialog,
+    QPushButton,
+    QFormLayout,
+    QVBoxLayout,
+    QHBoxLayout,
+)
+from PySide6.QtCore import Qt, QUrl
+from PySide6.QtGui import QDesktopServices
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from custom_utils import db, metrics
+from custom_utils.jiglogger import user_context_filter
+from custom_utils.reports import REPORTS, ReportError, generate, send_digest
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class ReportDialog(QDialog):
+    """
+    审核报表：选择报表和参数，生成 HTML / PDF，或把摘要发到邮箱
+
+    :param settings: custom_utils.settings.AppSettings
+    :param db_path: 数据库路径
+    :param email: 登录用户的邮箱，摘要发给自己
+    :param mail_worker: custom_utils.outbox.OutboxWorker，为 None 时不能发送摘要
+    """
+
+    @metrics.timed("dialog.ReportDialog")
+    def __init__(
+        self,
+        settings,
+        parent=None,
+        db_path=db.jig_db_path,
+        email=None,
+        mail_worker=None,
+    ):
+        super().__init__(parent)
+        self.setWindowTitle(self.tr("报表"))
+        self.settings = settings
+        self.db_path = db_path
+        self.email = email
+        self.mail_worker = mail_worker
+
+        self.mainLayout = QVBoxLayout()
+        self.setLayout(self.mainLayout)
+
+        form = QFormLayout()
+        self.combo_report = QComboBox()
+        for report in REPORTS.values():
+            self.combo_report.addItem(report.title, report.name)
+        self.combo_report.currentIndexChanged.connect(self.updateParams)
+        form.addRow(self.tr("报表："), self.combo_report)
+        self.spin_days = QSpinBox()
+        self.spin_days.setRange(0, 3650)
+        self.spin_days.setValue(settings.check.warn_days)
+        self.spin_days.setSuffix(self.tr(" 天内到期"))
+        form.addRow(self.tr("范围："), self.spin_days)
+        self.mainLayout.addLayout(form)
+
+        btnLayout = QHBoxLayout()
+        self.btn_preview = QPushButton(self.tr("预览"))
+        self.btn_preview.clicked.connect(self.preview)
+        btnLayout.addWidget(self.btn_preview)
+        self.btn_save = QPushButton(self.tr("保存"))
+        self.btn_save.clicked.connect(self.save)
+        btnLayout.addWidget(self.btn_save)
+        self.btn_digest = QPushButton(self.tr("发送摘要"))
+        self.btn_digest.setToolTip(
+            self.tr("把以下报表的摘要发到自己的邮箱：")
+            + ", ".join(settings.reports.digest_names)
+        )
+        self.btn_digest.setEnabled(bool(mail_worker and email))
+        self.btn_digest.clicked.connect(self.sendDigest)
+        btnLayout.addWidget(self.btn_digest)
+        self.btn_close = QPushButton(self.tr("关闭"))
+        self.btn_close.clicked.connect(self.close)
+        btnLayout.addWidget(self.btn_close)
+        self.mainLayout.addLayout(btnLayout)
+
+        self.updateParams()
+
+    def reportName(self) -> str:
+        return self.combo_report.currentData()
+
+    def params(self) -> dict:
+        if self.spin_days.isEnabled():
+            return {"days": self.spin_days.value()}
+        return {}
+
+    def updateParams(self):
+        """只有用到 :days 参数的报表才能设置范围"""
+        self.spin_days.setEnabled(":days" in REPORTS[self.reportName()].sql)
+
+    def generate(self, fmt: str):
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            return generate(
+                self.reportName(),
+                self.params(),
+                fmt,
+                db_path=self.db_path,
+                template_path=self.templatePath(),
+            )
+        except ReportError as e:
+            QMessageBox.warning(self, self.tr("报表"), str(e))
+            return None
+        finally:
+            QApplication.restoreOverrideCursor()
+
+    def templatePath(self):
+        template = self.settings.reports.template
+        return os.path.join(db.root_path, template) if template else None
+
+    def preview(self):
+        """在浏览器中打开 HTML 报表"""
+        path = self.generate("html")
+        if path:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+
+    def save(self):
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            self.tr("保存报表"),
+            self.combo_report.currentText(),
+            "HTML Files (*.html);;PDF Files (*.pdf)",
+        )
+        if not file_path:
+            return
+        fmt = "pdf" if selected_filter.startswith("PDF") else "html"
+        if not file_path.lower().endswith("." + fmt):
+            file_path += "." + fmt
+        path = self.generate(fmt)
+        if path:
+            shutil.copyfile(path, file_path)
+            QMessageBox.information(
+                self, self.tr("报表"), self.tr("报表已保存至：\n") + file_path
+            )
+
+    def sendDigest(self):
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            send_digest(
+                self.mail_worker,
+                from_addr=self.email,
+                to_addr=self.email,
+                user_id=user_context_filter.current_user,
+                names=self.settings.reports.digest_names,
+                params=self.params(),
+                max_rows=self.settings.reports.digest_rows,
+                db_path=self.db_path,
+            )
+        except ReportError as e:
+            QMessageBox.warning(self, self.tr("报表"), str(e))
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        QMessageBox.information(
+            self, self.tr("报表"), self.tr("摘要已加入发件箱，将在后台发送")
+        )
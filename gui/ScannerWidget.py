@@ -0,0 +1,95 @@
+import sys
+import os
+import time
+import logging
+
+from PySide6.QtWidgets import (
+    QWidget,
+    QLabel,
+    QLineEdit,
+    QComboBox,
+    QGroupBox,
+    QVBoxLayout,
+)
+from PySide6.QtCore import Signal
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from custom_utils.repository import (
+    JigLimitError,
+    JigRepository,
+    JigRepositoryError,
+    SCAN_AUTO,
+    SCAN_CHECKOUT,
+    SCAN_RETURN,
+)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class ScannerWidget(QGroupBox):
+    """
+    扫码取用/归还
+
+    扫码枪以键盘方式输入编号并回车，一次扫码即完成操作，不弹出对话框。
+    使用次数已达上限时不取用，在 FORCE_WINDOW 秒内再次扫同一编号视为确认。
+    """
+
+    # 操作完成后发出治具 id，主窗口据此刷新表格
+    jigChanged = Signal(int)
+
+    MODES = {"自动": SCAN_AUTO, "取用": SCAN_CHECKOUT, "归还": SCAN_RETURN}
+    FORCE_WINDOW = 10
+
+    def __init__(self, repository: JigRepository, parent=None):
+        super().__init__(self.tr("扫码"), parent)
+        self.repository = repository
+        self._pending_force = None  # (编号, 时间)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        self.combo_mode = QComboBox()
+        self.combo_mode.addItems(list(self.MODES))
+        layout.addWidget(self.combo_mode)
+        self.edit_code = QLineEdit()
+        self.edit_code.setPlaceholderText(self.tr("扫描治具编号"))
+        self.edit_code.returnPressed.connect(self.on_scanned)
+        layout.addWidget(self.edit_code)
+        self.label_result = QLabel()
+        self.label_result.setWordWrap(True)
+        layout.addWidget(self.label_result)
+
+    def on_scanned(self):
+        code = self.edit_code.text().strip()
+        self.edit_code.clear()
+        if not code:
+            return
+        force = (
+            self._pending_force is not None
+            and self._pending_force[0] == code
+            and time.monotonic() - self._pending_force[1] < self.FORCE_WINDOW
+        )
+        self._pending_force = None
+        mode = self.MODES[self.combo_mode.currentText()]
+        try:
+            action, record = self.repository.scan(code, mode, force=force)
+        except JigLimitError as e:
+            self._pending_force = (code, time.monotonic())
+            self.show_result(f"{code}：{e}" + self.tr("再次扫描以确认取用"), ok=False)
+            return
+        except JigRepositoryError as e:
+            self.show_result(f"{code}：{e}", ok=False)
+            return
+        except Exception as e:
+            logger.error(f"扫码处理失败: {e}", exc_info=True)
+            self.show_result(f"{code}：{e}", ok=False)
+            return
+
+        verb = self.tr("已取用") if action == SCAN_CHECKOUT else self.tr("已归还")
+        self.show_result(f"{verb} {record.no} {record.name}", ok=True)
+        self.jigChanged.emit(record.id)
+
+    def show_result(self, text: str, ok: bool):
+        color = "green" if ok else "red"
+        self.label_result.setStyleSheet(f"color: {color}")
+        self.label_result.setText(text)
@@ -16,6 +16,9 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, Signal
 
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from custom_utils import metrics
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -38,6 +41,7 @@ class SettingsDlg(QDialog):
 
     updateConfig = Signal(configparser.ConfigParser)
 
+    @metrics.timed("dialog.SettingsDlg")
     def __init__(self, config: configparser.ConfigParser, parent=None):
         super().__init__(parent)
 
@@ -0,0 +1,109 @@
+import sys
+import os
+import logging
+from PySide6.QtWidgets import (
+    QApplication,
+    QDialog,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QCheckBox,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+)
+from PySide6.QtCore import Qt, QTimer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from custom_utils import metrics
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class StatsDialog(QDialog):
+    """
+    性能统计窗口：按操作显示次数和耗时分布（毫秒）
+    """
+
+    HEADERS = ["操作", "用户", "次数", "平均", "p50", "p95", "p99", "最大"]
+
+    def __init__(self, parent=None, refresh_interval=2000):
+        super().__init__(parent)
+        self.setWindowTitle(self.tr("性能统计"))
+        self.resize(800, 400)
+
+        self.mainLayout = QVBoxLayout()
+        self.setLayout(self.mainLayout)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSectionResizeMode(
+            0, QHeaderView.ResizeMode.Stretch
+        )
+        self.mainLayout.addWidget(self.table)
+
+        btnLayout = QHBoxLayout()
+        self.check_byuser = QCheckBox(self.tr("按用户统计"))
+        self.check_byuser.toggled.connect(self.refresh)
+        btnLayout.addWidget(self.check_byuser)
+        btnLayout.addStretch()
+        self.btn_refresh = QPushButton(self.tr("刷新"))
+        self.btn_refresh.clicked.connect(self.refresh)
+        btnLayout.addWidget(self.btn_refresh)
+        self.btn_reset = QPushButton(self.tr("清零"))
+        self.btn_reset.clicked.connect(self.reset)
+        btnLayout.addWidget(self.btn_reset)
+        self.btn_close = QPushButton(self.tr("关闭"))
+        self.btn_close.clicked.connect(self.close)
+        btnLayout.addWidget(self.btn_close)
+        self.mainLayout.addLayout(btnLayout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_interval)
+
+        self.refresh()
+
+    def refresh(self):
+        rows = metrics.registry.snapshot(by_user=self.check_byuser.isChecked())
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            values = [row["name"], row["user"], row["count"]]
+            if row["kind"] == "timer":
+                values += [
+                    row["avg"],
+                    row["p50"],
+                    row["p95"],
+                    row["p99"],
+                    row["max"],
+                ]
+            for c, value in enumerate(values):
+                item = QTableWidgetItem()
+                if isinstance(value, float):
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(value, 3))
+                else:
+                    item.setData(Qt.ItemDataRole.DisplayRole, value)
+                self.table.setItem(r, c, item)
+            for c in range(len(values), len(self.HEADERS)):
+                self.table.setItem(r, c, QTableWidgetItem(""))
+        self.table.setSortingEnabled(True)
+
+    def reset(self):
+        metrics.registry.reset()
+        logger.info("性能统计已清零")
+        self.refresh()
+
+    def closeEvent(self, arg__1):
+        self.timer.stop()
+        return super().closeEvent(arg__1)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    dlg = StatsDialog()
+    dlg.show()
+    sys.exit(app.exec())
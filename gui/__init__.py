@@ -1,5 +1,21 @@
 from .EnumManageWin import EnumManageWin
 from .JigDialog import JigDialog
 from .SettingsDialog import SettingsDlg
+from .StatsDialog import StatsDialog
+from .DashboardWidget import DashboardWidget
+from .ForecastDialog import ForecastDialog
+from .HistoryDialog import HistoryDialog
+from .FederationDialog import FederationDialog
+from .ReportDialog import ReportDialog
 
-__all__ = ["JigDialog", "EnumManageWin", "SettingsDlg"]
+__all__ = [
+    "JigDialog",
+    "EnumManageWin",
+    "SettingsDlg",
+    "StatsDialog",
+    "DashboardWidget",
+    "ForecastDialog",
+    "HistoryDialog",
+    "FederationDialog",
+    "ReportDialog",
+]
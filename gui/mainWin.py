@@ -2,7 +2,8 @@ import subprocess
 import sys
 import os
 import logging
-from configparser import ConfigParser
+import threading
+from configparser import ConfigParser, Error as ConfigError
 from PySide6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -28,20 +29,61 @@ from PySide6.QtWidgets import (
     QSizePolicy,
     QMessageBox,
     QAbstractItemView,
+    QDockWidget,
 )
-from PySide6.QtGui import QAction
-from PySide6.QtCore import Qt, QSortFilterProxyModel, QPoint, QDate
-from PySide6.QtSql import QSqlDatabase, QSqlTableModel
+from PySide6.QtGui import QAction, QKeySequence
+from PySide6.QtCore import Qt, QSortFilterProxyModel, QPoint, QDate, QTimer, Signal
+from PySide6.QtSql import QSqlDatabase, QSqlQuery, QSqlTableModel
 import pandas as pd
 from rich import inspect
 
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
-from gui import EnumManageWin, JigDialog, SettingsDlg
+from gui import (
+    EnumManageWin,
+    JigDialog,
+    SettingsDlg,
+    StatsDialog,
+    DashboardWidget,
+    ForecastDialog,
+    HistoryDialog,
+    FederationDialog,
+    ReportDialog,
+)
+from gui.ScannerWidget import ScannerWidget
 from Model import JigDynamic, JigType, JigUseStatus
-from custom_utils import Model2SQL
-from custom_utils.ColorModel import ColoredSqlProxyModel, find_column_by_header
+from custom_utils import Model2SQL, db, metrics
+from custom_utils.backup import BackupScheduler
+from custom_utils.columnar import FORMATS, AnalyticsScheduler, export_table
+from custom_utils.commands import (
+    DeleteJigsCommand,
+    EditJigCommand,
+    InsertJigCommand,
+    StatusCommand,
+    field_conflicts,
+)
+from custom_utils.counters import CounterService
+from custom_utils.settings import WatchSettings
+from custom_utils.watchfolder import FolderIngester
+from custom_utils.maintenance import MaintenanceScheduler, prepare_database
+from custom_utils.dashboard import install_dashboard
+from custom_utils.federation import Federation
+from custom_utils.history import install_history
+from custom_utils.snapshot import SnapshotManager
+from custom_utils.sync import SyncError, SyncScheduler, install_sync, station_name
+from custom_utils.repository import (
+    JigRepository,
+    JigRepositoryError,
+    JigLimitError,
+    STATUS_MESSAGES,
+)
+from custom_utils.ColorModel import ColoredSqlProxyModel
+from custom_utils.columns import get_registry
+from custom_utils.ColumnSizer import ColumnSizer
+from custom_utils.TimedSqlModel import TimedSqlTableModel
+from custom_utils.SettingsWatcher import SettingsWatcher
+from custom_utils.UndoStack import JigUndoStack
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -56,14 +98,18 @@ else:
     root_path = os.path.join(root_path, "..")
 root_path = os.path.abspath(root_path)
 data_path = os.path.join(root_path, "datas")
+config_path = os.path.join(root_path, "config.ini")
 
 
+@metrics.timed("export.table")
 def export_table_to_file(
     parent,
     model,
     view=None,  # 新增：传入 QTableView 以获取选中行
     export_selection_only=False,  # 是否只导出行
     file_filter="CSV Files (*.csv);;Excel Files (*.xlsx);;Text Files (*.txt)",
+    db_path=None,
+    id_column=-1,
 ):
     """
     导出表格数据，支持全部或仅选中行。
@@ -73,6 +119,8 @@ def export_table_to_file(
     :param view: QTableView（用于获取选中行，当 export_selection_only=True 时必需）
     :param export_selection_only: 是否只导出选中行
     :param file_filter: 文件类型过滤器
+    :param db_path: 治具数据库路径，提供时可导出带类型的 Parquet / Arrow 文件
+    :param id_column: model 中 id 所在的列，列式导出按 id 从数据库读取这些行
     """
     if not model or model.rowCount() == 0:
         QMessageBox.warning(parent, "导出失败", "表格无数据")
@@ -91,6 +139,10 @@ def export_table_to_file(
         # 导出所有行
         selected_rows = list(range(model.rowCount()))
 
+    columnar = db_path is not None and id_column >= 0
+    if columnar:
+        file_filter += ";;Parquet Files (*.parquet);;Arrow Files (*.arrow)"
+
     # 弹出保存对话框
     file_path, selected_filter = QFileDialog.getSaveFileName(
         parent, "导出表格数据", "", file_filter
@@ -106,10 +158,28 @@ def export_table_to_file(
             file_path += ".csv"
         elif selected_filter.startswith("Text") and not file_path.endswith(".txt"):
             file_path += ".txt"
+        elif selected_filter.startswith("Parquet") and not file_path.endswith(
+            ".parquet"
+        ):
+            file_path += ".parquet"
+        elif selected_filter.startswith("Arrow") and not file_path.endswith(".arrow"):
+            file_path += ".arrow"
+
+        if columnar and os.path.splitext(file_path)[1].lower() in FORMATS:
+            # 列式格式直接从数据库按类型读取，表格中的行只用来确定 id 和顺序
+            ids = [model.data(model.index(row, id_column)) for row in selected_rows]
+            export_table(db_path, file_path, ids=ids)
+            QMessageBox.information(parent, "导出成功", f"数据已保存至：\n{file_path}")
+            return
 
-        # 提取表头
+        # 提取表头（跳过视图中隐藏的列）
+        columns = [
+            col
+            for col in range(model.columnCount())
+            if not (view and view.isColumnHidden(col))
+        ]
         headers = []
-        for col in range(model.columnCount()):
+        for col in columns:
             header = model.headerData(col, Qt.Horizontal)
             headers.append(str(header) if header is not None else f"Column {col}")
 
@@ -117,7 +187,7 @@ def export_table_to_file(
         data = []
         for row in selected_rows:
             row_data = []
-            for col in range(model.columnCount()):
+            for col in columns:
                 index = model.index(row, col)
                 value = model.data(index, Qt.DisplayRole)
                 row_data.append(value if value is not None else "")
@@ -147,6 +217,16 @@ def init_config(config_path):
     config.add_section("校验")
     config.add_section("使用次数")
     config.add_section("单次校验可使用次数")
+    config.add_section("登录")
+    config.add_section("备份")
+    config.add_section("维护")
+    config.add_section("站点")
+    config.add_section("同步")
+    config.add_section("只读快照")
+    config.add_section("分析快照")
+    config.add_section("报表")
+    config.add_section("使用计数")
+    config.add_section("日志监视")
 
     config["颜色"]["警告"] = "orange"
     config["颜色"]["严重警告"] = "red"
@@ -156,58 +236,186 @@ def init_config(config_path):
     config["使用次数"]["剩余多少次严重警告"] = "10"
     config["单次校验可使用次数"]["剩余多少次警告"] = "50"
     config["单次校验可使用次数"]["剩余多少次严重警告"] = "10"
+    config["登录"]["会话有效小时数"] = "12"
+    config["登录"]["验证超时秒数"] = "15"
+    config["备份"]["启用"] = "是"
+    config["备份"]["间隔小时数"] = "4"
+    config["备份"]["保留份数"] = "42"
+    config["备份"]["目录"] = "backups"
+    config["备份"]["每步页数"] = "256"
+    config["备份"]["步间隔毫秒"] = "10"
+    config["维护"]["启用"] = "是"
+    config["维护"]["间隔分钟数"] = "60"
+    config["维护"]["wal模式"] = "否"
+    config["维护"]["wal上限mb"] = "64"
+    config["维护"]["空闲页百分比"] = "10"
+    config["维护"]["每次回收页数"] = "500"
+    config["维护"]["行数变化百分比"] = "20"
+    config["同步"]["启用"] = "否"
+    config["同步"]["中心数据库"] = ""
+    config["同步"]["站点名"] = ""
+    config["同步"]["间隔秒数"] = "60"
+    config["同步"]["冲突规则"] = "字段"
+    config["同步"]["每批条数"] = "500"
+    config["只读快照"]["启用"] = "是"
+    config["只读快照"]["刷新秒数"] = "120"
+    config["只读快照"]["目录"] = ""
+    config["只读快照"]["副本"] = ""
+    config["只读快照"]["每步页数"] = "256"
+    config["只读快照"]["步间隔毫秒"] = "5"
+    config["分析快照"]["启用"] = "否"
+    config["分析快照"]["间隔小时数"] = "24"
+    config["分析快照"]["目录"] = "analytics"
+    config["分析快照"]["格式"] = "parquet"
+    config["分析快照"]["保留份数"] = "30"
+    config["分析快照"]["每批行数"] = "65536"
+    config["报表"]["模板"] = ""
+    config["报表"]["摘要报表"] = "expiring,scrapped"
+    config["报表"]["摘要行数"] = "50"
+    config["使用计数"]["启用"] = "否"
+    config["使用计数"]["地址"] = "127.0.0.1"
+    config["使用计数"]["端口"] = "47017"
+    config["使用计数"]["写入间隔秒数"] = "5"
+    config["使用计数"]["日志目录"] = "datas/counters"
+    config["使用计数"]["单次上限"] = "1000"
+    config["日志监视"]["启用"] = "否"
+    config["日志监视"]["目录"] = ""
+    config["日志监视"]["文件名"] = "*.log"
+    config["日志监视"]["匹配"] = WatchSettings().regex
+    config["日志监视"]["编码"] = "utf-8"
+    config["日志监视"]["轮询秒数"] = "2"
+    config["日志监视"]["写入间隔秒数"] = "2"
+    config["日志监视"]["读取已有文件"] = "否"
     with open(config_path, "w", encoding="utf-8") as f:
         config.write(f, space_around_delimiters=False)
 
 
 def read_settings():
     config = ConfigParser()
-    config_path = os.path.join(root_path, "config.ini")
     if not os.path.exists(config_path):
         init_config(config_path)
 
-    config.read(config_path, encoding="utf-8")
+    try:
+        config.read(config_path, encoding="utf-8")
+    except ConfigError as e:
+        # 其他工位保存了格式错误的配置：类型化配置沿用之前的值（见 load_settings），这里不中断启动
+        logger.error(f"配置文件格式错误: {e}")
 
     return config
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, user_role: str, email=None):
+    # 同步线程采纳了其他站点的修改（跨线程，排队到界面线程）
+    syncApplied = Signal(int)
+    # 后台生成的只读快照（路径，失败时为空），排队到界面线程切换
+    snapshotReady = Signal(str)
+    # 已切换到新快照
+    snapshotRefreshed = Signal()
+    # 测试工位上报的使用次数已写入（跨线程，排队到界面线程）
+    countersFlushed = Signal(int)
+
+    def __init__(self, user_role: str, email=None, mail_worker=None):
         super().__init__()
         logger.info("开始初始化主窗口")
         self.setWindowTitle(self.tr("治具管理系统"))
         self.resize(800, 600)
 
         self.config = read_settings()
+        # 类型化配置，文件被其他工位修改时自动重新加载
+        self.settings_watcher = SettingsWatcher(config_path, self)
+        self.settings = self.settings_watcher.settings
 
         self.db_name = os.path.join(data_path, "jig.db")
         self.user_role = user_role
+        # 访客等只读角色：不能修改治具信息，浏览使用只读快照
+        self.readonly = user_role not in ["user", "admin"]
         self.email = email
+        # 后台邮件投递（OutboxWorker），通知类邮件通过它发送
+        self.mail_worker = mail_worker
+        # 后台任务 [(配置节, 任务)]：只读角色不启动，浏览站点不在在线库上加锁
+        self.background_tasks = []
+        self.backup_scheduler = None
+        self.maintenance_scheduler = None
+        self.analytics_scheduler = None
+        self.sync_scheduler = None
+        self.counter_service = None
+        self.folder_ingester = None
+        if not self.readonly:
+            # 定时在线备份，与界面线程互不阻塞
+            self.backup_scheduler = BackupScheduler(self.settings.backup)
+            # 定时存储维护：增量回收、按需 ANALYZE、WAL 检查点
+            self.maintenance_scheduler = MaintenanceScheduler(self.settings.maintenance)
+            # 定时导出完整库存的 Parquet / Arrow 分析快照
+            self.analytics_scheduler = AnalyticsScheduler(self.settings.analytics)
+            self.startBackgroundTasks(
+                backup=self.backup_scheduler,
+                maintenance=self.maintenance_scheduler,
+                analytics=self.analytics_scheduler,
+            )
 
         self.setSQLite()
 
         self.setMainMenu()
         self.setMainWidget()
         self.setModel()
+        self.setDashboard()
         self.setTableMenu()
 
         self.setConnect()
-        self.updateSettings()
+        self.color_model.apply_settings(self.settings)
         logger.info("主窗口初始化完成")
         self.getCols()
 
         self.setPermission()
 
+        metrics.registry.start_periodic_dump(
+            os.path.join(root_path, "logs", "metrics.jsonl")
+        )
+
+        if self.readonly:
+            return
+        # 离线站点与中心数据库定时同步，拉取到修改后刷新表格
+        self.syncApplied.connect(self.scheduleReflesh)
+        self.sync_scheduler = SyncScheduler(
+            self.settings.sync, self.syncApplied.emit, self.db_name
+        )
+        # 测试工位上报使用次数，写入后刷新表格，着色按最新的使用次数计算
+        self.countersFlushed.connect(self.scheduleReflesh)
+        self.counter_service = CounterService(
+            self.settings.counters, self.countersFlushed.emit, self.db_name
+        )
+        # 监视测试机日志目录，写入后同样刷新表格
+        self.folder_ingester = FolderIngester(
+            self.settings.watch,
+            lambda result: self.countersFlushed.emit(result.cycles),
+            self.db_name,
+        )
+        self.startBackgroundTasks(
+            sync=self.sync_scheduler,
+            counters=self.counter_service,
+            watch=self.folder_ingester,
+        )
+
+    def startBackgroundTasks(self, **tasks):
+        """启动后台任务，参数名为 AppSettings 中对应的配置节，配置变化时据此更新"""
+        for section, task in tasks.items():
+            task.start()
+            self.background_tasks.append((section, task))
+
+    def stopBackgroundTasks(self):
+        for _, task in self.background_tasks:
+            task.stop()
+
     def getCols(self):
-        self.col_jigname = find_column_by_header(self.agent, "治具名称")
-        self.col_jigtype = find_column_by_header(self.agent, "治具类型")
-        self.col_jigmodel = find_column_by_header(self.agent, "适用机种")
-        self.col_jigno = find_column_by_header(self.agent, "治具编号")
-        self.col_usestatus = find_column_by_header(self.agent, "使用状态")
-        self.col_usecount = find_column_by_header(self.agent, "已使用次数")
-        self.col_usemaxcount = find_column_by_header(self.agent, "最大使用次数")
-        self.col_checkcount = find_column_by_header(self.agent, "单次校验已使用次数")
-        self.col_checkmaxcount = find_column_by_header(self.agent, "单次校验可使用次数")
+        self.col_jigname = self.columns.index("name")
+        self.col_jigtype = self.columns.index("type")
+        self.col_jigmodel = self.columns.index("model")
+        self.col_jigno = self.columns.index("no")
+        self.col_usestatus = self.columns.index("UseStatus")
+        self.col_usecount = self.columns.index("Usedcount")
+        self.col_usemaxcount = self.columns.index("Maxcount")
+        self.col_checkcount = self.columns.index("CheckUsedcount")
+        self.col_checkmaxcount = self.columns.index("CheckMaxcount")
 
     ################### 初始化 #################
     def setConnect(self):
@@ -218,6 +426,7 @@ class MainWindow(QMainWindow):
         self.btn_delete.clicked.connect(self.JigDelete)
         self.btn_getjig.clicked.connect(self.getJig)
         self.btn_returnjig.clicked.connect(self.returnJig)
+        self.scanner.jigChanged.connect(self.scheduleReflesh)
         # self.btn_import.clicked.connect(self.importJig)
         self.btn_exportselect.clicked.connect(self.on_export_selected_table)
         self.btn_exportall.clicked.connect(self.on_export_all_table)
@@ -234,6 +443,11 @@ class MainWindow(QMainWindow):
         self.action_getjig.triggered.connect(self.getJig)
         self.action_returnjig.triggered.connect(self.returnJig)
         self.action_settings.triggered.connect(self.show_settings)
+        self.action_stats.triggered.connect(self.show_stats)
+        self.action_forecast.triggered.connect(self.show_forecast)
+        self.action_federation.triggered.connect(self.show_federation)
+        self.action_reports.triggered.connect(self.show_reports)
+        self.action_resetwidths.triggered.connect(self.column_sizer.reset_user_widths)
 
         self.edit_makedate_st.dateChanged.connect(self.updataFilterDate)
         self.edit_makedate_ed.dateChanged.connect(self.updataFilterDate)
@@ -243,6 +457,11 @@ class MainWindow(QMainWindow):
         self.Combo_jigtype.currentTextChanged.connect(self.applyAllFilters)
         self.checkbox_group.buttonClicked.connect(self.applyAllFilters)
 
+        self.settings_watcher.settingsChanged.connect(self.applySettings)
+
+        self.undo_stack.flushed.connect(self.scheduleReflesh)
+        self.undo_stack.flushFailed.connect(self.on_command_failed)
+
     def setSQLite(self):
         if not os.path.exists(self.db_name):
             db_dir = os.path.dirname(self.db_name)
@@ -256,14 +475,65 @@ class MainWindow(QMainWindow):
                 recreate=True,
             )
 
+        # 只读角色不修改在线库的结构和日志模式，由用户/管理员的工位或 jigctl migrate 安装
+        if not self.readonly:
+            self.installDatabase()
+
         self.db = QSqlDatabase.addDatabase("QSQLITE")
-        self.db.setDatabaseName(self.db_name)
-        logger.debug(f"设置数据库连接: {self.db_name}")
+        self.snapshot = None
+        if self.readonly and self.settings.snapshot.enabled:
+            # 只读角色从本地快照浏览，浏览和筛选不在在线库上加锁
+            self.snapshot = SnapshotManager(self.db_name, self.settings.snapshot)
+            self.snapshot.refresh()
+            self.db.setConnectOptions("QSQLITE_OPEN_READONLY;QSQLITE_OPEN_URI")
+            self.db.setDatabaseName(self.snapshot.uri())
+        else:
+            self.db.setDatabaseName(self.db_name)
+        logger.debug(f"设置数据库连接: {self.db.databaseName()}")
         if not self.db.open():
             err = "Error: ", self.db.lastError().text()
             logger.error(f"数据库连接失败: {err}")
             raise Exception(err)
         logger.info("数据库连接成功")
+        if self.snapshot is not None:
+            self.warmSnapshot()
+            self._snapshotBusy = False
+            self._snapshotPending = False
+            self.snapshotReady.connect(self.swapSnapshot)
+            self.snapshotTimer = QTimer(self)
+            self.snapshotTimer.setInterval(
+                int(self.settings.snapshot.refresh_seconds * 1000)
+            )
+            self.snapshotTimer.timeout.connect(self.refreshSnapshot)
+            self.snapshotTimer.start()
+
+        # 取用/归还和扫码直接操作数据库，不经过表格模型
+        self.repository = JigRepository(self.db_name, install_schema=not self.readonly)
+        # 新增、修改、删除和取用/归还记入撤销栈，写入合并后统一提交
+        self.undo_stack = JigUndoStack(
+            self.db_name, self, install_schema=not self.readonly
+        )
+
+    def installDatabase(self):
+        """设置日志模式，安装由触发器维护的汇总表、修改记录和同步"""
+        # 日志模式需要在打开其他连接之前设置
+        for path in (self.db_name, db.enum_db_path):
+            if os.path.exists(path):
+                prepare_database(path, self.settings.maintenance)
+
+        # 概览汇总表和修改记录由触发器维护，需要在任何写入之前安装
+        conn = db.connect(self.db_name)
+        try:
+            install_dashboard(conn)
+            install_history(conn)
+            if self.settings.sync.enabled:
+                # 同步触发器要在任何本地写入之前安装，否则修改不会被推送
+                conn.isolation_level = None
+                install_sync(conn, station_name(self.settings.sync))
+        except SyncError as e:
+            logger.error(f"无法启用同步: {e}")
+        finally:
+            conn.close()
 
     def setMainWidget(self):
         self.centralWidget = QWidget()
@@ -290,6 +560,8 @@ class MainWindow(QMainWindow):
         self.controlLayout.addWidget(self.btn_getjig)
         self.btn_returnjig = QPushButton(self.tr("归还治具"))
         self.controlLayout.addWidget(self.btn_returnjig)
+        self.scanner = ScannerWidget(self.repository)
+        self.controlLayout.addWidget(self.scanner)
         line2 = QFrame()
         line2.setFrameShape(QFrame.Shape.HLine)
         line2.setFrameShadow(QFrame.Shadow.Sunken)
@@ -406,12 +678,21 @@ class MainWindow(QMainWindow):
         self.action_alter = QAction(self.tr("修改"))
         self.action_alter.setShortcut("Ctrl+M")
         self.action_delete = QAction(self.tr("删除"))
+        self.action_undo = self.undo_stack.createUndoAction(self, self.tr("撤销"))
+        self.action_undo.setShortcut(QKeySequence.StandardKey.Undo)
+        self.action_redo = self.undo_stack.createRedoAction(self, self.tr("重做"))
+        self.action_redo.setShortcut(QKeySequence.StandardKey.Redo)
         self.action_delete.setShortcut("Ctrl+D")
 
         self.menu_option = self.menu.addMenu(self.tr("选项"))
         self.action_jigtype = QAction(self.tr("治具类型管理"))
         self.action_initdb = QAction(self.tr("初始化数据库"))
         self.action_settings = QAction(self.tr("设置"))
+        self.action_stats = QAction(self.tr("性能统计"))
+        self.action_resetwidths = QAction(self.tr("恢复默认列宽"))
+        self.action_forecast = QAction(self.tr("寿命预测"))
+        self.action_federation = QAction(self.tr("全厂库存"))
+        self.action_reports = QAction(self.tr("报表"))
 
         self.action_getjig = QAction(self.tr("取用治具"))
         self.menu.addAction(self.action_getjig)
@@ -430,9 +711,17 @@ class MainWindow(QMainWindow):
         self.menu_operation.addAction(self.action_add)
         self.menu_operation.addAction(self.action_alter)
         self.menu_operation.addAction(self.action_delete)
+        self.menu_operation.addSeparator()
+        self.menu_operation.addAction(self.action_undo)
+        self.menu_operation.addAction(self.action_redo)
         self.menu_option.addAction(self.action_jigtype)
         # self.menu_option.addAction(self.action_initdb) # 不建议初始化数据库
         self.menu_option.addAction(self.action_settings)
+        self.menu_option.addAction(self.action_forecast)
+        self.menu_option.addAction(self.action_federation)
+        self.menu_option.addAction(self.action_reports)
+        self.menu_option.addAction(self.action_stats)
+        self.menu_option.addAction(self.action_resetwidths)
         self.setMenuWidget(self.menu)
 
     def setTableMenu(self):
@@ -447,8 +736,11 @@ class MainWindow(QMainWindow):
         self.tableMenu.addAction(self.action_copy)
         self.tableMenu.addAction(self.action_getjig)
         self.tableMenu.addAction(self.action_returnjig)
+        self.action_history = QAction(self.tr("修改记录"))
+        self.tableMenu.addAction(self.action_history)
 
-        self.action_reflesh.triggered.connect(self.reflesh)
+        self.action_reflesh.triggered.connect(self.refleshLatest)
+        self.action_history.triggered.connect(self.show_history)
         self.action_copy.triggered.connect(self.rowCopy)
 
         self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
@@ -464,21 +756,22 @@ class MainWindow(QMainWindow):
 
     def setModel(self):
         # 数据模型
-        self.model = QSqlTableModel(self, self.db)
+        self.model = TimedSqlTableModel(self, self.db)
         self.model.setTable("Jig")
         self.model.select()
 
-        # 设置表头显示名称为Pydantic模型中的title
-        for i, field_name in enumerate(JigDynamic.model_fields.keys()):
-            field_info = JigDynamic.model_fields[field_name]
-            # 设置表头显示名称为Pydantic模型中的title
-            field_title = field_info.title or field_name
-            self.model.setHeaderData(i, Qt.Orientation.Horizontal, field_title)
+        # 扫码等外部修改后延迟刷新，连续操作只刷新一次
+        self.refleshTimer = QTimer(self)
+        self.refleshTimer.setSingleShot(True)
+        self.refleshTimer.setInterval(300)
+        self.refleshTimer.timeout.connect(self.refleshLatest)
+
+        # 列注册表：按数据库实际列顺序映射字段名、列索引和标题
+        self.columns = get_registry(self.db_name, model_class=JigDynamic)
 
         # 颜色模型
         self.color_model = ColoredSqlProxyModel()
         self.color_model.setSourceModel(self.model)
-        self.color_model.get_column_indices()
 
         # 代理模型
         self.agent = QSortFilterProxyModel()
@@ -488,24 +781,58 @@ class MainWindow(QMainWindow):
         # 表格视图
         self.table = QTableView()
         self.table.setModel(self.agent)
+        self.applyColumns()
         self.table.setSortingEnabled(True)
         # 禁止在表格中修改
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        # 设置表格拉伸
-        self.table.horizontalHeader().setSectionResizeMode(
-            QHeaderView.ResizeMode.ResizeToContents
-        )
-        self.table.verticalHeader().setSectionResizeMode(
-            QHeaderView.ResizeMode.ResizeToContents
+        # 列宽：抽样测量，保存用户调整过的列宽，行高固定
+        self.column_sizer = ColumnSizer(
+            self.table, os.path.join(data_path, "column_widths.json")
         )
 
         self.dataLayout.addWidget(self.table)
 
+    def applyColumns(self):
+        """按列注册表设置表头、隐藏模型外的列并更新着色列"""
+        for i, field_name in enumerate(self.columns.fields):
+            # 设置表头显示名称为Pydantic模型中的title
+            self.model.setHeaderData(
+                i, Qt.Orientation.Horizontal, self.columns.title(field_name)
+            )
+            self.table.setColumnHidden(i, not self.columns.is_model_field(field_name))
+        self.color_model.get_column_indices(self.columns)
+
+    def refreshColumns(self):
+        """表结构变化时重建列注册表"""
+        columns = get_registry(self.db_name, model_class=JigDynamic)
+        if columns is self.columns:
+            return
+        logger.info("数据库表结构已变化，重新加载列")
+        self.columns = columns
+        # QSqlTableModel 需要重新读取表结构，setTable 会清空筛选条件
+        current_filter = self.model.filter()
+        self.model.setTable("Jig")
+        self.model.setFilter(current_filter)
+        self.model.select()
+        self.applyColumns()
+        self.getCols()
+
+    def setDashboard(self):
+        self.dashboard = DashboardWidget(self.db_name)
+        self.dashboardDock = QDockWidget(self.tr("库存概览"), self)
+        self.dashboardDock.setObjectName("dashboardDock")
+        self.dashboardDock.setWidget(self.dashboard)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.dashboardDock)
+        self.dashboardDock.hide()
+        self.menu_option.addAction(self.dashboardDock.toggleViewAction())
+
     def setPermission(self):
-        if self.user_role not in ["user", "admin"]:
+        if self.readonly:
             self.action_add.setEnabled(False)
             self.action_alter.setEnabled(False)
             self.action_delete.setEnabled(False)
+            self.action_undo.setEnabled(False)
+            self.action_redo.setEnabled(False)
             self.action_jigtype.setEnabled(False)
             self.action_import.setEnabled(False)
             self.btn_add.setEnabled(False)
@@ -563,7 +890,9 @@ class MainWindow(QMainWindow):
 
     ############## 添加、修改、删除 ##############
     def JigAdd(self):
-        self.addDialog = JigDialog(self, self.color_model)
+        self.addDialog = JigDialog(
+            self, self.color_model, columns=self.columns, commit_handler=self.commitJig
+        )
         self.addDialog.JigUpdate.connect(self.JigUpdate)
         self.addDialog.show()
 
@@ -576,7 +905,13 @@ class MainWindow(QMainWindow):
         proxy_row_index = self.agent.mapToSource(
             self.table.selectionModel().selectedIndexes()[0]
         ).row()
-        self.alertDialog = JigDialog(self, self.color_model, proxy_row_index)
+        self.alertDialog = JigDialog(
+            self,
+            self.color_model,
+            proxy_row_index,
+            columns=self.columns,
+            commit_handler=self.commitJig,
+        )
         self.alertDialog.setWindowTitle("修改治具")
         self.alertDialog.JigUpdate.connect(self.JigUpdate)
         self.alertDialog.show()
@@ -604,22 +939,67 @@ class MainWindow(QMainWindow):
             if source_index.isValid():
                 source_rows.add(source_index.row())
 
-        source_rows = sorted(source_rows, reverse=True)
-
-        # 批量删除
-        for row in source_rows:
-            self.model.removeRow(row)
+        col_id = self.columns.index("id")
+        ids = [self.model.data(self.model.index(row, col_id)) for row in source_rows]
 
-        # 一次性提交
-        if not self.model.submitAll():
-            error = self.model.lastError().text()
-            QMessageBox.critical(self, "删除失败", f"数据库错误：{error}")
-            self.model.revertAll()
+        # 保存整行，撤销时按原 id 恢复
+        rows = self.undo_stack.current(ids)
+        if not rows:
+            QMessageBox.warning(self, "提示", "选中的记录已被删除")
+            self.scheduleReflesh()
             return
+        self.undo_stack.pushCommand(DeleteJigsCommand(rows))
 
         QMessageBox.information(self, "成功", "记录已成功删除")
         self.table.clearSelection()
 
+    def commitJig(self, data, base=None):
+        """
+        新增/修改对话框的提交：记为可撤销的命令
+
+        修改时与对话框打开时的行比较，他人在此期间改了相同的字段时列出差异，确认后才覆盖。
+
+        :param data: 表单数据（修改时只含改过的字段）
+        :param base: 修改时为对话框加载的整行，新增时为 None
+        """
+        if base is None:
+            self.undo_stack.pushCommand(InsertJigCommand(data))
+            return True
+        rows = self.undo_stack.current([base["id"]])
+        if not rows:
+            QMessageBox.warning(self, "提示", "治具已被删除")
+            return False
+        conflicts = field_conflicts(base, rows[0], data)
+        if conflicts and not self.confirmOverwrite(conflicts):
+            return False
+        command = EditJigCommand.from_row(rows[0], data)
+        if command is not None:
+            self.undo_stack.pushCommand(command)
+        return True
+
+    def confirmOverwrite(self, conflicts) -> bool:
+        """列出字段级差异，询问是否用本次的值覆盖他人的修改"""
+        lines = [
+            f"{self.columns.title(c.field)}: 打开时 {c.base}，"
+            f"他人改为 {c.theirs}，本次改为 {c.mine}"
+            for c in conflicts
+        ]
+        reply = QMessageBox.warning(
+            self,
+            self.tr("修改冲突"),
+            self.tr("以下字段在编辑期间已被其他人修改：")
+            + "\n\n"
+            + "\n".join(lines)
+            + "\n\n"
+            + self.tr("是否用本次的值覆盖？"),
+            buttons=QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            defaultButton=QMessageBox.StandardButton.No,
+        )
+        return reply == QMessageBox.StandardButton.Yes
+
+    def on_command_failed(self, message: str):
+        QMessageBox.warning(self, self.tr("保存失败"), message)
+
     def JigUpdate(self, proxy_row_index=None):
         """
         处理新增或修改后的定位
@@ -628,6 +1008,9 @@ class MainWindow(QMainWindow):
             - 修改时：传入被修改行在代理模型中的行号（int）
             - 新增时：传 None，自动定位到新行
         """
+        if proxy_row_index is None:
+            # 定位新行前先写入
+            self.undo_stack.flush()
         self.reflesh()
 
         if proxy_row_index is not None:
@@ -664,12 +1047,72 @@ class MainWindow(QMainWindow):
         pass
 
     def reflesh(self):
+        self.refreshColumns()
         # 先刷新模型（确保数据同步）
         if self.model:
             self.model.select()  # 从数据库重新加载（可选，若 submitAll 已更新则非必需）
         if self.agent:
             self.agent.invalidate()  # 刷新代理模型（重要！）
 
+    def refleshLatest(self):
+        """读取最新数据；只读快照模式下先生成新快照，切换后再刷新"""
+        if self.snapshot is not None:
+            self.refreshSnapshot(force=True)
+        else:
+            self.reflesh()
+
+    ############## 只读快照 ##############
+    def warmSnapshot(self):
+        """新快照打开后加大缓存并预读治具表，之后的浏览和筛选直接命中缓存"""
+        query = QSqlQuery(self.db)
+        query.exec("PRAGMA cache_size = -65536")
+        query.exec("PRAGMA mmap_size = 268435456")
+        # NOT INDEXED 强制扫描整张表，COUNT(*) 可能只读索引
+        query.exec("SELECT COUNT(name) FROM jig NOT INDEXED")
+
+    def refreshSnapshot(self, force=False):
+        """
+        在线库有修改时在后台生成新快照，完成后由 swapSnapshot 切换
+
+        :param force: 不检查在线库是否有修改（本机取用/归还、扫码之后）
+        """
+        if self.snapshot.replica:
+            # 副本由其他程序更新，以 mode=ro 打开，重新查询即可
+            self.reflesh()
+            return
+        if self._snapshotBusy:
+            self._snapshotPending = True
+            return
+        if not force and not self.snapshot.changed():
+            return
+        self._snapshotBusy = True
+        self._snapshotPending = False
+
+        def work():
+            try:
+                path = self.snapshot.refresh()
+            except Exception as e:
+                logger.error(f"生成只读快照失败: {e}")
+                path = ""
+            self.snapshotReady.emit(path)
+
+        threading.Thread(target=work, name="snapshot", daemon=True).start()
+
+    def swapSnapshot(self, path: str):
+        self._snapshotBusy = False
+        if path:
+            self.db.close()
+            self.db.setDatabaseName(self.snapshot.uri(path))
+            if not self.db.open():
+                logger.error(f"打开只读快照失败: {self.db.lastError().text()}")
+                return
+            self.warmSnapshot()
+            self.reflesh()
+            self.snapshot.prune()
+            self.snapshotRefreshed.emit()
+        if self._snapshotPending:
+            self.refreshSnapshot(force=True)
+
     ############## 设置 ##############
     def show_settings(self):
         self.settings_dialog = SettingsDlg(self.config, self)
@@ -677,154 +1120,181 @@ class MainWindow(QMainWindow):
         self.settings_dialog.updateConfig.connect(self.updateSettings)
         self.settings_dialog.show()
 
+    def show_stats(self):
+        self.stats_dialog = StatsDialog(self)
+        self.stats_dialog.show()
+
+    def show_history(self):
+        jig_id = self.selectedJigId()
+        if jig_id is None:
+            return
+        self.history_dialog = HistoryDialog(jig_id, self.columns, self, self.db_name)
+        self.history_dialog.show()
+
+    def show_forecast(self):
+        self.forecast_dialog = ForecastDialog(self, self.db_name)
+        if self.snapshot is not None:
+            # 预测结果写入在线库，切换到新快照后才能读到
+            self.snapshotRefreshed.connect(self.forecast_dialog.refresh)
+            self.refreshSnapshot(force=True)
+        self.forecast_dialog.show()
+
+    def show_federation(self):
+        """跨站点查询，站点在配置文件的 [站点] 节中设置"""
+        federation = Federation(self.settings.sites, self.db_name)
+        self.federation_dialog = FederationDialog(federation, self.columns, self)
+        self.federation_dialog.finished.connect(self.refleshLatest)
+        self.federation_dialog.show()
+
+    def show_reports(self):
+        self.report_dialog = ReportDialog(
+            self.settings,
+            self,
+            self.exportDbPath(),
+            email=self.email,
+            mail_worker=self.mail_worker,
+        )
+        self.report_dialog.show()
+
     def updateSettings(self, config: ConfigParser = None):
+        """设置窗口保存后立即重新加载，不必等待文件监视"""
         if config:
             self.config = config
-        self.color_model.color_serious = self.config["颜色"]["严重警告"]
-        self.color_model.color_warning = self.config["颜色"]["警告"]
-        self.color_model.count_Usedserious = int(
-            self.config["使用次数"]["剩余多少次严重警告"]
-        )
-        self.color_model.count_Usedwarning = int(
-            self.config["使用次数"]["剩余多少次警告"]
-        )
-        self.color_model.count_Checkserious = int(
-            self.config["单次校验可使用次数"]["剩余多少次严重警告"]
-        )
-        self.color_model.count_Checkwarning = int(
-            self.config["单次校验可使用次数"]["剩余多少次警告"]
-        )
-        self.color_model.date_Checkwarning = int(self.config["校验"]["前多少天警告"])
-        self.model.select()
+        self.settings_watcher.reload()
+
+    def applySettings(self, settings, changed):
+        """配置变化时只重算受影响的着色列，不重新查询表格"""
+        self.settings = settings
+        self.config = read_settings()
+        self.color_model.apply_settings(settings, changed)
+        for section, task in self.background_tasks:
+            task.update(getattr(settings, section))
+        if self.snapshot is not None:
+            self.snapshot.settings = settings.snapshot
+            self.snapshotTimer.setInterval(
+                int(settings.snapshot.refresh_seconds * 1000)
+            )
 
     ############## 导出 ##############
+    def exportDbPath(self):
+        """列式导出读取的数据库：只读快照模式下与表格显示的数据一致"""
+        return self.snapshot.current if self.snapshot is not None else self.db_name
+
     def on_export_all_table(self):
         model = self.table.model()
-        export_table_to_file(self, model)
+        export_table_to_file(
+            self,
+            model,
+            view=self.table,
+            db_path=self.exportDbPath(),
+            id_column=self.columns.index("id"),
+        )
 
     def on_export_selected_table(self):
         model = self.table.model()
-        export_table_to_file(self, model, view=self.table, export_selection_only=True)
+        export_table_to_file(
+            self,
+            model,
+            view=self.table,
+            export_selection_only=True,
+            db_path=self.exportDbPath(),
+            id_column=self.columns.index("id"),
+        )
 
     ############## 治具取出和归还 ##############
+    def selectedJigId(self):
+        """当前选中行的治具 id"""
+        indexes = self.table.selectionModel().selectedIndexes()
+        if not indexes:
+            return None
+        source_row = self.agent.mapToSource(indexes[0]).row()
+        return self.model.data(self.model.index(source_row, self.columns.index("id")))
+
+    def scheduleReflesh(self, *args):
+        """连续扫码时合并表格刷新"""
+        self.refleshTimer.start()
+
     def getJig(self):
         """取出治具"""
-        if self.col_usestatus == -1:
+        self.undo_stack.flush()
+        jig_id = self.selectedJigId()
+        record = self.repository.get(jig_id) if jig_id is not None else None
+        if record is None:
             return
-        proxy_row_index = self.agent.mapToSource(
-            self.table.selectionModel().selectedIndexes()[0]
-        ).row()
-        usestatus_index = self.model.index(proxy_row_index, self.col_usestatus)
-        usestatus = self.model.data(usestatus_index)
-        if usestatus == JigUseStatus.USING.value:
-            QMessageBox.information(self, self.tr("提示"), self.tr("治具在使用中"))
-            return
-        if usestatus == JigUseStatus.ERROR.value:
-            QMessageBox.information(self, self.tr("提示"), self.tr("治具异常"))
-            return
-        if usestatus == JigUseStatus.SCRAP.value:
-            QMessageBox.information(self, self.tr("提示"), self.tr("治具待报废"))
-            return
-        if usestatus == JigUseStatus.UNUSE.value:
-            usecount_index = self.model.index(proxy_row_index, self.col_usecount)
-            usecount = self.model.data(usecount_index)
-            usemaxcount_index = self.model.index(proxy_row_index, self.col_usemaxcount)
-            usemaxcount = self.model.data(usemaxcount_index)
-            checkcount_index = self.model.index(proxy_row_index, self.col_checkcount)
-            checkcount = self.model.data(checkcount_index)
-            checkmaxcount_index = self.model.index(
-                proxy_row_index, self.col_checkmaxcount
-            )
-            checkmaxcount = self.model.data(checkmaxcount_index)
-
-            jigname_index = self.model.index(proxy_row_index, self.col_jigname)
-            jigname = self.model.data(jigname_index)
-            jigno_index = self.model.index(proxy_row_index, self.col_jigno)
-            jigno = self.model.data(jigno_index)
-            jigtype_index = self.model.index(proxy_row_index, self.col_jigtype)
-            jigtype = self.model.data(jigtype_index)
-            jigmodel_index = self.model.index(proxy_row_index, self.col_jigmodel)
-            jigmodel = self.model.data(jigmodel_index)
-            msg = self.tr(
-                f"取用编号为{jigno}的{jigname}，适用于{jigtype}的{jigmodel}机种"
-            )
-            reply = QMessageBox.information(
+        if record.status != JigUseStatus.UNUSE.value:
+            QMessageBox.information(
                 self,
-                self.tr("取用"),
-                msg,
-                buttons=QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                self.tr("提示"),
+                self.tr(STATUS_MESSAGES.get(record.status, "异常的治具状态")),
             )
-            if reply == QMessageBox.StandardButton.No:
-                return
-            warning = ""
-            if usecount >= usemaxcount:
-                warning += self.tr("使用次数 ")
-            if checkcount >= checkmaxcount:
-                warning += self.tr("单次校验使用次数 ")
-            if warning != "":
-                warning += self.tr("已达上限!") + "\n"
+            return
+        msg = self.tr(
+            f"取用编号为{record.no}的{record.name}，适用于{record.type}的{record.model}机种"
+        )
+        reply = QMessageBox.information(
+            self,
+            self.tr("取用"),
+            msg,
+            buttons=QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+        )
+        if reply == QMessageBox.StandardButton.No:
+            return
+        try:
+            try:
+                self.repository.checkout(record.id)
+            except JigLimitError as e:
                 reply = QMessageBox.warning(
                     self,
                     self.tr("警告"),
-                    warning + self.tr("是否继续取用？"),
+                    str(e) + "\n" + self.tr("是否继续取用？"),
                     buttons=QMessageBox.StandardButton.Yes
                     | QMessageBox.StandardButton.No,
                     defaultButton=QMessageBox.StandardButton.No,
                 )
                 if reply != QMessageBox.StandardButton.Yes:
                     return
-            self.model.setData(usestatus_index, JigUseStatus.USING.value)
-            self.model.submitAll()
-            self.model.select()
-            logger.info(msg)
-            QMessageBox.information(self, self.tr("取用"), self.tr("取用成功!"))
-        else:
-            logger.error("异常的治具状态")
+                self.repository.checkout(record.id, force=True)
+        except JigRepositoryError as e:
+            QMessageBox.information(self, self.tr("提示"), str(e))
+            return
+        self.undo_stack.pushCommand(
+            StatusCommand.checkout(record.id, record.no), applied=True
+        )
+        self.refleshLatest()
+        QMessageBox.information(self, self.tr("取用"), self.tr("取用成功!"))
 
     def returnJig(self):
         """归还治具"""
-        if self.col_usestatus == -1:
+        self.undo_stack.flush()
+        jig_id = self.selectedJigId()
+        record = self.repository.get(jig_id) if jig_id is not None else None
+        if record is None:
             return
-        proxy_row_index = self.agent.mapToSource(
-            self.table.selectionModel().selectedIndexes()[0]
-        ).row()
-        usestatus_index = self.model.index(proxy_row_index, self.col_usestatus)
-        usestatus = self.model.data(usestatus_index)
-        if usestatus == JigUseStatus.UNUSE.value:
-            QMessageBox.information(self, self.tr("提示"), self.tr("治具未在使用"))
+        if record.status != JigUseStatus.USING.value:
+            QMessageBox.information(
+                self,
+                self.tr("提示"),
+                self.tr(STATUS_MESSAGES.get(record.status, "异常的治具状态")),
+            )
             return
-        if usestatus == JigUseStatus.ERROR.value:
-            QMessageBox.information(self, self.tr("提示"), self.tr("治具异常"))
+        msg = self.tr(f"归还编号为{record.no}的{record.name}")
+        reply = QMessageBox.information(
+            self,
+            self.tr("归还"),
+            msg + "?",
+            buttons=QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+        )
+        if reply == QMessageBox.StandardButton.No:
             return
-        if usestatus == JigUseStatus.SCRAP.value:
-            QMessageBox.information(self, self.tr("提示"), self.tr("治具待报废"))
+        try:
+            self.repository.return_jig(record.id)
+        except JigRepositoryError as e:
+            QMessageBox.information(self, self.tr("提示"), str(e))
             return
-        if usestatus == JigUseStatus.USING.value:
-            usecount_index = self.model.index(proxy_row_index, self.col_usecount)
-            usecount = self.model.data(usecount_index)
-            checkcount_index = self.model.index(proxy_row_index, self.col_checkcount)
-            checkcount = self.model.data(checkcount_index)
-            jigname_index = self.model.index(proxy_row_index, self.col_jigname)
-            jigname = self.model.data(jigname_index)
-            jigno_index = self.model.index(proxy_row_index, self.col_jigno)
-            jigno = self.model.data(jigno_index)
-            msg = self.tr(f"归还编号为{jigno}的{jigname}")
-            reply = QMessageBox.information(
-                self,
-                self.tr("归还"),
-                msg + "?",
-                buttons=QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-            )
-            if reply == QMessageBox.StandardButton.No:
-                return
-            self.model.setData(usecount_index, usecount + 1)
-            self.model.setData(checkcount_index, checkcount + 1)
-            self.model.setData(usestatus_index, JigUseStatus.UNUSE.value)
-            self.model.submitAll()
-            self.model.select()
-            logger.info(msg)
-        else:
-            logger.error("异常的治具状态")
+        self.undo_stack.pushCommand(
+            StatusCommand.return_jig(record.id, record.no), applied=True
+        )
+        self.refleshLatest()
 
     ############### 其他 ##############
     def on_jigtype_manage(self):
@@ -838,8 +1308,22 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         # 关闭数据库连接
         if hasattr(self, "db") and self.db.isOpen():
+            if self.snapshot is None:
+                QSqlQuery(self.db).exec("PRAGMA optimize")
             self.db.close()
             logger.info("数据库连接已关闭")
+        if self.snapshot is not None:
+            self.snapshotTimer.stop()
+            self.snapshot.close()
+        if self.mail_worker:
+            self.mail_worker.stop()
+        self.stopBackgroundTasks()
+        self.undo_stack.close()
+        self.column_sizer.save_state()
+        self.dashboard.close_db()
+        self.repository.close()
+        metrics.registry.stop_periodic_dump()
+        metrics.registry.dump(os.path.join(root_path, "logs", "metrics.jsonl"))
         logger.info("程序关闭")
         return super().closeEvent(event)
 
@@ -860,6 +1344,13 @@ class MainWindow(QMainWindow):
         if hasattr(self, "db") and self.db.isOpen():
             self.db.close()
             logger.info("数据库连接已关闭")
+        if self.snapshot is not None:
+            self.snapshotTimer.stop()
+            self.snapshot.close()
+        if self.mail_worker:
+            self.mail_worker.stop()
+        self.stopBackgroundTasks()
+        self.undo_stack.close()
 
         # 可以添加其他清理逻辑
         logger.info("执行重启前清理工作")
@@ -16,15 +16,24 @@ from PySide6.QtWidgets import (
     QSizePolicy,
     QMessageBox,
     QDialog,
+    QProgressDialog,
 )
+from PySide6.QtCore import QThread, QTimer, Signal
 
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from custom_utils.jiglogger import setup_logging, user_context_filter
-from gui.mainWin import MainWindow
-from custom_utils.mails import send_email
+from gui.mainWin import MainWindow, read_settings, config_path
+from custom_utils.settings import load_settings
+from custom_utils.auth import Authenticator, SessionCache, AUTH_FAILED
+from custom_utils.outbox import MailOutbox, OutboxWorker
 
-setup_logging(log_level=logging.DEBUG)
+# 默认 INFO，排查问题时可通过环境变量 JIG_LOG_LEVEL=DEBUG 打开调试日志
+setup_logging(
+    log_level=getattr(
+        logging, os.environ.get("JIG_LOG_LEVEL", "INFO").upper(), logging.INFO
+    )
+)
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -41,11 +50,53 @@ root_path = os.path.abspath(root_path)
 data_path = os.path.join(root_path, "datas")
 
 
+class LoginThread(QThread):
+    """在后台线程中执行登录验证"""
+
+    authFinished = Signal(str)
+
+    def __init__(self, authenticator, username, email, password, timeout, parent=None):
+        super().__init__(parent)
+        self.authenticator = authenticator
+        self.username = username
+        self.email = email
+        self.password = password
+        self.timeout = timeout
+
+    def run(self):
+        try:
+            result = self.authenticator.authenticate(
+                self.username, self.email, self.password, self.timeout
+            )
+        except Exception as e:
+            logger.error(f"登录验证异常: {e}", exc_info=True)
+            result = AUTH_FAILED
+        self.authFinished.emit(result)
+
+
 class StartWindow(QMainWindow):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, authenticator: Authenticator = None):
         super().__init__(parent)
         self.email = None
 
+        read_settings()  # 确保配置文件存在
+        settings = load_settings(config_path)
+        self.auth_timeout = settings.login.timeout
+        if authenticator is None:
+            authenticator = Authenticator(
+                SessionCache(
+                    os.path.join(data_path, "sessions.json"),
+                    settings.login.session_hours,
+                )
+            )
+        self.authenticator = authenticator
+        self.mail_worker = OutboxWorker(
+            MailOutbox(os.path.join(data_path, "outbox.db"))
+        )
+        self.mail_worker.start()
+        self._login_thread = None
+        self._pending_threads = set()
+
         self.setMinimumSize(400, 200)
         self.setWindowTitle("治具管理系统")
 
@@ -123,26 +174,75 @@ class StartWindow(QMainWindow):
             logger.info(username + self.tr("登录成功！"))
             self.user_role = "admin"
             self.email_server = None
-        else:
-            if not send_email(
-                subject="治具管理系统通知",
-                message=f"""<h2>有新的登录行为</h2>
-                <p>您在{datetime.datetime.now()}登录了治具管理系统。</p>""",
-                user_id=username,
-                from_addr=self.email,
-                to_addr=self.email,
-                pwd=password,
-            ):
-                QMessageBox.information(
-                    self,
-                    self.tr("登录错误"),
-                    self.tr("请检查输入，工号和邮箱一定要正确，邮箱为你使用的发件邮箱"),
-                    QMessageBox.StandardButton.Ok,
-                )
-                return
-            self.user_role = "user"
+            self.startMainWin()
+            return
+
+        # 邮件验证放到后台线程，界面只显示进度
+        self.button_login.setEnabled(False)
+        self.progress = QProgressDialog(self.tr("正在验证身份..."), None, 0, 0, self)
+        self.progress.setWindowTitle(self.tr("登录"))
+        self.progress.setMinimumDuration(300)
+        self.progress.show()
+
+        thread = LoginThread(
+            self.authenticator, username, self.email, password, self.auth_timeout, self
+        )
+        thread.authFinished.connect(self.on_login_finished)
+        thread.finished.connect(lambda t=thread: self._pending_threads.discard(t))
+        self._pending_threads.add(thread)
+        self._login_thread = thread
+        thread.start()
+
+        # 硬超时：到时仍未返回则放弃本次结果
+        QTimer.singleShot(
+            int(self.auth_timeout * 1000) + 1000,
+            lambda t=thread: self.on_login_timeout(t),
+        )
+
+    def on_login_finished(self, result: str):
+        thread = self.sender()
+        if thread is not self._login_thread:
+            # 已超时放弃的验证结果
+            return
+        self._login_thread = None
+        self.progress.close()
+        self.button_login.setEnabled(True)
+        if result == AUTH_FAILED:
+            QMessageBox.information(
+                self,
+                self.tr("登录错误"),
+                self.tr("请检查输入，工号和邮箱一定要正确，邮箱为你使用的发件邮箱"),
+                QMessageBox.StandardButton.Ok,
+            )
+            return
+        logger.info(user_context_filter.current_user + self.tr("登录成功！"))
+        # 登录通知交给发件箱在后台发送
+        self.mail_worker.set_credentials(thread.email, thread.username, thread.password)
+        self.mail_worker.send(
+            subject="治具管理系统通知",
+            message=f"""<h2>有新的登录行为</h2>
+            <p>您在{datetime.datetime.now()}登录了治具管理系统。</p>""",
+            from_addr=thread.email,
+            to_addr=thread.email,
+            user_id=thread.username,
+        )
+        self.user_role = "user"
         self.startMainWin()
 
+    def on_login_timeout(self, thread: LoginThread):
+        if thread is not self._login_thread:
+            return
+        self._login_thread = None
+        self.progress.close()
+        self.button_login.setEnabled(True)
+        logger.warning("登录验证超时")
+        QMessageBox.warning(
+            self,
+            self.tr("登录超时"),
+            self.tr("邮件服务器无响应，请稍后重试"),
+            QMessageBox.StandardButton.Ok,
+        )
+
     def guest(self):
         guestDlg = QDialog(self)
         guestDlg.setWindowTitle(self.tr("访客登录"))
@@ -165,10 +265,16 @@ class StartWindow(QMainWindow):
         self.startMainWin()
 
     def startMainWin(self):
-        self.mainWin = MainWindow(self.user_role, self.email)
+        self.mainWin = MainWindow(self.user_role, self.email, self.mail_worker)
         self.mainWin.show()
         self.close()
 
+    def closeEvent(self, event):
+        # 等待仍在运行的验证线程结束，避免线程对象提前销毁
+        for thread in list(self._pending_threads):
+            thread.wait(int(self.auth_timeout * 1000))
+        return super().closeEvent(event)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,12 @@
+import os
+import sys
+import multiprocessing
+
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "."))
+from custom_utils.jigctl import main
+
+if __name__ == "__main__":
+    # 打包为可执行文件后，校验进程池的子进程从这里启动
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import os
+import sys
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import backup
+
+
+def _make_db(path, value):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS t (v TEXT)")
+    conn.execute("DELETE FROM t")
+    conn.execute("INSERT INTO t VALUES (?)", (value,))
+    conn.commit()
+    conn.close()
+
+
+def _value(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT v FROM t").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_restore_safety_copy_is_not_a_backup(tmp_path):
+    db_path = str(tmp_path / "jig.db")
+    dest = str(tmp_path / "backups")
+    _make_db(db_path, "old")
+    first = backup.backup_database(db_path, dest, "jig")
+    # 同一秒内的第二份备份会同名，改名模拟更晚的备份
+    second = os.path.join(dest, "jig-29991231-235959.db.gz")
+    os.replace(first, second)
+    first = backup.backup_database(db_path, dest, "jig")
+
+    _make_db(db_path, "new")
+    backup.restore(first, db_path, safety_dir=dest)
+
+    assert _value(db_path) == "old"
+    assert backup.list_backups(dest, "jig") == sorted([first, second])
+    assert backup.list_backups(dest, "jig")[-1] == second
+    safety = os.listdir(os.path.join(dest, backup.SAFETY_SUBDIR))
+    assert len(safety) == 1 and safety[0].startswith("jig-")
+
+    assert backup.rotate(dest, "jig", keep=1) == [first]
+    assert os.path.exists(second)
+    assert os.listdir(os.path.join(dest, backup.SAFETY_SUBDIR)) == safety
+
+
+def test_list_backups_ignores_other_names(tmp_path):
+    dest = tmp_path
+    for name in (
+        "jig-20240101-000000.db.gz",
+        "jig-before-restore-20240102-000000.db.gz",
+        "jigx-20240103-000000.db.gz",
+    ):
+        (dest / name).write_bytes(b"")
+
+    assert [os.path.basename(p) for p in backup.list_backups(str(dest), "jig")] == [
+        "jig-20240101-000000.db.gz"
+    ]
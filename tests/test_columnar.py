@@ -0,0 +1,62 @@
+import os
+import sys
+import sqlite3
+from datetime import date
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+pa = pytest.importorskip("pyarrow")
+
+from custom_utils.columnar import ColumnarError, export_table, read_table
+from test_watchfolder import _make_db
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    conn = sqlite3.connect(path)
+    # 已不在枚举中的状态、非法日期
+    conn.execute("""INSERT INTO jig (name, model, type, count, no, UseStatus, Checkdate,
+        Usedcount, Maxcount, CheckUsedcount, CheckMaxcount, CheckCycle, Version,
+        Makedate, Location, Remark)
+        SELECT name, model, jig.type, count, 'J00' || n.value, n.value, 'x',
+        n.value, Maxcount, CheckUsedcount, CheckMaxcount, CheckCycle, Version,
+        Makedate, Location, Remark FROM jig, json_each('[2, 3]') AS n""")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("ext", [".parquet", ".arrow"])
+def test_typed_export(tmp_path, ext):
+    path = str(tmp_path / f"jigs{ext}")
+    assert export_table(_db(tmp_path), path, batch_size=2) == 3
+    assert not os.path.exists(path + ".partial")
+
+    table = read_table(path)
+    schema = table.schema
+    assert schema.field("id").type == pa.int64()
+    assert schema.field("Usedcount").type == pa.int32()
+    assert schema.field("Checkdate").type == pa.date32()
+    assert pa.types.is_dictionary(schema.field("UseStatus").type)
+    assert b"titles" in schema.metadata
+
+    assert table.column("no").to_pylist() == ["J001", "J002", "J003"]
+    assert table.column("Checkdate").to_pylist() == [date(2024, 1, 1), None, None]
+    assert table.column("UseStatus").to_pylist() == ["未使用", "2", "3"]
+    assert table.column("Usedcount").to_pylist() == [2, 2, 3]
+
+
+def test_export_ids_in_order(tmp_path):
+    path = str(tmp_path / "jigs.parquet")
+    assert export_table(_db(tmp_path), path, ids=[3, 1]) == 2
+    assert read_table(path).column("id").to_pylist() == [3, 1]
+
+
+def test_unsupported_format(tmp_path):
+    path = str(tmp_path / "jigs.csv")
+    with pytest.raises(ColumnarError):
+        export_table(_db(tmp_path), path)
+    assert os.listdir(tmp_path) == ["jig.db"]
@@ -0,0 +1,195 @@
+import os
+import sys
+import sqlite3
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from custom_utils.commands import (
+    ConflictError,
+    EditJigCommand,
+    FieldConflict,
+    InsertJigCommand,
+    StatusCommand,
+    WriteBuffer,
+    read_rows,
+)
+from custom_utils.repository import ROW_VERSION
+from test_watchfolder import _make_db
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    return path
+
+
+def _jig(path, no="J001"):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT Location, Remark, UseStatus FROM jig WHERE no = ?", (no,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def _row(buffer):
+    return read_rows(buffer.conn, [1])[0]
+
+
+def test_apply_revert_merge(tmp_path):
+    path = _db(tmp_path)
+    buffer = WriteBuffer(path)
+    try:
+        command = EditJigCommand.from_row(_row(buffer), {"Location": "L1"})
+        assert EditJigCommand.from_row(_row(buffer), {"Location": ""}) is None
+        buffer.push(command)
+        assert buffer.flush().applied == 1
+        assert _jig(path)[:2] == ("L1", "")
+
+        # 连续修改同一治具合并为一步：保留最早的原值和最新的新值
+        second = EditJigCommand.from_row(
+            _row(buffer), {"Location": "L2", "Remark": "R"}
+        )
+        assert command.merge(second)
+        assert command.before == {"Location": "", "Remark": ""}
+        assert command.after == {"Location": "L2", "Remark": "R"}
+        buffer.push(command)
+        buffer.flush()
+        assert _jig(path)[:2] == ("L2", "R")
+
+        buffer.push(command, undo=True)
+        assert buffer.flush().applied == 1
+        assert _jig(path)[:2] == ("", "")
+    finally:
+        buffer.close()
+
+
+def test_pending_undo_cancels(tmp_path):
+    path = _db(tmp_path)
+    buffer = WriteBuffer(path)
+    try:
+        command = EditJigCommand.from_row(_row(buffer), {"Location": "L1"})
+        buffer.push(command)
+        assert buffer.current([1])[0]["Location"] == "L1"
+        buffer.push(command, undo=True)
+        assert len(buffer) == 0
+        assert buffer.flush().applied == 0
+        assert _jig(path)[:2] == ("", "")
+    finally:
+        buffer.close()
+
+
+def test_failed_command_rolls_back_only_its_savepoint(tmp_path):
+    path = _db(tmp_path)
+    buffer = WriteBuffer(path)
+    try:
+        edit = EditJigCommand.from_row(_row(buffer), {"Location": "L1"})
+        # 治具未被取用，归还失败：它的写入被回滚，其他命令照常提交
+        failing = StatusCommand.return_jig(1, "J001")
+        insert = InsertJigCommand({**_row(buffer), "id": None, "no": "J002"})
+        for command in (edit, failing, insert):
+            buffer.push(command)
+        result = buffer.flush()
+
+        assert result.applied == 2
+        assert [(c, undo) for c, undo, _ in result.failed] == [(failing, False)]
+        assert _jig(path) == ("L1", "", "未使用")
+        assert _jig(path, "J002") is not None
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT Usedcount FROM jig WHERE id = 1").fetchone() == (2,)
+        conn.close()
+    finally:
+        buffer.close()
+
+
+def _stack(path):
+    from PySide6.QtWidgets import QApplication
+
+    from custom_utils.UndoStack import JigUndoStack
+
+    app = QApplication.instance() or QApplication([])
+    return app, JigUndoStack(path)
+
+
+def test_undo_after_flush(tmp_path):
+    path = _db(tmp_path)
+    app, stack = _stack(path)
+    try:
+        row = stack.current([1])[0]
+        stack.pushCommand(EditJigCommand.from_row(row, {"Location": "L1"}))
+        stack.pushCommand(StatusCommand.checkout(1, "J001"))
+        assert stack.flush()
+        assert _jig(path) == ("L1", "", "使用中")
+
+        stack.undo()
+        stack.undo()
+        assert stack.flush()
+        assert _jig(path) == ("", "", "未使用")
+
+        stack.redo()
+        assert stack.flush()
+        assert _jig(path) == ("L1", "", "未使用")
+    finally:
+        stack.close()
+        stack.deleteLater()
+    app.processEvents()
+
+
+def test_failure_clears_stack(tmp_path):
+    path = _db(tmp_path)
+    app, stack = _stack(path)
+    messages = []
+    stack.flushFailed.connect(messages.append)
+    try:
+        stack.pushCommand(StatusCommand.checkout(1, "J001"))
+        assert stack.flush()
+
+        # 其他工位归还了治具：撤销取用失败，撤销记录不再可信
+        conn = sqlite3.connect(path)
+        conn.execute("UPDATE jig SET UseStatus = '未使用' WHERE id = 1")
+        conn.commit()
+        conn.close()
+        stack.undo()
+        assert not stack.flush()
+
+        assert stack.count() == 0
+        assert len(messages) == 1 and "撤销记录已清空" in messages[0]
+        assert _jig(path)[2] == "未使用"
+    finally:
+        stack.close()
+        stack.deleteLater()
+    app.processEvents()
+
+
+def test_concurrent_edit_conflict(tmp_path):
+    path = _db(tmp_path)
+    mine, theirs = WriteBuffer(path), WriteBuffer(path)
+    try:
+        base = _row(mine)
+        theirs.push(EditJigCommand.from_row(_row(theirs), {"Location": "L1"}))
+        theirs.flush()
+        assert _row(mine)[ROW_VERSION] == base[ROW_VERSION] + 1
+
+        # 基于旧版本修改同一字段：冲突，不覆盖对方的修改
+        command = EditJigCommand.from_row(base, {"Location": "L2", "Remark": "R"})
+        with pytest.raises(ConflictError) as e:
+            command.apply(mine.conn)
+        assert e.value.conflicts == [FieldConflict("Location", "", "L1", "L2")]
+        mine.push(command)
+        result = mine.flush()
+        assert result.applied == 0 and len(result.failed) == 1
+        assert _jig(path)[:2] == ("L1", "")
+
+        # 对方只改了其他字段：按新版本写入，两边的修改都保留
+        command = EditJigCommand.from_row(base, {"Remark": "R"})
+        mine.push(command)
+        assert mine.flush().applied == 1
+        assert _jig(path)[:2] == ("L1", "R")
+        assert command.version == _row(theirs)[ROW_VERSION]
+    finally:
+        mine.close()
+        theirs.close()
@@ -0,0 +1,79 @@
+import os
+import sys
+import sqlite3
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils.dashboard import (
+    SUMMARY_TABLES,
+    aggregate_sql,
+    install_dashboard,
+    read_dashboard,
+    summary_columns,
+)
+from test_watchfolder import _make_db
+
+
+def _connect(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    conn = sqlite3.connect(path)
+    conn.isolation_level = None
+    return conn
+
+
+def _assert_summaries(conn):
+    """触发器维护的汇总表与直接分组统计的结果一致"""
+    for summary in SUMMARY_TABLES:
+        cols = ", ".join(summary_columns(summary))
+        assert sorted(conn.execute(f"SELECT {cols}, n FROM {summary}")) == sorted(
+            conn.execute(aggregate_sql(summary))
+        )
+
+
+def test_triggers_keep_summaries(tmp_path):
+    conn = _connect(tmp_path)
+    assert install_dashboard(conn)
+    assert not install_dashboard(conn)
+    _assert_summaries(conn)
+
+    conn.execute("""INSERT INTO jig (name, model, type, count, no, UseStatus, Checkdate,
+        Usedcount, Maxcount, CheckUsedcount, CheckMaxcount, CheckCycle, Version,
+        Makedate, Location, Remark)
+        SELECT name, model, 'T2', count, 'J00' || value, UseStatus, Checkdate,
+        value * 1000, Maxcount, CheckUsedcount, CheckMaxcount, value * 10, Version,
+        Makedate, Location, Remark FROM jig, json_each('[2, 3, 4]')""")
+    _assert_summaries(conn)
+    conn.execute("UPDATE jig SET UseStatus = '使用中' WHERE no = 'J002'")
+    conn.execute("UPDATE jig SET Usedcount = Usedcount + 5000 WHERE no = 'J003'")
+    conn.execute("UPDATE jig SET Checkdate = '2025-01-01' WHERE no = 'J004'")
+    _assert_summaries(conn)
+    conn.execute("DELETE FROM jig WHERE no IN ('J001', 'J003')")
+    _assert_summaries(conn)
+    assert conn.execute("SELECT SUM(n) FROM dash_wear").fetchone() == (2,)
+
+
+def test_checkout_in_same_bucket_does_not_touch_summaries(tmp_path):
+    conn = _connect(tmp_path)
+    install_dashboard(conn)
+    before = conn.total_changes
+    conn.execute("UPDATE jig SET Usedcount = Usedcount + 1")
+    assert conn.total_changes - before == 1
+
+
+def test_read_dashboard(tmp_path):
+    conn = _connect(tmp_path)
+    install_dashboard(conn)
+    # J001 的下次校验日期为 2024-12-31
+    dashboard = read_dashboard(conn, today=date(2024, 12, 25))
+    assert dashboard["total"] == 1
+    assert dashboard["type_status"] == [("T1", "未使用", 1)]
+    assert dashboard["due"] == [
+        ("已过期", 0),
+        ("7天内", 1),
+        ("30天内", 1),
+        ("90天内", 1),
+    ]
+    assert dashboard["wear"] == [(0, 1)]
+    assert read_dashboard(conn, today=date(2025, 1, 1))["due"][0] == ("已过期", 1)
@@ -0,0 +1,86 @@
+import os
+import sys
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils.dashboard import install_dashboard, read_dashboard
+from custom_utils.federation import Federation
+from test_watchfolder import _make_db
+
+
+def _site(tmp_path, name, sql=()):
+    path = str(tmp_path / f"{name}.db")
+    _make_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE jig SET no = ?", (f"{name}-001",))
+    for statement in sql:
+        conn.execute(statement)
+    conn.commit()
+    if name == "B":
+        install_dashboard(conn)
+    conn.close()
+    return path
+
+
+def _federation(tmp_path):
+    local = _site(tmp_path, "A")
+    sites = {
+        "A": local,
+        "B": _site(tmp_path, "B"),
+        # 动态字段只在部分站点存在，联合视图只包含共有的列
+        "C": _site(tmp_path, "C", ["ALTER TABLE jig ADD COLUMN extra TEXT"]),
+        "D": str(tmp_path / "missing.db"),
+    }
+    return Federation(sites, local_path=local)
+
+
+def test_attached_views(tmp_path):
+    federation = _federation(tmp_path)
+    conn = federation.connect()
+    try:
+        assert [(s.name, s.schema) for s in federation.sites] == [
+            ("A", "main"),
+            ("B", "site_1"),
+            ("C", "site_2"),
+        ]
+        rows = conn.execute("SELECT site, no FROM jig_all ORDER BY site").fetchall()
+        assert rows == [("A", "A-001"), ("B", "B-001"), ("C", "C-001")]
+        columns = [d[0] for d in conn.execute("SELECT * FROM jig_all").description]
+        assert "extra" not in columns
+
+        # B 有汇总表，A 和 C 从 jig 表现算
+        dashboard = read_dashboard(conn)
+        assert dashboard["total"] == 3
+        assert dashboard["type_status"] == [("T1", "未使用", 3)]
+
+        version = federation.data_version(conn)
+        other = sqlite3.connect(federation.site("C").path)
+        other.execute("UPDATE jig SET Remark = 'x'")
+        other.commit()
+        other.close()
+        changed = federation.data_version(conn)
+        assert changed[:2] == version[:2] and changed[2] != version[2]
+    finally:
+        conn.close()
+        federation.close()
+
+
+def test_search_and_site_writes(tmp_path):
+    federation = _federation(tmp_path)
+    try:
+        rows = federation.search("001")
+        assert [(row[0], row[2]) for row in rows] == [
+            ("A", "A-001"),
+            ("B", "B-001"),
+            ("C", "C-001"),
+        ]
+        assert [row[0] for row in federation.search("B-")] == ["B"]
+        assert federation.search(status="使用中") == []
+        assert federation.types() == ["T1"]
+
+        repository = federation.repository("B")
+        assert repository.find("B-001") is not None
+        assert repository.find("A-001") is None
+    finally:
+        federation.close()
@@ -0,0 +1,76 @@
+import os
+import sys
+import sqlite3
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import forecast
+from test_watchfolder import _make_db
+
+TODAY = date(2024, 6, 1)
+
+
+def _jd(days_ago):
+    d = TODAY - timedelta(days=days_ago)
+    return d.toordinal() - date(1970, 1, 1).toordinal() + forecast._UNIX_EPOCH_JD
+
+
+def _columns(*jigs):
+    """每个治具：(制作距今天数, 校验距今天数, 已用, 最大, 单次已用, 单次最大, 周期)"""
+    names = [
+        "julianday(Makedate)",
+        "julianday(Checkdate)",
+        "Usedcount",
+        "Maxcount",
+        "CheckUsedcount",
+        "CheckMaxcount",
+        "CheckCycle",
+    ]
+    columns = {
+        name: np.array(values, dtype=float) for name, values in zip(names, zip(*jigs))
+    }
+    for name in names[:2]:
+        columns[name] = np.array([_jd(d) for d in columns[name]])
+    return columns
+
+
+def test_compute_forecast():
+    result = forecast.compute_forecast(
+        _columns(
+            # 每天 10 次：单次校验次数 5 天后用完，早于校验周期；100 天后报废
+            (100, 20, 1000, 2000, 400, 500, 365),
+            # 没有使用：按周期校验，不报废
+            (100, 20, 0, 2000, 0, 500, 30),
+            # 刚校验过 3 天：单次校验速率改用整体速率
+            (100, 3, 1000, 2000, 300, 500, 365),
+        ),
+        TODAY,
+    )
+    assert result["usage_rate"].tolist() == [10.0, 0.0, 10.0]
+    assert result["check_rate"].tolist() == [20.0, 0.0, 10.0]
+    assert result["days_to_calibration"].tolist() == [5, 10, 20]
+    assert list(result["calibration_reason"]) == [
+        forecast.REASON_COUNT,
+        forecast.REASON_CYCLE,
+        forecast.REASON_COUNT,
+    ]
+    assert list(result["calibration_due"]) == ["2024-06-06", "2024-06-11", "2024-06-21"]
+    assert list(result["retirement_date"]) == ["2024-09-09", None, "2024-09-09"]
+
+
+def test_run_forecast(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    assert forecast.last_computed(path) is None
+    assert forecast.run_forecast(path, date(2024, 1, 11)) == 1
+    assert forecast.last_computed(path) == "2024-01-11"
+
+    conn = sqlite3.connect(path)
+    row = conn.execute("""SELECT no, usage_rate, calibration_due, calibration_reason,
+        days_to_calibration, retirement_date FROM jig_forecast""").fetchone()
+    conn.close()
+    # 每天 0.2 次：按周期在 2024-12-31 校验，报废超过 100 年不预测
+    assert row == ("J001", 0.2, "2024-12-31", forecast.REASON_CYCLE, 355, None)
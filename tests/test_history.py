@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import history
+from custom_utils.reports import data_version
+from test_watchfolder import _make_db
+
+
+def _connect(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    conn = sqlite3.connect(path)
+    conn.isolation_level = None
+    history.install_history(conn)
+    return conn
+
+
+def _count(conn, n=1):
+    conn.execute(
+        "UPDATE jig SET Usedcount = Usedcount + ?, CheckUsedcount = CheckUsedcount + ?",
+        (n, n),
+    )
+
+
+def test_counter_updates_are_merged(tmp_path):
+    conn = _connect(tmp_path)
+    before = time.time() - 1
+    versions = set()
+    for _ in range(720):
+        _count(conn)
+        versions.add(data_version(conn))
+
+    assert conn.execute("SELECT op FROM jig_history").fetchall() == [
+        (history.OP_COUNT,)
+    ]
+    # 每次写入后报表缓存的数据版本都会变化
+    assert len(versions) == 720
+    assert history.jig_as_of(conn, 1, before)["Usedcount"] == 2
+
+
+def test_other_changes_split_the_merge(tmp_path):
+    conn = _connect(tmp_path)
+    _count(conn, 10)
+    conn.execute("UPDATE jig SET Location = 'L2', Usedcount = Usedcount + 5")
+    middle = time.time()
+    time.sleep(0.01)
+    _count(conn)
+    _count(conn)
+
+    ops = [row[0] for row in conn.execute("SELECT op FROM jig_history ORDER BY id")]
+    assert ops == [history.OP_COUNT, history.OP_UPDATE, history.OP_COUNT]
+    state = history.jig_as_of(conn, 1, middle)
+    assert (state["Usedcount"], state["Location"]) == (17, "L2")
+
+
+def test_merge_window(tmp_path):
+    conn = _connect(tmp_path)
+    _count(conn)
+    conn.execute(
+        "UPDATE jig_history SET ts = ts - ?", (history.COUNT_MERGE_SECONDS + 1,)
+    )
+    _count(conn)
+
+    assert conn.execute("SELECT COUNT(*) FROM jig_history").fetchone()[0] == 2
+
+
+def test_merge_window_does_not_slide(tmp_path):
+    conn = _connect(tmp_path)
+    # 四次计数更新，间隔 3000 秒，共 9000 秒：跨过第一个窗口的结束
+    for _ in range(4):
+        _count(conn)
+        conn.execute("UPDATE jig_history SET ts = ts - 3000")
+
+    rows = conn.execute("SELECT ts, diff FROM jig_history ORDER BY id").fetchall()
+    assert len(rows) == 2
+    second_window = rows[1][0]
+    assert history.jig_as_of(conn, 1, second_window - 1)["Usedcount"] == 4
+    assert history.jig_as_of(conn, 1, time.time())["Usedcount"] == 6
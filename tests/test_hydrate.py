@@ -0,0 +1,98 @@
+import os
+import sys
+import sqlite3
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from Model import JigDynamic, JigUseStatus
+from custom_utils.hydrate import Hydrator
+from custom_utils.repository import JigRepository
+from test_watchfolder import _make_db
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    return path
+
+
+def test_model_without_validation(tmp_path):
+    conn = sqlite3.connect(_db(tmp_path))
+    conn.execute("ALTER TABLE jig ADD COLUMN extra TEXT")
+    cursor = conn.execute("SELECT * FROM jig")
+    row = cursor.fetchone()
+    hydrator = Hydrator.for_cursor(JigDynamic, cursor)
+
+    jig = hydrator.model(row)
+    assert type(jig) is JigDynamic
+    assert jig.Checkdate == date(2024, 1, 1)
+    assert jig.UseStatus is JigUseStatus.UNUSE
+    assert "extra" not in hydrator.fields
+
+    # 不在枚举中的值原样保留，不校验
+    row = list(row)
+    row[hydrator.fields.index("UseStatus")] = "已删除的状态"
+    assert hydrator.model(row).UseStatus == "已删除的状态"
+
+
+def test_fields_set_per_instance(tmp_path):
+    conn = sqlite3.connect(_db(tmp_path))
+    cursor = conn.execute("SELECT * FROM jig")
+    row = cursor.fetchone()
+    hydrator = Hydrator.for_cursor(JigDynamic, cursor)
+
+    a, b = hydrator.model(row), hydrator.model(row)
+    assert a.model_fields_set == set(hydrator.fields)
+    assert a.model_fields_set is not b.model_fields_set
+    a.model_fields_set.discard("Remark")
+    assert "Remark" in b.model_fields_set
+
+
+def test_repository_models(tmp_path):
+    repo = JigRepository(_db(tmp_path))
+    try:
+        record = repo.find("J001")
+        jig = repo.get_model(record.id)
+        assert (jig.no, jig.Usedcount) == ("J001", 2)
+        assert [j.no for j in repo.iter_models("Usedcount >= ?", (2,))] == ["J001"]
+        assert list(repo.iter_models("Usedcount > ?", (2,))) == []
+        assert repo.get_model(record.id + 1) is None
+    finally:
+        repo.close()
+
+
+def test_form_loads_record_through_hydrator(tmp_path):
+    from PySide6.QtCore import QDate
+    from PySide6.QtSql import QSqlDatabase, QSqlQuery
+    from PySide6.QtWidgets import QApplication, QComboBox, QDateEdit
+
+    from custom_utils.PydanticFormWidget import PydanticFormWidget
+
+    app = QApplication.instance() or QApplication([])
+    path = _db(tmp_path)
+    qdb = QSqlDatabase.addDatabase("QSQLITE", "test_hydrate")
+    qdb.setDatabaseName(path)
+    assert qdb.open()
+    try:
+        query = QSqlQuery("SELECT * FROM jig", qdb)
+        assert query.next()
+        form = PydanticFormWidget(JigDynamic, show_buttons=False)
+        form.load_from_record(query.record())
+
+        status = form.field_widgets["UseStatus"]
+        assert isinstance(status, QComboBox)
+        assert status.currentText() == JigUseStatus.UNUSE.value
+        checkdate = form.field_widgets["Checkdate"]
+        assert isinstance(checkdate, QDateEdit)
+        assert checkdate.date() == QDate(2024, 1, 1)
+        assert form.loaded_record["no"] == "J001"
+        assert form.dirty_fields() == []
+        form.deleteLater()
+        del query
+    finally:
+        qdb.close()
+        del qdb
+        QSqlDatabase.removeDatabase("test_hydrate")
+    app.processEvents()
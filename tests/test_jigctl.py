@@ -0,0 +1,36 @@
+import os
+import sys
+import json
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import db, jigctl
+
+
+def _run(capsys, *argv):
+    code = jigctl.main(list(argv))
+    return code, json.loads(capsys.readouterr().out)
+
+
+def test_bad_config_is_reported_as_json(tmp_path, monkeypatch, capsys):
+    (tmp_path / "config.ini").write_text("[备份]\n间隔小时数=abc\n", encoding="utf-8")
+    monkeypatch.setattr(db, "root_path", str(tmp_path))
+
+    code, result = _run(capsys, "backup", "--list")
+    assert code == 1
+    assert "配置文件校验失败" in result["error"]
+
+
+def test_missing_pyarrow_is_reported_as_json(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    path = str(tmp_path / "jig.db")
+    from Model import JigDynamic
+    from custom_utils import Model2SQL
+
+    Model2SQL.create_table_from_pydantic_model(
+        JigDynamic, db_path=path, table_name=db.JIG_TABLE
+    )
+
+    code, result = _run(capsys, "--db", path, "export", str(tmp_path / "jigs.parquet"))
+    assert code == 1
+    assert "pyarrow" in result["error"]
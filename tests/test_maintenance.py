@@ -0,0 +1,73 @@
+import os
+import sys
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import maintenance
+from custom_utils.settings import MaintenanceSettings
+from test_watchfolder import _make_db
+
+
+def _connect(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    conn = sqlite3.connect(path)
+    conn.isolation_level = None
+    return path, conn
+
+
+def test_incremental_vacuum(tmp_path):
+    path, conn = _connect(tmp_path)
+    assert maintenance.enable_incremental_vacuum(conn)
+    assert not maintenance.enable_incremental_vacuum(conn)
+    conn.execute("CREATE TABLE scratch (data BLOB)")
+    conn.execute(
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200)"
+        " INSERT INTO scratch SELECT zeroblob(4000) FROM n"
+    )
+    conn.execute("DELETE FROM scratch")
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    assert free > 100
+    conn.close()
+
+    stats = maintenance.maintain(path, MaintenanceSettings(vacuum_pages=50))
+    assert stats.freelist_count == 0
+    assert stats.auto_vacuum == maintenance.AUTO_VACUUM_INCREMENTAL
+    assert stats.journal_mode == "delete"
+
+
+def test_vacuum_needs_migrate(tmp_path):
+    # 没有开启增量回收时定时维护不回收，也不执行 VACUUM
+    path, conn = _connect(tmp_path)
+    conn.execute("CREATE TABLE scratch (data BLOB)")
+    conn.execute("INSERT INTO scratch VALUES (zeroblob(100000))")
+    conn.execute("DELETE FROM scratch")
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    assert maintenance.incremental_vacuum(conn, 0, 10) == 0
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == free
+
+
+def test_analyze_if_shifted(tmp_path):
+    _, conn = _connect(tmp_path)
+    assert maintenance.analyze_if_shifted(conn, 20) == ["jig"]
+    assert maintenance.analyze_if_shifted(conn, 20) == []
+    conn.execute(
+        "INSERT INTO jig (name, model, type, count, no, UseStatus, Checkdate,"
+        " Usedcount, Maxcount, CheckUsedcount, CheckMaxcount, CheckCycle, Version,"
+        " Makedate, Location, Remark) SELECT name, model, type, count, 'J002',"
+        " UseStatus, Checkdate, Usedcount, Maxcount, CheckUsedcount, CheckMaxcount,"
+        " CheckCycle, Version, Makedate, Location, Remark FROM jig"
+    )
+    assert maintenance.analyze_if_shifted(conn, 20) == ["jig"]
+
+
+def test_checkpoint(tmp_path):
+    path, conn = _connect(tmp_path)
+    assert maintenance.checkpoint(conn, path, 64) is None
+    assert maintenance.set_journal_mode(conn, True) == "wal"
+    conn.execute("UPDATE jig SET Remark = 'x'")
+    assert maintenance.checkpoint(conn, path, 64) == "PASSIVE"
+    assert maintenance.checkpoint(conn, path, 0.000001) == "TRUNCATE"
+    assert os.path.getsize(path + "-wal") == 0
+    assert maintenance.set_journal_mode(conn, False) == "delete"
@@ -0,0 +1,96 @@
+import io
+import os
+import sys
+import sqlite3
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import history, reports
+from test_watchfolder import _make_db
+
+TODAY = {"today": "2024-12-25"}
+
+
+def _db(tmp_path, with_history=True):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    conn = sqlite3.connect(path)
+    conn.isolation_level = None
+    if with_history:
+        history.install_history(conn)
+    conn.execute("UPDATE jig SET Remark = '<b>'")
+    conn.execute("""INSERT INTO jig (name, model, type, count, no, UseStatus, Checkdate,
+        Usedcount, Maxcount, CheckUsedcount, CheckMaxcount, CheckCycle, Version,
+        Makedate, Location, Remark)
+        SELECT name, model, jig.type, count, 'J00' || n.value, UseStatus,
+        date(Checkdate, '+' || n.value || ' months'), Usedcount, Maxcount,
+        CheckUsedcount, CheckMaxcount, CheckCycle, Version, Makedate, Location, Remark
+        FROM jig, json_each('[2, 3, 4]') AS n""")
+    conn.close()
+    return path
+
+
+def test_render_html_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(reports, "FETCH_SIZE", 2)
+    conn = sqlite3.connect(_db(tmp_path))
+    out = io.StringIO()
+    report = reports.get_report("scrapped")
+    conn.execute("UPDATE jig SET Usedcount = Maxcount")
+    assert reports.render_html(conn, report, out) == 4
+    page = out.getvalue()
+    assert page.count("<tr><td>J00") == 4
+    assert "&lt;b&gt;" in page and "<b>" not in page
+    assert "共 4 条" in page
+
+    # 校验到期：J001 在 2024-12-31 到期，J002 在两个月后
+    out = io.StringIO()
+    expiring = reports.get_report("expiring")
+    assert reports.render_html(conn, expiring, out, TODAY) == 1
+    assert "<td>J001</td>" in out.getvalue() and "<td>6</td>" in out.getvalue()
+    assert (
+        reports.render_html(conn, expiring, io.StringIO(), {**TODAY, "days": 70}) == 2
+    )
+
+
+def test_generate_uses_cache_until_data_changes(tmp_path):
+    path = _db(tmp_path)
+    cache = reports.ReportCache(str(tmp_path / "cache"))
+    first = reports.generate("expiring", TODAY, db_path=path, cache=cache)
+    mtime = os.path.getmtime(first)
+    assert reports.generate("expiring", TODAY, db_path=path, cache=cache) == first
+    assert os.path.getmtime(first) == mtime
+    assert (
+        reports.generate("expiring", {**TODAY, "days": 70}, db_path=path, cache=cache)
+        != first
+    )
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE jig SET Location = 'L2' WHERE no = 'J001'")
+    conn.commit()
+    conn.close()
+    second = reports.generate("expiring", TODAY, db_path=path, cache=cache)
+    assert second != first
+    with open(second, encoding="utf-8") as f:
+        assert "<td>L2</td>" in f.read()
+
+
+def test_generate_without_history(tmp_path):
+    path = _db(tmp_path, with_history=False)
+    cache = reports.ReportCache(str(tmp_path / "cache"))
+    generated = reports.generate("usage_by_type", db_path=path, cache=cache)
+    assert os.path.basename(generated) == "usage_by_type-nocache.html"
+    with pytest.raises(reports.ReportError):
+        reports.generate("missing", db_path=path, cache=cache)
+    with pytest.raises(reports.ReportError):
+        reports.generate("expiring", fmt="xlsx", db_path=path, cache=cache)
+
+
+def test_digest(tmp_path):
+    conn = sqlite3.connect(_db(tmp_path))
+    digest = reports.digest_html(conn, ["expiring", "scrapped"], TODAY, max_rows=0)
+    assert "校验到期治具（共 1 条）" in digest
+    assert "另有 1 条未列出" in digest
+    assert "待报废治具" not in digest
+    assert "没有需要处理的治具" in reports.digest_html(conn, ["scrapped"])
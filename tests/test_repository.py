@@ -0,0 +1,59 @@
+import os
+import sys
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils.commands import WriteBuffer
+from custom_utils.repository import JigRepository
+from test_watchfolder import _make_db
+
+
+def _schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master"))
+    finally:
+        conn.close()
+
+
+def test_readonly_session_does_not_change_schema(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    before = _schema(path)
+
+    repo = JigRepository(path, install_schema=False)
+    buffer = WriteBuffer(path, install_schema=False)
+    try:
+        assert repo.find("J001").no == "J001"
+    finally:
+        buffer.close()
+        repo.close()
+    assert _schema(path) == before
+
+    JigRepository(path).close()
+    assert _schema(path) != before
+
+
+def test_index_point_query_and_background_rebuild(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    repo = JigRepository(path)
+    try:
+        index = repo.index
+        assert index.lookup("J001") == 1 and len(index) == 1
+
+        # 其他连接改名：索引过期，先用单点查询回答，再在后台重建
+        other = sqlite3.connect(path)
+        other.execute("UPDATE jig SET no = 'J009' WHERE no = 'J001'")
+        other.commit()
+        other.close()
+        assert index.lookup("J009") == 1
+        assert index.lookup("J001") is None
+        index._rebuilding.join(5)
+        assert not index._rebuilding.is_alive()
+        assert index._ids == {"J009": 1}
+        assert repo.find("J009").id == 1
+        assert repo.find("J001") is None
+    finally:
+        repo.close()
@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import settings as settings_module
+from custom_utils.settings import load_settings
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    # 保证文件时间戳变化，缓存失效
+    stamp = os.stat(path).st_mtime + 10
+    os.utime(path, (stamp, stamp))
+
+
+def test_keeps_last_good_settings(tmp_path):
+    path = tmp_path / "config.ini"
+    _write(path, "[备份]\n间隔小时数=6\n")
+    assert load_settings(str(path)).backup.interval_hours == 6
+
+    # 重复的节：ConfigParser 抛出 DuplicateSectionError
+    _write(path, "[备份]\n间隔小时数=8\n[备份]\n保留份数=3\n")
+    assert load_settings(str(path)).backup.interval_hours == 6
+
+    # 校验失败
+    _write(path, "[备份]\n间隔小时数=abc\n")
+    assert load_settings(str(path)).backup.interval_hours == 6
+
+    _write(path, "[备份]\n间隔小时数=8\n")
+    assert load_settings(str(path)).backup.interval_hours == 8
+
+
+def test_malformed_first_load_uses_defaults(tmp_path):
+    path = tmp_path / "config.ini"
+    _write(path, "没有节头\n")
+    assert load_settings(str(path)) == settings_module.AppSettings()
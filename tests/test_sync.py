@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import sqlite3
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import Model2SQL
+from custom_utils.sync import FileTransport, SyncEngine, SyncError
+from Model import JigDynamic
+from test_watchfolder import _make_db
+
+
+def _engines(tmp_path):
+    a, b = str(tmp_path / "a.db"), str(tmp_path / "b.db")
+    _make_db(a)
+    Model2SQL.create_table_from_pydantic_model(JigDynamic, db_path=b, table_name="jig")
+    # 中心库还不存在，第一次连接时建表
+    central = str(tmp_path / "central" / "jig.db")
+    os.makedirs(os.path.dirname(central))
+    transport = FileTransport(central)
+    return (
+        (a, SyncEngine(a, transport, "A")),
+        (b, SyncEngine(b, transport, "B")),
+        central,
+    )
+
+
+def _execute(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+    # 触发器的时间为毫秒精度，保证后面的修改更新
+    time.sleep(0.01)
+
+
+def _row(path, no="J001"):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT Location, Remark FROM jig WHERE no = ?", (no,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def test_missing_central_directory(tmp_path):
+    transport = FileTransport(str(tmp_path / "missing" / "jig.db"))
+    a = str(tmp_path / "a.db")
+    _make_db(a)
+    with pytest.raises(SyncError):
+        SyncEngine(a, transport, "A").sync()
+
+
+def test_two_stations(tmp_path):
+    (a, engine_a), (b, engine_b), central = _engines(tmp_path)
+    engine_a.sync()
+    engine_b.sync()
+    assert _row(central) == ("", "")
+    assert _row(b) == ("", "")
+
+    # 不同字段：两边的修改都保留
+    _execute(a, "UPDATE jig SET Location = 'A'")
+    _execute(b, "UPDATE jig SET Remark = 'B'")
+    # 同一字段：最后修改者为准
+    _execute(a, "UPDATE jig SET Usedcount = 100")
+    _execute(b, "UPDATE jig SET Usedcount = 200")
+    for engine in (engine_a, engine_b, engine_a):
+        engine.sync()
+    for path in (a, b, central):
+        assert _row(path) == ("A", "B")
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT Usedcount FROM jig").fetchone() == (200,)
+        conn.close()
+
+    # 删除传播到其他站点
+    _execute(b, "DELETE FROM jig WHERE no = 'J001'")
+    engine_b.sync()
+    engine_a.sync()
+    assert _row(a) is None
+    assert _row(central) is None
@@ -0,0 +1,62 @@
+import os
+import sys
+import sqlite3
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import validation
+from Model import JigType
+from test_watchfolder import _make_db
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "jig.db")
+    _make_db(path)
+    # 类型来自 enum.db，测试库中的 T1 不在其中
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE jig SET type = ?", (next(iter(JigType)).value,))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _rows(tmp_path):
+    base = next(validation._db_rows(_db(tmp_path), "jig"))[1]
+    rows = [(i, {**base, "id": i, "no": f"J{i:03}"}) for i in range(7)]
+    rows[2][1]["UseStatus"] = "已删除的状态"
+    # maximum 只是界面上限，pydantic 不检查，由批量校验补上
+    rows[5][1]["CheckUsedcount"] = 100000
+    return rows
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_validate_rows(tmp_path, workers):
+    results = list(
+        validation.validate_rows(
+            _rows(tmp_path), workers=workers, chunk_size=2, dump=True
+        )
+    )
+    assert [r.count for r in results] == [2, 2, 2, 1]
+    issues = [issue for r in results for issue in r.issues]
+    assert [(i.key, i.no, i.field, i.type) for i in issues] == [
+        (2, "J002", "UseStatus", "enum"),
+        (5, "J005", "CheckUsedcount", "maximum"),
+    ]
+    valid = [row for r in results for row in r.valid]
+    assert [key for key, _ in valid] == [0, 1, 3, 4, 6]
+    assert valid[0][1]["Checkdate"] == "2024-01-01"
+
+
+def test_revalidate(tmp_path):
+    path = _db(tmp_path)
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE jig SET UseStatus = '已删除的状态'")
+    conn.commit()
+    conn.close()
+    found = []
+    summary = validation.revalidate(path, workers=1, on_issue=found.append)
+    assert (summary["checked"], summary["invalid_rows"]) == (1, 1)
+    assert summary["by_field"] == {"UseStatus": 1}
+    assert [issue.key for issue in found] == [1]
@@ -0,0 +1,88 @@
+import os
+import sys
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_utils import Model2SQL
+from custom_utils.settings import WatchSettings
+from custom_utils.watchfolder import FolderIngester
+from Model import JigDynamic, JigUseStatus
+
+
+def _make_db(path):
+    Model2SQL.create_table_from_pydantic_model(
+        JigDynamic, db_path=path, table_name="jig"
+    )
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """INSERT INTO jig (name, model, type, count, no, UseStatus, Checkdate,
+        Usedcount, Maxcount, CheckUsedcount, CheckMaxcount, CheckCycle, Version,
+        Makedate, Location, Remark)
+        VALUES ('治具', 'M1', 'T1', 1, 'J001', ?, '2024-01-01', 2, 10000, 2, 2000,
+        365, 'A', '2024-01-01', '', '')""",
+        (JigUseStatus.UNUSE.value,),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _used(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT Usedcount FROM jig WHERE no = 'J001'").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _ingester(directory, db_path):
+    settings = WatchSettings().model_copy(
+        update={"enabled": True, "directory": str(directory), "read_existing": True}
+    )
+    return FolderIngester(settings, db_path=db_path)
+
+
+def test_two_ingesters_on_one_folder_count_each_line_once(tmp_path):
+    db_path = str(tmp_path / "jig.db")
+    _make_db(db_path)
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "t1.log").write_text("治具: J001\n" * 10, encoding="utf-8")
+
+    first = _ingester(logs, db_path)
+    second = _ingester(logs, db_path)
+
+    # 第一个读完文件、尚未写入时，第二个完整地读取并写入同一个文件
+    read_new = first._read_new
+
+    def interleaved(conn, name):
+        read = read_new(conn, name)
+        second.ingest_once({name})
+        return read
+
+    first._read_new = interleaved
+    result = first.ingest_once({"t1.log"})
+
+    assert result.cycles == 0
+    assert _used(db_path) == 12
+
+    # 之后追加的行仍只计一次
+    with open(logs / "t1.log", "a", encoding="utf-8") as f:
+        f.write("治具: J001 次数: 3\n")
+    first._read_new = read_new
+    first.ingest_once({"t1.log"})
+    second.ingest_once({"t1.log"})
+    assert _used(db_path) == 15
+
+
+def test_unknown_numbers_are_skipped(tmp_path):
+    db_path = str(tmp_path / "jig.db")
+    _make_db(db_path)
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "t1.log").write_text("治具: J001\n治具: NOPE\n", encoding="utf-8")
+
+    result = _ingester(logs, db_path).ingest_once({"t1.log"})
+
+    assert (result.lines, result.cycles, result.unknown) == (2, 1, 1)
+    assert _used(db_path) == 3